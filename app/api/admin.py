@@ -0,0 +1,81 @@
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from app.models.user import User
+from app.auth import get_current_admin
+from app.utils.profiler import ProfilerBusy, profile_store, start_profiler, stop_profiler
+from app.utils.slow_query import slow_query_log
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+@router.get("/slow-queries")
+def get_slow_queries(
+    limit: int = Query(50, ge=1, le=1000),
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Most recent slow statements (newest first) with route, bind shapes and
+    the captured query plan. The plan is filled in shortly after the entry
+    is recorded.
+    """
+    return {
+        "stats": slow_query_log.stats(),
+        "queries": slow_query_log.recent(limit),
+    }
+
+@router.delete("/slow-queries")
+def clear_slow_queries(current_user: User = Depends(get_current_admin)):
+    slow_query_log.clear()
+    return {"message": "Slow query log cleared"}
+
+def _profile_response(profile, profile_format: str):
+    if profile_format == "collapsed":
+        return PlainTextResponse(profile.to_collapsed())
+    return profile.to_speedscope()
+
+@router.post("/profile")
+async def run_profiler(
+    seconds: float = Query(5.0, gt=0, le=60),
+    interval_ms: float = Query(5.0, ge=1, le=100),
+    profile_format: str = Query("speedscope", alias="format", pattern="^(speedscope|collapsed)$"),
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Sample every thread of this worker (event loop and sync-handler
+    threadpool) for `seconds` and return the profile. Load-balanced
+    deployments profile whichever worker received this request.
+    """
+    try:
+        profiler = start_profiler(interval_ms / 1000, f"worker profile ({seconds}s)")
+    except ProfilerBusy:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A profile is already running in this worker"
+        )
+
+    try:
+        # 이벤트 루프는 계속 요청을 처리하고, 샘플러 스레드가 스택을 수집
+        await asyncio.sleep(seconds)
+    finally:
+        profile = stop_profiler(profiler)
+
+    return _profile_response(profile, profile_format)
+
+@router.get("/profiles")
+def list_request_profiles(current_user: User = Depends(get_current_admin)):
+    # X-Profile 헤더로 수집한 최근 요청 프로파일
+    return profile_store.list()
+
+@router.get("/profiles/{profile_id}")
+def get_request_profile(
+    profile_id: str,
+    profile_format: str = Query("speedscope", alias="format", pattern="^(speedscope|collapsed)$"),
+    current_user: User = Depends(get_current_admin)
+):
+    profile = profile_store.get(profile_id)
+    if not profile:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    return _profile_response(profile, profile_format)
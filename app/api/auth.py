@@ -1,52 +1,97 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
+from typing import Optional
 from uuid import uuid4
 from app.config import get_db
 from app.models.user import User
 from app.schemas.user import UserCreate, UserLogin, UserResponse, Token
-from app.auth import get_password_hash, verify_password, create_access_token
+from app.auth import create_access_token, get_current_admin, password_hasher
+from app.utils.password import PasswordHashingBusy
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
-@router.post("/signup", response_model=UserResponse)
-def signup(user_data: UserCreate, db: Session = Depends(get_db)):
-    # 이메일 중복 체크
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
+def _hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many concurrent sign-in requests, please retry",
+        headers={"Retry-After": "1"},
+    )
 
-    # 새 사용자 생성
+# 아래 핸들러는 bcrypt를 기다리려고 async로 두고, DB 작업만 이 함수들로 스레드풀에서 실행한다
+
+def _find_user(db: Session, email: str) -> Optional[User]:
+    return db.query(User).filter(User.email == email).first()
+
+def _create_user(db: Session, user_data: UserCreate, hashed_password: str) -> User:
     new_user = User(
         id=str(uuid4()),
         name=user_data.name,
         email=user_data.email,
-        password=get_password_hash(user_data.password),
+        password=hashed_password,
         role=user_data.role,
     )
 
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
-
     return new_user
 
+def _update_password(db: Session, user: User, hashed_password: str):
+    user.password = hashed_password
+    db.commit()
+
+@router.post("/signup", response_model=UserResponse)
+async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
+    # 이메일 중복 체크
+    existing_user = await run_in_threadpool(_find_user, db, user_data.email)
+    if existing_user:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
+
+    # bcrypt는 전용 프로세스 풀에서 실행 (스레드풀을 점유하지 않음)
+    try:
+        hashed_password = await password_hasher.hash(user_data.password)
+    except PasswordHashingBusy:
+        raise _hashing_busy()
+
+    # 새 사용자 생성
+    return await run_in_threadpool(_create_user, db, user_data, hashed_password)
+
 @router.post("/login", response_model=Token)
-def login(credentials: UserLogin, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == credentials.email).first()
+async def login(credentials: UserLogin, db: Session = Depends(get_db)):
+    user = await run_in_threadpool(_find_user, db, credentials.email)
 
-    if not user or not verify_password(credentials.password, user.password):
+    valid = False
+    if user:
+        # commit 후에는 속성이 expire 되므로 먼저 읽어 둔다
+        user_id = user.id
+        try:
+            valid, new_hash = await password_hasher.verify(credentials.password, user.password)
+        except PasswordHashingBusy:
+            raise _hashing_busy()
+
+        # BCRYPT_ROUNDS가 바뀌었으면 로그인 시 새 비용으로 다시 저장
+        if valid and new_hash:
+            await run_in_threadpool(_update_password, db, user, new_hash)
+
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    access_token = create_access_token(data={"sub": user.id})
+    access_token = create_access_token(data={"sub": user_id})
     return {"access_token": access_token, "token_type": "bearer"}
 
+@router.get("/hashing-stats")
+def hashing_stats(current_user: User = Depends(get_current_admin)):
+    # 비밀번호 해시 풀 상태 (대기 시간, 거절 수 등)
+    return password_hasher.stats()
+
 @router.post("/logout")
 def logout():
     # JWT는 stateless이므로 서버에서 할 일이 없음
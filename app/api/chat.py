@@ -1,6 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from contextlib import contextmanager
+import gzip as gzip_lib
 from uuid import uuid4
 from datetime import datetime
 from app.config import get_db
@@ -16,11 +20,64 @@ from app.schemas.chat import (
     MessageResponse,
     VersionCreate,
     VersionResponse,
+    ImportResult,
+)
+from app.auth import get_current_user, get_current_admin
+from app.utils.export import (
+    build_export_stream,
+    iter_room_messages,
+    iter_version_messages,
+)
+from app.utils.message_import import MessageImporter, iter_ndjson_lines
+from app.utils.purge import purge_chat_room, purge_jobs, run_job
+from app.utils.dm import get_or_create_dm
+from app.utils.etag import bump_revision, conditional, make_etag
+from app.utils.membership import is_room_member
+from app.utils.rate_limit import check_message_rate
+from app.utils.replica import get_read_db
+from app.utils.sharding import RoomMoving, message_shards
+from app.utils.serialization import MESSAGE_COLUMNS, ROOM_COLUMNS, fast_response, message_rows, room_row
+from app.websocket.chat_ws import manager
+from app.utils.archive import (
+    archive_old_messages,
+    load_messages_by_ids,
+    load_room_message_rows,
+    restore_message,
+    room_message_ids,
 )
-from app.auth import get_current_user
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
+def _require_room_member(db: Session, room_id: str, user: User):
+    # 삭제 표시된 방은 purge가 끝나기 전에도 읽거나 쓸 수 없다
+    if not is_room_member(db, room_id, user.id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You are not a member of this chat room"
+        )
+
+def _room_moving() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="This chat room is being moved, please retry shortly",
+        headers={"Retry-After": "5"},
+    )
+
+def _writable_shard(db: Session, room_id: str) -> str:
+    try:
+        return message_shards.writable_shard(db, room_id)
+    except RoomMoving:
+        raise _room_moving()
+
+@contextmanager
+def _message_write_session(room_id: str, db: Session):
+    # 샤드 이동 중인 방이면 503
+    try:
+        with message_shards.write_session(room_id, db) as message_db:
+            yield message_db
+    except RoomMoving:
+        raise _room_moving()
+
 # ========== Chat Room APIs ==========
 
 @router.post("/rooms", response_model=ChatRoomWithMembers)
@@ -37,6 +94,7 @@ def create_chat_room(
     )
     db.add(chat_room)
     db.flush()
+    message_shards.pin_new_room(db, chat_room.id)
 
     # 멤버 추가 (생성자 포함)
     member_ids = set(room_data.member_ids)
@@ -52,79 +110,126 @@ def create_chat_room(
     db.commit()
     db.refresh(chat_room)
 
-    return {
-        **chat_room.__dict__,
-        "member_ids": list(member_ids)
-    }
+    return room_row(chat_room, list(member_ids))
 
 @router.get("/rooms", response_model=List[ChatRoomWithMembers])
 def get_chat_rooms(
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    # 현재 사용자가 속한 채팅방들
-    memberships = db.query(ChatRoomMember).filter(
-        ChatRoomMember.user_id == current_user.id
+    # 목록 버전: 내가 속한 방들의 (id, revision)만 읽어서 ETag 계산
+    versions = db.query(ChatRoom.id, ChatRoom.revision).join(
+        ChatRoomMember, ChatRoomMember.chat_room_id == ChatRoom.id
+    ).filter(
+        ChatRoomMember.user_id == current_user.id,
+        ChatRoom.deleted_at.is_(None)
+    ).order_by(ChatRoom.id).all()
+
+    etag = make_etag("rooms", current_user.id, *(f"{room_id}.{revision}" for room_id, revision in versions))
+    cached = conditional(request, response, etag)
+    if cached:
+        return cached
+
+    # 현재 사용자가 속한 채팅방들 (필요한 컬럼만)
+    rooms = db.query(*ROOM_COLUMNS).join(
+        ChatRoomMember, ChatRoomMember.chat_room_id == ChatRoom.id
+    ).filter(
+        ChatRoomMember.user_id == current_user.id,
+        ChatRoom.deleted_at.is_(None)
     ).all()
 
-    chat_rooms = []
-    for membership in memberships:
-        room = membership.chat_room
-        member_ids = [m.user_id for m in room.members]
-        chat_rooms.append({
-            **room.__dict__,
-            "member_ids": member_ids
-        })
+    # 모든 방의 멤버를 한 번에 조회
+    member_ids = {room.id: [] for room in rooms}
+    if member_ids:
+        members = db.query(ChatRoomMember.chat_room_id, ChatRoomMember.user_id).filter(
+            ChatRoomMember.chat_room_id.in_(list(member_ids))
+        ).all()
+        for room_id, user_id in members:
+            member_ids[room_id].append(user_id)
 
-    return chat_rooms
+    return fast_response([room_row(room, member_ids[room.id]) for room in rooms], response)
 
 @router.get("/rooms/{room_id}", response_model=ChatRoomWithMembers)
 def get_chat_room(
     room_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    room = db.query(ChatRoom).filter(ChatRoom.id == room_id).first()
+    room = db.query(ChatRoom).filter(
+        ChatRoom.id == room_id,
+        ChatRoom.deleted_at.is_(None)
+    ).first()
     if not room:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Chat room not found"
         )
 
-    # 사용자가 멤버인지 확인
-    is_member = db.query(ChatRoomMember).filter(
-        ChatRoomMember.chat_room_id == room_id,
-        ChatRoomMember.user_id == current_user.id
-    ).first()
+    _require_room_member(db, room_id, current_user)
 
-    if not is_member:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You are not a member of this chat room"
+    member_ids = [
+        row.user_id for row in db.query(ChatRoomMember.user_id).filter(
+            ChatRoomMember.chat_room_id == room_id
         )
+    ]
+    return room_row(room, member_ids)
+
+@router.get("/rooms/{room_id}/presence")
+def get_room_presence(
+    room_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Who is online / typing in a room, served from the in-memory presence
+    state of this worker. Members only; the membership check is the only
+    DB query.
+    """
+    _require_room_member(db, room_id, current_user)
 
-    member_ids = [m.user_id for m in room.members]
-    return {
-        **room.__dict__,
-        "member_ids": member_ids
-    }
+    return manager.presence.snapshot(room_id)
 
 @router.delete("/rooms/{room_id}")
 def delete_chat_room(
     room_id: str,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    room = db.query(ChatRoom).filter(ChatRoom.id == room_id).first()
+    room = db.query(ChatRoom).filter(
+        ChatRoom.id == room_id,
+        ChatRoom.deleted_at.is_(None)
+    ).first()
     if not room:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Chat room not found"
         )
 
-    db.delete(room)
+    # 삭제 표시만 하고 메시지/버전 정리는 백그라운드에서 배치로 처리
+    room.deleted_at = datetime.utcnow()
+    # 같은 상대와 새 DM을 바로 만들 수 있도록 쌍 키 해제
+    room.dm_key = None
     db.commit()
-    return {"message": "Chat room deleted successfully"}
+
+    job = purge_jobs.create("chat_room", room_id)
+    background_tasks.add_task(purge_chat_room, room_id, job)
+    return {"message": "Chat room deleted successfully", "job_id": job["job_id"]}
+
+@router.get("/deletions/{job_id}")
+def get_deletion_progress(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    job = purge_jobs.get(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Deletion job not found"
+        )
+    return job
 
 # ========== Message APIs ==========
 
@@ -134,78 +239,144 @@ def create_message(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # 채팅방 멤버 확인
-    is_member = db.query(ChatRoomMember).filter(
-        ChatRoomMember.chat_room_id == message_data.chat_room_id,
-        ChatRoomMember.user_id == current_user.id
-    ).first()
-
-    if not is_member:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You are not a member of this chat room"
+    _require_room_member(db, message_data.chat_room_id, current_user)
+
+    # 사용자/채팅방 단위 전송 속도 제한
+    check_message_rate(current_user, message_data.chat_room_id)
+
+    # 메시지/피드백은 방의 샤드에, 채팅방 갱신은 primary에 (샤딩을 안 쓰면 같은 세션)
+    with _message_write_session(message_data.chat_room_id, db) as message_db:
+        # 메시지 생성
+        message = Message(
+            id=str(uuid4()),
+            chat_room_id=message_data.chat_room_id,
+            sender_id=current_user.id,
+            sender_name=current_user.name,
+            sender_role=current_user.role.value,
+            type=message_data.type,
+            content=message_data.content,
+            file_url=message_data.file_url,
+            file_name=message_data.file_name,
+            parent_message_id=message_data.parent_message_id,
+            feedback_ids=[]
         )
 
-    # 메시지 생성
-    message = Message(
-        id=str(uuid4()),
-        chat_room_id=message_data.chat_room_id,
-        sender_id=current_user.id,
-        sender_name=current_user.name,
-        sender_role=current_user.role.value,
-        type=message_data.type,
-        content=message_data.content,
-        file_url=message_data.file_url,
-        file_name=message_data.file_name,
-        parent_message_id=message_data.parent_message_id,
-        feedback_ids=[]
-    )
-
-    db.add(message)
-
-    # 피드백인 경우 원본 메시지의 feedback_ids 업데이트
-    if message_data.parent_message_id:
-        parent = db.query(Message).filter(Message.id == message_data.parent_message_id).first()
-        if parent:
-            if parent.feedback_ids is None:
-                parent.feedback_ids = []
-            parent.feedback_ids = parent.feedback_ids + [message.id]
-
-    # 채팅방 updated_at 업데이트
-    room = db.query(ChatRoom).filter(ChatRoom.id == message_data.chat_room_id).first()
-    if room:
-        room.updated_at = datetime.utcnow()
-
-    db.commit()
-    db.refresh(message)
+        message_db.add(message)
+
+        # 피드백인 경우 원본 메시지의 feedback_ids 업데이트
+        if message_data.parent_message_id:
+            parent = message_db.query(Message).filter(Message.id == message_data.parent_message_id).first()
+            if not parent:
+                # 보관(archive)된 메시지에 답글을 달면 hot 테이블로 복원
+                parent = restore_message(message_db, message_data.chat_room_id, message_data.parent_message_id)
+            if parent:
+                if parent.feedback_ids is None:
+                    parent.feedback_ids = []
+                parent.feedback_ids = parent.feedback_ids + [message.id]
+
+        # 채팅방 updated_at 업데이트
+        room = db.query(ChatRoom).filter(ChatRoom.id == message_data.chat_room_id).first()
+        if room and room.deleted_at is not None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Chat room not found"
+            )
+        if room:
+            room.updated_at = datetime.utcnow()
+            room.revision = ChatRoom.revision + 1
+
+        message_db.commit()
+        db.commit()
+        message_db.refresh(message)
 
     return message
 
 @router.get("/rooms/{room_id}/messages", response_model=List[MessageResponse])
 def get_messages(
     room_id: str,
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    # 멤버 확인
-    is_member = db.query(ChatRoomMember).filter(
-        ChatRoomMember.chat_room_id == room_id,
-        ChatRoomMember.user_id == current_user.id
-    ).first()
+    _require_room_member(db, room_id, current_user)
 
-    if not is_member:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You are not a member of this chat room"
+    revision = db.query(ChatRoom.revision).filter(ChatRoom.id == room_id).scalar()
+    etag = make_etag("messages", room_id, revision, skip, limit)
+    cached = conditional(request, response, etag)
+    if cached:
+        return cached
+
+    # 보관된 메시지가 있으면 필요한 블록만 풀어서 합친다
+    with message_shards.session(room_id, db) as message_db:
+        messages = load_room_message_rows(message_db, room_id, skip=skip, limit=limit)
+
+    return fast_response(messages, response)
+
+# ========== Cross-room APIs ==========
+
+def _my_room_ids(db: Session, user_id: str) -> List[str]:
+    return [
+        row.id for row in db.query(ChatRoom.id).join(
+            ChatRoomMember, ChatRoomMember.chat_room_id == ChatRoom.id
+        ).filter(
+            ChatRoomMember.user_id == user_id,
+            ChatRoom.deleted_at.is_(None)
         )
+    ]
 
-    messages = db.query(Message).filter(
-        Message.chat_room_id == room_id
-    ).order_by(Message.timestamp).offset(skip).limit(limit).all()
+@router.get("/search", response_model=List[MessageResponse])
+def search_messages(
+    q: str = Query(..., min_length=2),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Newest messages containing `q` across all of the user's rooms.
+    Each message shard is searched in parallel; archived messages are not searched.
+    """
+    def search(shard_db: Session, room_ids: List[str]):
+        return shard_db.query(*MESSAGE_COLUMNS).filter(
+            Message.chat_room_id.in_(room_ids),
+            Message.content.icontains(q, autoescape=True)
+        ).order_by(Message.timestamp.desc()).limit(limit).all()
+
+    rows = message_shards.fan_out_rooms(_my_room_ids(db, current_user.id), search, db)
+    rows.sort(key=lambda row: (row.timestamp, row.id), reverse=True)
+    return fast_response(message_rows(rows[:limit]))
+
+@router.get("/sync", response_model=List[MessageResponse])
+def sync_messages(
+    since: datetime,
+    after_id: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=1000),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Messages after the (since, after_id) cursor across all of the user's
+    rooms, oldest first (catch-up after a reconnect). Page by passing the
+    last message's timestamp and id back as `since` and `after_id`, so
+    messages sharing a timestamp across a page boundary are not skipped.
+    Without after_id, messages at exactly `since` are included.
+    """
+    if after_id is None:
+        cursor = Message.timestamp >= since
+    else:
+        cursor = or_(Message.timestamp > since, and_(Message.timestamp == since, Message.id > after_id))
 
-    return messages
+    def newer(shard_db: Session, room_ids: List[str]):
+        return shard_db.query(*MESSAGE_COLUMNS).filter(
+            Message.chat_room_id.in_(room_ids),
+            cursor
+        ).order_by(Message.timestamp, Message.id).limit(limit).all()
+
+    rows = message_shards.fan_out_rooms(_my_room_ids(db, current_user.id), newer, db)
+    rows.sort(key=lambda row: (row.timestamp, row.id))
+    return fast_response(message_rows(rows[:limit]))
 
 # ========== Version APIs ==========
 
@@ -215,67 +386,246 @@ def create_version(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # 채팅방의 현재 버전 번호 계산
-    last_version = db.query(ChatVersion).filter(
-        ChatVersion.chat_room_id == version_data.chat_room_id
-    ).order_by(ChatVersion.version_number.desc()).first()
-
-    version_number = 1 if not last_version else last_version.version_number + 1
-
-    # 현재 채팅방의 모든 메시지 ID 가져오기
-    messages = db.query(Message).filter(
-        Message.chat_room_id == version_data.chat_room_id
-    ).order_by(Message.timestamp).all()
-
-    message_ids = [msg.id for msg in messages]
-
-    # 버전 생성
-    version = ChatVersion(
-        id=str(uuid4()),
-        chat_room_id=version_data.chat_room_id,
-        version_number=version_number,
-        description=version_data.description,
-        created_by=current_user.id,
-        message_ids=message_ids
-    )
+    _require_room_member(db, version_data.chat_room_id, current_user)
+
+    with _message_write_session(version_data.chat_room_id, db) as message_db:
+        # 채팅방의 현재 버전 번호 계산
+        last_version = message_db.query(ChatVersion).filter(
+            ChatVersion.chat_room_id == version_data.chat_room_id
+        ).order_by(ChatVersion.version_number.desc()).first()
+
+        version_number = 1 if not last_version else last_version.version_number + 1
+
+        # 현재 채팅방의 모든 메시지 ID 가져오기 (보관된 메시지 포함)
+        message_ids = room_message_ids(message_db, version_data.chat_room_id)
+
+        # 버전 생성
+        version = ChatVersion(
+            id=str(uuid4()),
+            chat_room_id=version_data.chat_room_id,
+            version_number=version_number,
+            description=version_data.description,
+            created_by=current_user.id,
+            message_ids=message_ids
+        )
 
-    db.add(version)
-    db.commit()
-    db.refresh(version)
+        message_db.add(version)
+        bump_revision(db, ChatRoom, version_data.chat_room_id)
+        message_db.commit()
+        db.commit()
+        message_db.refresh(version)
 
     return version
 
 @router.get("/rooms/{room_id}/versions", response_model=List[VersionResponse])
 def get_versions(
     room_id: str,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    versions = db.query(ChatVersion).filter(
-        ChatVersion.chat_room_id == room_id
-    ).order_by(ChatVersion.version_number.desc()).all()
+    _require_room_member(db, room_id, current_user)
+
+    revision = db.query(ChatRoom.revision).filter(ChatRoom.id == room_id).scalar()
+    etag = make_etag("versions", room_id, revision)
+    cached = conditional(request, response, etag)
+    if cached:
+        return cached
+
+    with message_shards.session(room_id, db) as message_db:
+        versions = message_db.query(ChatVersion).filter(
+            ChatVersion.chat_room_id == room_id
+        ).order_by(ChatVersion.version_number.desc()).all()
 
     return versions
 
+def _find_version(db: Session, version_id: str) -> Optional[ChatVersion]:
+    if not message_shards.enabled:
+        return db.query(ChatVersion).filter(ChatVersion.id == version_id).first()
+
+    # 버전 ID만으로는 샤드를 알 수 없으므로 모든 샤드에 동시에 조회
+    found = message_shards.fan_out(
+        lambda shard, shard_db: shard_db.query(ChatVersion).filter(ChatVersion.id == version_id).first()
+    )
+    return next((version for version in found.values() if version is not None), None)
+
 @router.get("/versions/{version_id}/messages", response_model=List[MessageResponse])
 def get_version_messages(
     version_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    version = db.query(ChatVersion).filter(ChatVersion.id == version_id).first()
+    version = _find_version(db, version_id)
     if not version:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Version not found"
         )
 
+    _require_room_member(db, version.chat_room_id, current_user)
+
     # 버전에 저장된 메시지 ID들로 메시지 조회
-    messages = db.query(Message).filter(
-        Message.id.in_(version.message_ids)
-    ).order_by(Message.timestamp).all()
+    with message_shards.session(version.chat_room_id, db) as message_db:
+        messages = load_messages_by_ids(message_db, version.chat_room_id, list(version.message_ids or []))
+
+    return fast_response(message_rows(messages))
+
+
+# ========== Export APIs ==========
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _export_response(rows, filename: str, export_format: str, compress: bool) -> StreamingResponse:
+    headers = {}
+    filename = f"{filename}.{export_format}"
+    if compress:
+        filename += ".gz"
+        media_type = "application/gzip"
+    else:
+        media_type = EXPORT_MEDIA_TYPES[export_format]
+    headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+
+    return StreamingResponse(
+        build_export_stream(rows, export_format, compress=compress),
+        media_type=media_type,
+        headers=headers,
+    )
+
+
+@router.get("/rooms/{room_id}/export")
+def export_room_messages(
+    room_id: str,
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    gzip: bool = False,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Stream every message of a chat room as NDJSON or CSV (optionally gzip).
+    Rows are read with a server-side cursor so memory stays flat.
+    """
+    _require_room_member(db, room_id, current_user)
+
+    return _export_response(
+        iter_room_messages(room_id),
+        filename=f"room-{room_id}",
+        export_format=export_format,
+        compress=gzip,
+    )
+
+
+@router.get("/versions/{version_id}/export")
+def export_version_messages(
+    version_id: str,
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    gzip: bool = False,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Stream the messages captured in a version snapshot as NDJSON or CSV.
+    """
+    version = _find_version(db, version_id)
+    if not version:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Version not found"
+        )
+
+    _require_room_member(db, version.chat_room_id, current_user)
+
+    return _export_response(
+        iter_version_messages(version.chat_room_id, list(version.message_ids or [])),
+        filename=f"room-{version.chat_room_id}-v{version.version_number}",
+        export_format=export_format,
+        compress=gzip,
+    )
+
+
+# ========== Import APIs ==========
+
+@router.post("/import", response_model=ImportResult)
+def import_messages(
+    file: UploadFile = File(...),
+    room_id: Optional[str] = None,
+    start_line: int = 0,
+    batch_size: int = Query(1000, ge=1, le=10000),
+    current_user: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Bulk import messages from an NDJSON file (optionally .gz), admin only.
+    The admin must be a member of every target room, and every sender a
+    member of the room their message goes into; other lines are reported
+    as errors. Original timestamps and feedback links are preserved.
+    To resume after a failure, pass the returned last_line as start_line.
+    """
+    if room_id:
+        _require_room_member(db, room_id, current_user)
 
-    return messages
+    if message_shards.enabled and not room_id:
+        # 한 파일의 메시지가 여러 샤드로 흩어지지 않도록 방 단위로만 가져온다
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="room_id is required when message storage is sharded"
+        )
+
+    stream = file.file
+    if file.filename and file.filename.endswith(".gz"):
+        stream = gzip_lib.GzipFile(fileobj=stream)
+
+    if not room_id:
+        importer = MessageImporter(db, batch_size=batch_size, member_id=current_user.id)
+        return importer.run(iter_ndjson_lines(stream), start_line=start_line)
+
+    # 가져오는 도중 방 이동이 시작되면 다음 배치 전에 멈춘다 (이미 넣은 줄은 남는다)
+    shard = _writable_shard(db, room_id)
+    with message_shards.shard_session(shard, db) as message_db:
+        importer = MessageImporter(
+            db, batch_size=batch_size, room_id=room_id, message_db=message_db, member_id=current_user.id,
+            before_batch=lambda: message_shards.ensure_writable(db, room_id, shard),
+        )
+        try:
+            return importer.run(iter_ndjson_lines(stream), start_line=start_line)
+        except RoomMoving:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"This chat room is being moved; resume with start_line={importer.last_line}",
+                headers={"Retry-After": "5"},
+            )
+
+
+# ========== Archive APIs ==========
+
+@router.post("/archive")
+def run_message_archive(
+    background_tasks: BackgroundTasks,
+    older_than_days: Optional[int] = Query(None, ge=1),
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Move messages older than N days (default: MESSAGE_ARCHIVE_AFTER_DAYS)
+    into compressed archive blocks, admin only. Runs in the background;
+    poll /deletions/{job_id} for the number of messages moved out of the
+    hot table.
+    """
+    job = purge_jobs.create("archive", "messages")
+    background_tasks.add_task(_run_archive, older_than_days, job)
+    return {"message": "Archiving started", "job_id": job["job_id"]}
+
+
+def _run_archive(older_than_days: Optional[int], job: dict):
+    def archive():
+        results = message_shards.fan_out(lambda shard, db: archive_old_messages(db, older_than_days))
+        archived = sum(count for shard_result in results.values() for count in shard_result.values())
+        purge_jobs.add_progress(job, Message.__tablename__, archived)
+
+    run_job(job, archive)
 
 
 # ========== DM (Direct Message) APIs ==========
@@ -305,30 +655,8 @@ def create_dm(
             detail="User not found"
         )
 
-    # Check if DM already exists (either direction)
-    existing_dm = db.query(ChatRoom).filter(
-        ChatRoom.type == "dm",
-        (
-            ((ChatRoom.user1_id == current_user.id) & (ChatRoom.user2_id == other_user_id)) |
-            ((ChatRoom.user1_id == other_user_id) & (ChatRoom.user2_id == current_user.id))
-        )
-    ).first()
-
-    if existing_dm:
-        return existing_dm
-
-    # Create new DM
-    dm = ChatRoom(
-        id=str(uuid4()),
-        name=f"DM: {current_user.name} - {other_user.name}",
-        description="Direct Message",
-        type="dm",
-        user1_id=current_user.id,
-        user2_id=other_user_id,
-    )
-    db.add(dm)
-    db.commit()
-    db.refresh(dm)
+    # 정렬된 사용자 쌍 키로 한 번에 조회/생성 (동시 요청에도 DM은 하나)
+    dm, _ = get_or_create_dm(db, current_user, other_user)
 
     return dm
 
@@ -336,17 +664,17 @@ def create_dm(
 @router.get("/dm/my", response_model=List[ChatRoomResponse])
 def get_my_dms(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get all DMs where the current user is a participant.
     """
-    dms = db.query(ChatRoom).filter(
+    dms = db.query(ChatRoom).join(
+        ChatRoomMember, ChatRoomMember.chat_room_id == ChatRoom.id
+    ).filter(
+        ChatRoomMember.user_id == current_user.id,
         ChatRoom.type == "dm",
-        (
-            (ChatRoom.user1_id == current_user.id) |
-            (ChatRoom.user2_id == current_user.id)
-        )
+        ChatRoom.deleted_at.is_(None)
     ).order_by(ChatRoom.updated_at.desc()).all()
 
     return dms
@@ -356,7 +684,7 @@ def get_my_dms(
 def get_project_chat_room(
     project_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get the chat room for a specific project.
@@ -378,7 +706,8 @@ def get_project_chat_room(
     # Get project chat room
     chat_room = db.query(ChatRoom).filter(
         ChatRoom.type == "project",
-        ChatRoom.project_id == project_id
+        ChatRoom.project_id == project_id,
+        ChatRoom.deleted_at.is_(None)
     ).first()
 
     if not chat_room:
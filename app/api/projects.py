@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response
+from sqlalchemy import func
+from sqlalchemy.orm import Session, aliased
 from typing import List
 import uuid
 from datetime import datetime
@@ -12,9 +13,14 @@ from app.schemas.project import (
     ProjectResponse,
     ProjectMemberResponse,
     JoinProjectRequest,
-    ProjectWithMembers
+    ProjectWithMembers,
+    ProjectDashboardItem
 )
 from app.utils.invite_code import generate_invite_code
+from app.utils.purge import purge_project, purge_jobs
+from app.utils.etag import bump_revision, conditional, make_etag
+from app.utils.replica import get_read_db
+from app.utils.sharding import message_shards
 
 router = APIRouter(prefix="/api/projects", tags=["projects"])
 
@@ -64,6 +70,7 @@ async def create_project(
         updated_at=datetime.utcnow()
     )
     db.add(chat_room)
+    message_shards.pin_new_room(db, chat_room.id)
 
     db.commit()
     db.refresh(project)
@@ -82,7 +89,8 @@ async def join_project(
     """
     # Find project by invite code
     project = db.query(Project).filter(
-        Project.invite_code == join_data.invite_code
+        Project.invite_code == join_data.invite_code,
+        Project.deleted_at.is_(None)
     ).first()
 
     if not project:
@@ -105,6 +113,7 @@ async def join_project(
         joined_at=datetime.utcnow()
     )
     db.add(member)
+    bump_revision(db, Project, project.id)
     db.commit()
 
     return project
@@ -113,26 +122,79 @@ async def join_project(
 @router.get("/my", response_model=List[ProjectResponse])
 async def get_my_projects(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get all projects where the current user is a member.
     """
-    memberships = db.query(ProjectMember).filter(
-        ProjectMember.user_id == current_user.id
+    projects = db.query(Project).join(
+        ProjectMember, ProjectMember.project_id == Project.id
+    ).filter(
+        ProjectMember.user_id == current_user.id,
+        Project.deleted_at.is_(None)
     ).all()
 
-    project_ids = [m.project_id for m in memberships]
-    projects = db.query(Project).filter(Project.id.in_(project_ids)).all()
-
     return projects
 
 
+@router.get("/dashboard", response_model=List[ProjectDashboardItem])
+async def get_project_dashboard(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Get all projects of the current user with member count, the user's role,
+    the project chat room and its last activity, in a single query.
+    """
+    my_membership = aliased(ProjectMember)
+
+    # 프로젝트별로 인덱스를 타는 상관 서브쿼리 (전체 멤버 테이블을 GROUP BY 하지 않도록)
+    member_count = db.query(func.count()).select_from(ProjectMember).filter(
+        ProjectMember.project_id == Project.id
+    ).correlate(Project).scalar_subquery()
+
+    rows = db.query(
+        Project,
+        my_membership.role,
+        member_count,
+        ChatRoom.id,
+        ChatRoom.updated_at
+    ).join(
+        my_membership, my_membership.project_id == Project.id
+    ).outerjoin(
+        ChatRoom,
+        (ChatRoom.project_id == Project.id) &
+        (ChatRoom.type == "project") &
+        ChatRoom.deleted_at.is_(None)
+    ).filter(
+        my_membership.user_id == current_user.id,
+        Project.deleted_at.is_(None)
+    ).order_by(
+        func.coalesce(ChatRoom.updated_at, Project.created_at).desc()
+    ).all()
+
+    return [
+        ProjectDashboardItem(
+            id=project.id,
+            name=project.name,
+            description=project.description,
+            invite_code=project.invite_code,
+            created_by=project.created_by,
+            created_at=project.created_at,
+            member_count=member_count,
+            my_role=role,
+            chat_room_id=chat_room_id,
+            last_activity_at=last_activity_at
+        )
+        for project, role, member_count, chat_room_id, last_activity_at in rows
+    ]
+
+
 @router.get("/{project_id}", response_model=ProjectWithMembers)
 async def get_project(
     project_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get project details with members.
@@ -146,7 +208,10 @@ async def get_project(
     if not member:
         raise HTTPException(status_code=403, detail="Not a member of this project")
 
-    project = db.query(Project).filter(Project.id == project_id).first()
+    project = db.query(Project).filter(
+        Project.id == project_id,
+        Project.deleted_at.is_(None)
+    ).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
@@ -182,8 +247,10 @@ async def get_project(
 @router.get("/{project_id}/members", response_model=List[ProjectMemberResponse])
 async def get_project_members(
     project_id: str,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get all members of a project.
@@ -197,6 +264,12 @@ async def get_project_members(
     if not member:
         raise HTTPException(status_code=403, detail="Not a member of this project")
 
+    revision = db.query(Project.revision).filter(Project.id == project_id).scalar()
+    etag = make_etag("members", project_id, revision)
+    cached = conditional(request, response, etag)
+    if cached:
+        return cached
+
     # Get members with user info
     members_query = db.query(ProjectMember, User).join(
         User, ProjectMember.user_id == User.id
@@ -221,6 +294,7 @@ async def get_project_members(
 @router.delete("/{project_id}")
 async def delete_project(
     project_id: str,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -240,11 +314,38 @@ async def delete_project(
             detail="Only the project owner can delete the project"
         )
 
-    project = db.query(Project).filter(Project.id == project_id).first()
+    project = db.query(Project).filter(
+        Project.id == project_id,
+        Project.deleted_at.is_(None)
+    ).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    db.delete(project)
+    # Mark as deleted now; rooms, messages and members are purged in the background
+    deleted_at = datetime.utcnow()
+    project.deleted_at = deleted_at
+    # 프로젝트 채팅방도 같은 트랜잭션에서 숨겨야 purge가 끝나기 전에 메시지/구독을 받지 않는다
+    db.query(ChatRoom).filter(
+        ChatRoom.project_id == project_id,
+        ChatRoom.deleted_at.is_(None)
+    ).update({ChatRoom.deleted_at: deleted_at}, synchronize_session=False)
     db.commit()
 
-    return {"message": "Project deleted successfully"}
+    job = purge_jobs.create("project", project_id)
+    background_tasks.add_task(purge_project, project_id, job)
+
+    return {"message": "Project deleted successfully", "job_id": job["job_id"]}
+
+
+@router.get("/deletions/{job_id}")
+async def get_deletion_progress(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get the progress of a background project deletion.
+    """
+    job = purge_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Deletion job not found")
+    return job
@@ -5,6 +5,9 @@ from app.config import get_db
 from app.models.user import User
 from app.schemas.user import UserResponse, UserUpdate
 from app.auth import get_current_user
+from app.models.project import Project, ProjectMember
+from app.utils.etag import bump_revision
+from app.utils.replica import get_read_db
 
 router = APIRouter(prefix="/api/users", tags=["users"])
 
@@ -26,7 +29,7 @@ def get_user_by_id(user_id: str, db: Session = Depends(get_db)):
 def get_all_users(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     users = db.query(User).offset(skip).limit(limit).all()
@@ -43,6 +46,16 @@ def update_current_user(
     if user_data.profile_image is not None:
         current_user.profile_image = user_data.profile_image
 
+    # 프로젝트 멤버 목록에 이름이 포함되므로 해당 프로젝트들의 ETag 무효화
+    if user_data.name is not None:
+        project_ids = [
+            row.project_id for row in db.query(ProjectMember.project_id).filter(
+                ProjectMember.user_id == current_user.id
+            )
+        ]
+        for project_id in project_ids:
+            bump_revision(db, Project, project_id)
+
     db.commit()
     db.refresh(current_user)
     return current_user
@@ -50,7 +63,7 @@ def update_current_user(
 @router.get("/search/", response_model=List[UserResponse])
 def search_users(
     query: str,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     users = db.query(User).filter(
@@ -1,24 +1,27 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from app.config import settings, get_db
 from app.models.user import User
 from app.schemas.user import TokenData
+from app.utils.password import PasswordHasher, bcrypt_secret, make_context
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = make_context(settings.BCRYPT_ROUNDS)
+password_hasher = PasswordHasher(
+    rounds=settings.BCRYPT_ROUNDS,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_limit=settings.PASSWORD_HASH_QUEUE_LIMIT,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return pwd_context.verify(bcrypt_secret(plain_password), hashed_password)
 
 def get_password_hash(password: str) -> str:
-    # bcrypt는 최대 72바이트까지만 처리 가능
-    password = password[:72]
-    return pwd_context.hash(password)
+    return pwd_context.hash(bcrypt_secret(password))
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -51,4 +54,16 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     if user is None:
         raise credentials_exception
 
+    # 이 세션으로 커밋한 쓰기는 해당 사용자를 잠시 primary에 고정 (app/utils/replica.py)
+    db.info["user_id"] = user.id
+
     return user
+
+def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
+    # role은 가입할 때 직접 고르는 값이라 권한 판단에 쓰지 않는다
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required",
+        )
+    return current_user
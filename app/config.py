@@ -1,3 +1,4 @@
+from typing import Dict
 from pydantic_settings import BaseSettings
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
@@ -5,10 +6,80 @@ from sqlalchemy.orm import sessionmaker
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    # 읽기 전용 복제본 (비어 있으면 모든 조회가 DATABASE_URL로 간다)
+    DATABASE_REPLICA_URL: str = ""
+    # 쓰기 후 이 시간(초) 동안은 그 사용자의 조회도 primary에서 (복제 지연 대비)
+    READ_YOUR_WRITES_SECONDS: float = 5.0
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 43200
 
+    # 비밀번호 해시 (bcrypt 비용, 전용 프로세스 풀 크기와 대기열 한도)
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_LIMIT: int = 64
+
+    # 접속/입력 중 표시 (초 단위)
+    PRESENCE_FLUSH_INTERVAL: float = 0.25
+    TYPING_TIMEOUT: float = 5.0
+    PRESENCE_TIMEOUT: float = 60.0
+
+    # WebSocket ping 주기와 무응답 연결 정리 기준 (초 단위)
+    # 프로토콜 수준 ping/pong은 uvicorn이 처리 (--ws-ping-interval / --ws-ping-timeout)
+    WS_PING_INTERVAL: float = 25.0
+    WS_PING_TIMEOUT: float = 20.0
+    # 앱 수준 heartbeat를 보내는 클라이언트만 이 시간 동안 조용하면 정리
+    WS_IDLE_TIMEOUT: float = 60.0
+
+    # 메시지 전송 속도 제한 (토큰 버킷, 사용자 버킷은 역할별 배수 적용)
+    # RATE_LIMIT_STORE에 SQLite 파일 경로를 주면 같은 호스트의 워커끼리 버킷을 공유
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_STORE: str = ""
+    RATE_LIMIT_MESSAGES_PER_SECOND: float = 1.0
+    RATE_LIMIT_MESSAGE_BURST: float = 10
+    RATE_LIMIT_WS_FRAMES_PER_SECOND: float = 5.0
+    RATE_LIMIT_WS_FRAME_BURST: float = 20
+    RATE_LIMIT_ROOM_PER_SECOND: float = 20.0
+    RATE_LIMIT_ROOM_BURST: float = 50
+    RATE_LIMIT_ROLE_MULTIPLIERS: Dict[str, float] = {"professor": 3.0, "assistant": 2.0, "student": 1.0}
+
+    # 요청 수용 제어 (경로 종류별 동시 처리 수, 대기열 크기, 대기 시간 초과 시 503)
+    # export는 다운로드가 끝날 때까지 자리를 잡고 있으므로 따로 작게 둔다
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_LIMITS: Dict[str, int] = {"auth": 8, "chat_read": 16, "chat_write": 8, "export": 2, "default": 8}
+    ADMISSION_QUEUE_LIMIT: int = 64
+    ADMISSION_QUEUE_TIMEOUT: float = 2.0
+
+    # /metrics (Prometheus 텍스트 형식)
+    METRICS_ENABLED: bool = True
+    # 한 요청에서 같은 모양의 SELECT가 이 횟수 이상이면 N+1 의심으로 기록
+    DB_N_PLUS_ONE_THRESHOLD: int = 5
+    # 응답에 X-DB-Queries 등 디버그 헤더 추가 (개발용)
+    DB_DEBUG_HEADERS: bool = False
+
+    # 느린 쿼리 기록 (0이면 사용 안 함), 기준을 넘으면 실행 계획(EXPLAIN)도 수집
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+    SLOW_QUERY_LOG_SIZE: int = 200
+    SLOW_QUERY_EXPLAIN: bool = True
+
+    # 요청 단위 프로파일링: 'X-Profile: <토큰>' 헤더가 붙은 요청만 샘플링 (비어 있으면 사용 안 함)
+    PROFILE_HEADER_TOKEN: str = ""
+    PROFILE_REQUEST_INTERVAL_MS: float = 1.0
+
+    # 메시지/버전 저장소 샤드 {"이름": "DB URL"} (비어 있으면 DATABASE_URL 하나에 모두 저장)
+    MESSAGE_SHARDS: Dict[str, str] = {}
+    # 샤드별 조회 전용 복제본 {"이름": "DB URL"} (primary DB에 있는 샤드는 DATABASE_REPLICA_URL 사용)
+    MESSAGE_SHARD_REPLICAS: Dict[str, str] = {}
+    # 방 -> 샤드 조회 캐시 시간(초), 방을 다른 샤드로 옮길 때 이만큼 기다린 뒤 원본을 정리한다
+    SHARD_DIRECTORY_CACHE_SECONDS: float = 30.0
+
+    # 부팅 시 밀린 스키마 마이그레이션 적용 (끄면 `python -m app.utils.migrations`로 배포 단계에서 실행)
+    MIGRATE_ON_STARTUP: bool = True
+
+    # 오래된 메시지 압축 보관 (0이면 사용 안 함)
+    MESSAGE_ARCHIVE_AFTER_DAYS: int = 0
+    MESSAGE_ARCHIVE_BLOCK_SIZE: int = 1000
+
     class Config:
         env_file = ".env"
 
@@ -19,6 +90,10 @@ engine = create_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# 조회 전용 복제본 (app/utils/replica.py의 get_read_db가 사용)
+replica_engine = create_engine(settings.DATABASE_REPLICA_URL, pool_pre_ping=True) if settings.DATABASE_REPLICA_URL else None
+ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine) if replica_engine is not None else None
+
 # 의존성 주입용 DB 세션
 def get_db():
     db = SessionLocal()
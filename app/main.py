@@ -1,12 +1,30 @@
-from fastapi import FastAPI, WebSocket, Depends
+from fastapi import FastAPI, WebSocket, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from app.config import Base, engine, get_db
-from app.api import auth, users, chat, projects
-from app.websocket.chat_ws import websocket_endpoint
+from app.config import engine, replica_engine, get_db, settings
+from app.api import auth, users, chat, projects, admin
+from app.websocket.chat_ws import websocket_endpoint, user_websocket_endpoint, manager as ws_manager
+from app.utils.purge import resume_pending_purges
+from app.auth import password_hasher
+from app.utils.rate_limit import rate_limiter
+from app.utils.admission import AdmissionController, AdmissionMiddleware
+from app.utils import metrics
+from app.utils.slow_query import slow_query_log
+from app.utils.profiler import RequestProfilingMiddleware
+from app.utils.migrations import migrate
+from app.utils.replica import read_router
+from app.utils.sharding import check_directory, ensure_shard_schema, message_shards
+import threading
 
-# 데이터베이스 테이블 생성
-Base.metadata.create_all(bind=engine)
+# 스키마 마이그레이션 (최신이면 버전 조회 한 번으로 끝)
+if settings.MIGRATE_ON_STARTUP:
+    migrate(engine)
+    # 별도 DB에 있는 메시지 샤드에는 샤딩 대상 테이블만 만든다
+    if message_shards.enabled:
+        ensure_shard_schema()
+# 디렉터리에 없는 방은 해시가 가리키는 샤드에 메시지가 없을 수 있다
+check_directory()
 
 app = FastAPI(
     title="Research Chat API",
@@ -14,6 +32,17 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# 과부하 시 대기열이 넘치거나 대기 시간을 넘긴 요청은 바로 503으로 거절
+# (스레드풀 크기 40 안에서 경로 종류별 한도를 나눠 갖는다)
+# CORS보다 먼저 등록해야 503 응답에도 CORS 헤더가 붙는다
+admission = AdmissionController(
+    limits=settings.ADMISSION_LIMITS,
+    queue_limit=settings.ADMISSION_QUEUE_LIMIT,
+    queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+    enabled=settings.ADMISSION_ENABLED,
+)
+app.add_middleware(AdmissionMiddleware, controller=admission)
+
 # CORS 설정 (Flutter 앱에서 접근 가능하도록)
 app.add_middleware(
     CORSMiddleware,
@@ -23,13 +52,48 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 요청별 지연 시간/상태 코드/DB 사용량 집계 (가장 바깥에서 503 거절까지 포함해 측정)
+if settings.METRICS_ENABLED:
+    metrics.instrument_engine(engine, replica_engine)
+    metrics.instrument_websockets(ws_manager)
+    metrics.instrument_admission(admission)
+    metrics.instrument_rate_limiter(rate_limiter)
+    metrics.instrument_read_router(read_router)
+    app.add_middleware(
+        metrics.MetricsMiddleware,
+        n_plus_one_threshold=settings.DB_N_PLUS_ONE_THRESHOLD,
+        debug_headers=settings.DB_DEBUG_HEADERS,
+    )
+
+# 'X-Profile: <토큰>' 헤더가 붙은 요청 하나만 샘플링 (/api/admin/profiles/{id})
+if settings.PROFILE_HEADER_TOKEN:
+    app.add_middleware(
+        RequestProfilingMiddleware,
+        token=settings.PROFILE_HEADER_TOKEN,
+        interval=settings.PROFILE_REQUEST_INTERVAL_MS / 1000,
+    )
+
+# 느린 쿼리 기록 + 실행 계획 수집 (/api/admin/slow-queries)
+if settings.SLOW_QUERY_THRESHOLD_MS > 0:
+    slow_query_log.install()
+
 # REST API 라우터 등록
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(chat.router)
 app.include_router(projects.router)
+app.include_router(admin.router)
 
-# WebSocket 엔드포인트
+# WebSocket 엔드포인트 (사용자당 하나, 방은 subscribe/unsubscribe 프레임으로 선택)
+@app.websocket("/ws/{user_id}")
+async def websocket_user(
+    websocket: WebSocket,
+    user_id: str,
+    db: Session = Depends(get_db)
+):
+    await user_websocket_endpoint(websocket, user_id, db)
+
+# WebSocket 엔드포인트 (방 하나당 소켓 하나, 기존 클라이언트용)
 @app.websocket("/ws/{room_id}/{user_id}")
 async def websocket_chat(
     websocket: WebSocket,
@@ -39,6 +103,15 @@ async def websocket_chat(
 ):
     await websocket_endpoint(websocket, room_id, user_id, db)
 
+@app.on_event("startup")
+def resume_purges():
+    # 재시작 전에 끝나지 못한 삭제 작업을 백그라운드에서 이어서 처리
+    threading.Thread(target=resume_pending_purges, daemon=True).start()
+
+@app.on_event("shutdown")
+def shutdown_password_hasher():
+    password_hasher.shutdown()
+
 @app.get("/")
 def root():
     return {
@@ -49,8 +122,29 @@ def root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "websocket": ws_manager.stats(),
+        "rate_limits": rate_limiter.stats(),
+        "admission": admission.stats(),
+        "read_routing": read_router.stats(),
+        "message_shards": message_shards.stats(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+    # 죽은 연결은 프로토콜 수준 ping에 pong이 없으면 uvicorn이 닫는다
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=True,
+        ws_ping_interval=settings.WS_PING_INTERVAL,
+        ws_ping_timeout=settings.WS_PING_TIMEOUT,
+    )
@@ -0,0 +1,54 @@
+"""
+Sharded tables on a message shard that has its own database: messages,
+chat_versions and message_archive_blocks, without foreign keys (rooms
+and users live on the primary).
+"""
+VERSION = 1
+DESCRIPTION = "messages, chat_versions, message_archive_blocks"
+
+
+def upgrade(ctx):
+    from sqlalchemy import JSON, Column, DateTime, Enum, Index, Integer, LargeBinary, MetaData, String, Table, Text
+
+    metadata = MetaData()
+    Table(
+        "messages", metadata,
+        Column("id", String, primary_key=True, index=True),
+        Column("chat_room_id", String, nullable=False),
+        Column("sender_id", String, nullable=False),
+        Column("sender_name", String, nullable=False),
+        Column("sender_role", String, nullable=False),
+        Column("type", Enum("text", "file", "feedback", "system", name="messagetype"), nullable=False),
+        Column("content", Text, nullable=False),
+        Column("timestamp", DateTime, index=True),
+        Column("file_url", String, nullable=True),
+        Column("file_name", String, nullable=True),
+        Column("parent_message_id", String, nullable=True),
+        Column("feedback_ids", JSON),
+        Index("ix_messages_room_timestamp", "chat_room_id", "timestamp"),
+    )
+    Table(
+        "chat_versions", metadata,
+        Column("id", String, primary_key=True, index=True),
+        Column("chat_room_id", String, nullable=False),
+        Column("version_number", Integer, nullable=False),
+        Column("description", String, nullable=True),
+        Column("created_at", DateTime),
+        Column("created_by", String, nullable=False),
+        Column("message_ids", JSON),
+        Index("ix_chat_versions_room_number", "chat_room_id", "version_number"),
+    )
+    Table(
+        "message_archive_blocks", metadata,
+        Column("id", String, primary_key=True, index=True),
+        Column("chat_room_id", String, nullable=False),
+        Column("start_ts", DateTime, nullable=False),
+        Column("end_ts", DateTime, nullable=False),
+        Column("message_count", Integer, nullable=False),
+        Column("codec", String, nullable=False),
+        Column("id_index", LargeBinary, nullable=False),
+        Column("data", LargeBinary, nullable=False),
+        Column("created_at", DateTime),
+        Index("ix_message_archive_blocks_room_start", "chat_room_id", "start_ts"),
+    )
+    ctx.create_all(metadata)
@@ -0,0 +1,112 @@
+"""
+Baseline: the tables as create_all built them before versioned migrations
+(no-op on databases that already have them). Frozen here rather than
+taken from app.models, so later model changes only reach the schema
+through their own migration.
+"""
+VERSION = 1
+DESCRIPTION = "baseline schema"
+
+
+def baseline_metadata():
+    from sqlalchemy import (
+        JSON, Column, DateTime, Enum, ForeignKey, Index, Integer, LargeBinary, MetaData, String, Table, Text,
+    )
+
+    metadata = MetaData()
+    Table(
+        "users", metadata,
+        Column("id", String, primary_key=True, index=True),
+        Column("name", String, nullable=False),
+        Column("email", String, unique=True, index=True, nullable=False),
+        Column("password", String, nullable=False),
+        Column("role", Enum("professor", "assistant", "student", name="userrole"), nullable=False),
+        Column("profile_image", String, nullable=True),
+        Column("created_at", DateTime),
+    )
+    Table(
+        "projects", metadata,
+        Column("id", String, primary_key=True, index=True),
+        Column("name", String, nullable=False),
+        Column("description", Text, nullable=True),
+        Column("invite_code", String(6), unique=True, nullable=False, index=True),
+        Column("created_by", String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        Column("created_at", DateTime),
+        Column("deleted_at", DateTime, nullable=True),
+        Column("revision", Integer, nullable=False, server_default="0"),
+    )
+    Table(
+        "project_members", metadata,
+        Column("id", Integer, primary_key=True, index=True, autoincrement=True),
+        Column("project_id", String, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False),
+        Column("user_id", String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        Column("role", String),
+        Column("joined_at", DateTime),
+    )
+    Table(
+        "chat_rooms", metadata,
+        Column("id", String, primary_key=True, index=True),
+        Column("name", String, nullable=False),
+        Column("description", String, nullable=True),
+        Column("type", String, nullable=False),
+        Column("project_id", String, ForeignKey("projects.id", ondelete="CASCADE"), nullable=True),
+        Column("user1_id", String, ForeignKey("users.id", ondelete="CASCADE"), nullable=True),
+        Column("user2_id", String, ForeignKey("users.id", ondelete="CASCADE"), nullable=True),
+        Column("dm_key", String, unique=True, nullable=True),
+        Column("created_at", DateTime),
+        Column("updated_at", DateTime),
+        Column("deleted_at", DateTime, nullable=True),
+        Column("revision", Integer, nullable=False, server_default="0"),
+    )
+    Table(
+        "chat_room_members", metadata,
+        Column("id", Integer, primary_key=True, index=True, autoincrement=True),
+        Column("chat_room_id", String, ForeignKey("chat_rooms.id", ondelete="CASCADE"), nullable=False),
+        Column("user_id", String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        Column("joined_at", DateTime),
+        Index("ix_chat_room_members_user_room", "user_id", "chat_room_id"),
+    )
+    Table(
+        "messages", metadata,
+        Column("id", String, primary_key=True, index=True),
+        Column("chat_room_id", String, ForeignKey("chat_rooms.id", ondelete="CASCADE"), nullable=False),
+        Column("sender_id", String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        Column("sender_name", String, nullable=False),
+        Column("sender_role", String, nullable=False),
+        Column("type", Enum("text", "file", "feedback", "system", name="messagetype"), nullable=False),
+        Column("content", Text, nullable=False),
+        Column("timestamp", DateTime, index=True),
+        Column("file_url", String, nullable=True),
+        Column("file_name", String, nullable=True),
+        Column("parent_message_id", String, ForeignKey("messages.id", ondelete="SET NULL"), nullable=True),
+        Column("feedback_ids", JSON),
+        Index("ix_messages_room_timestamp", "chat_room_id", "timestamp"),
+    )
+    Table(
+        "chat_versions", metadata,
+        Column("id", String, primary_key=True, index=True),
+        Column("chat_room_id", String, ForeignKey("chat_rooms.id", ondelete="CASCADE"), nullable=False),
+        Column("version_number", Integer, nullable=False),
+        Column("description", String, nullable=True),
+        Column("created_at", DateTime),
+        Column("created_by", String, nullable=False),
+        Column("message_ids", JSON),
+    )
+    Table(
+        "message_archive_blocks", metadata,
+        Column("id", String, primary_key=True, index=True),
+        Column("chat_room_id", String, ForeignKey("chat_rooms.id", ondelete="CASCADE"), nullable=False),
+        Column("start_ts", DateTime, nullable=False),
+        Column("end_ts", DateTime, nullable=False),
+        Column("message_count", Integer, nullable=False),
+        Column("codec", String, nullable=False),
+        Column("id_index", LargeBinary, nullable=False),
+        Column("data", LargeBinary, nullable=False),
+        Column("created_at", DateTime),
+        Index("ix_message_archive_blocks_room_start", "chat_room_id", "start_ts"),
+    )
+    return metadata
+
+
+def upgrade(ctx):
+    ctx.create_all(baseline_metadata())
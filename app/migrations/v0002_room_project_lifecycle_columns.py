@@ -0,0 +1,18 @@
+"""
+Columns added after the original schema: DM pair key, soft-delete
+timestamps and ETag revisions. Databases created before them only got
+the new tables from create_all, never the new columns.
+"""
+VERSION = 2
+DESCRIPTION = "chat_rooms.dm_key/deleted_at/revision, projects.deleted_at/revision"
+
+
+def upgrade(ctx):
+    if not ctx.has_column("chat_rooms", "dm_key"):
+        ctx.add_column("chat_rooms", "dm_key", "VARCHAR")
+        # 새로 만든 DB는 CREATE TABLE의 UNIQUE 제약이 같은 역할을 한다
+        ctx.create_index("ix_chat_rooms_dm_key", "chat_rooms", ["dm_key"], unique=True)
+
+    for table in ("chat_rooms", "projects"):
+        ctx.add_column(table, "deleted_at", "TIMESTAMP")
+        ctx.add_column(table, "revision", "INTEGER NOT NULL DEFAULT 0")
@@ -0,0 +1,13 @@
+"""
+Composite indexes for room history and membership lookups. Built with
+CREATE INDEX CONCURRENTLY on Postgres so writes keep flowing while the
+index builds on a large messages table.
+"""
+VERSION = 3
+DESCRIPTION = "messages(chat_room_id, timestamp), chat_room_members(user_id, chat_room_id)"
+TRANSACTIONAL = False
+
+
+def upgrade(ctx):
+    ctx.create_index("ix_messages_room_timestamp", "messages", ["chat_room_id", "timestamp"])
+    ctx.create_index("ix_chat_room_members_user_room", "chat_room_members", ["user_id", "chat_room_id"])
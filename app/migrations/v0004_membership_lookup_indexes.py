@@ -0,0 +1,21 @@
+"""
+Composite indexes for the membership checks, room/project member lists,
+project chat room lookup and version listing. Found by
+benchmarks/query_plans.py: each of these queries scanned its whole table.
+"""
+VERSION = 4
+DESCRIPTION = "membership, project room and version lookup indexes"
+TRANSACTIONAL = False
+
+INDEXES = [
+    ("ix_chat_room_members_room_user", "chat_room_members", ["chat_room_id", "user_id"]),
+    ("ix_project_members_project_user", "project_members", ["project_id", "user_id"]),
+    ("ix_project_members_user_project", "project_members", ["user_id", "project_id"]),
+    ("ix_chat_rooms_project_type", "chat_rooms", ["project_id", "type"]),
+    ("ix_chat_versions_room_number", "chat_versions", ["chat_room_id", "version_number"]),
+]
+
+
+def upgrade(ctx):
+    for name, table, columns in INDEXES:
+        ctx.create_index(name, table, columns)
@@ -0,0 +1,16 @@
+"""Room -> message shard directory (see app/utils/sharding.py)."""
+VERSION = 5
+DESCRIPTION = "room_shards directory table"
+
+
+def upgrade(ctx):
+    from sqlalchemy import Column, DateTime, MetaData, String, Table
+
+    metadata = MetaData()
+    Table(
+        "room_shards", metadata,
+        Column("chat_room_id", String, primary_key=True),
+        Column("shard", String, nullable=False),
+        Column("assigned_at", DateTime),
+    )
+    ctx.create_all(metadata)
@@ -0,0 +1,11 @@
+"""
+Server-side admin flag. Admin endpoints used to accept any professor, and
+role is chosen by the caller at signup; is_admin can only be granted with
+python -m app.utils.admins.
+"""
+VERSION = 6
+DESCRIPTION = "users.is_admin"
+
+
+def upgrade(ctx):
+    ctx.add_column("users", "is_admin", "BOOLEAN NOT NULL DEFAULT '0'")
@@ -0,0 +1,7 @@
+"""Write lock on the room shard directory, held while a room is moved between shards."""
+VERSION = 7
+DESCRIPTION = "room_shards.locked_at"
+
+
+def upgrade(ctx):
+    ctx.add_column("room_shards", "locked_at", "TIMESTAMP")
@@ -0,0 +1,62 @@
+"""
+Pair keys for DMs created before dm_key existed (previously a startup
+hook that every worker ran outside the migration lock), and a unique
+(chat_room_id, user_id) index on chat_room_members.
+
+Duplicate legacy DMs between the same two users stay as separate rooms:
+their messages may live on another message shard, which this migration
+cannot reach. The oldest room (or the one that already has the key) gets
+dm_key; every room of the pair gets membership rows for both users, so
+all of them show up in /api/chat/dm/my.
+"""
+from datetime import datetime
+
+VERSION = 8
+DESCRIPTION = "backfill chat_rooms.dm_key, unique chat_room_members(chat_room_id, user_id)"
+
+
+def _backfill_dm_keys(ctx):
+    rooms = ctx.execute(
+        "SELECT id, user1_id, user2_id, dm_key FROM chat_rooms "
+        "WHERE type = 'dm' AND deleted_at IS NULL "
+        "AND user1_id IS NOT NULL AND user2_id IS NOT NULL "
+        "ORDER BY created_at, id"
+    ).all()
+
+    pairs = {}
+    for room in rooms:
+        low, high = sorted((room.user1_id, room.user2_id))
+        pairs.setdefault(f"{low}:{high}", []).append(room)
+
+    now = datetime.utcnow()
+    for key, pair_rooms in pairs.items():
+        if not any(room.dm_key == key for room in pair_rooms):
+            taken = ctx.execute("SELECT 1 FROM chat_rooms WHERE dm_key = :key", {"key": key}).first()
+            if not taken:
+                ctx.execute("UPDATE chat_rooms SET dm_key = :key WHERE id = :id", {"key": key, "id": pair_rooms[0].id})
+
+        for room in pair_rooms:
+            members = {
+                row.user_id for row in ctx.execute(
+                    "SELECT user_id FROM chat_room_members WHERE chat_room_id = :room_id", {"room_id": room.id}
+                )
+            }
+            for user_id in {room.user1_id, room.user2_id} - members:
+                ctx.execute(
+                    "INSERT INTO chat_room_members (chat_room_id, user_id, joined_at) "
+                    "VALUES (:room_id, :user_id, :joined_at)",
+                    {"room_id": room.id, "user_id": user_id, "joined_at": now},
+                )
+
+
+def upgrade(ctx):
+    _backfill_dm_keys(ctx)
+
+    # 중복 멤버십은 가장 먼저 생긴 행만 남긴다
+    ctx.execute(
+        "DELETE FROM chat_room_members WHERE id NOT IN ("
+        "SELECT MIN(id) FROM chat_room_members GROUP BY chat_room_id, user_id)"
+    )
+    # v0004의 같은 컬럼 인덱스를 유니크로 바꾼다
+    ctx.execute("DROP INDEX IF EXISTS ix_chat_room_members_room_user")
+    ctx.create_index("ix_chat_room_members_room_user", "chat_room_members", ["chat_room_id", "user_id"], unique=True)
@@ -3,6 +3,8 @@ from app.models.chat_room import ChatRoom, ChatRoomMember
 from app.models.message import Message, MessageType
 from app.models.version import ChatVersion
 from app.models.project import Project, ProjectMember
+from app.models.archive import MessageArchiveBlock
+from app.models.shard import RoomShard
 
 __all__ = [
     "User",
@@ -14,4 +16,6 @@ __all__ = [
     "ChatVersion",
     "Project",
     "ProjectMember",
+    "MessageArchiveBlock",
+    "RoomShard",
 ]
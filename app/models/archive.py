@@ -0,0 +1,30 @@
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, LargeBinary, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.config import Base
+
+class MessageArchiveBlock(Base):
+    __tablename__ = "message_archive_blocks"
+
+    id = Column(String, primary_key=True, index=True)
+    chat_room_id = Column(String, ForeignKey("chat_rooms.id", ondelete="CASCADE"), nullable=False)
+
+    # 블록에 포함된 메시지의 시간 범위 (블록끼리는 겹치지 않음)
+    start_ts = Column(DateTime, nullable=False)
+    end_ts = Column(DateTime, nullable=False)
+    message_count = Column(Integer, nullable=False)
+
+    codec = Column(String, nullable=False, default="zlib")
+    # 압축된 메시지 ID 목록 (버전 조회 시 어떤 블록을 풀어야 하는지 찾는 용도)
+    id_index = Column(LargeBinary, nullable=False)
+    # 압축된 메시지 JSON 배열 (timestamp, id 순)
+    data = Column(LargeBinary, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Relationships
+    chat_room = relationship("ChatRoom", back_populates="archive_blocks")
+
+    __table_args__ = (
+        Index("ix_message_archive_blocks_room_start", "chat_room_id", "start_ts"),
+    )
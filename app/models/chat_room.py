@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Integer
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.config import Base
@@ -17,17 +17,29 @@ class ChatRoom(Base):
     # For DM chat rooms
     user1_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
     user2_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    # 정렬된 "작은ID:큰ID" 쌍 - 같은 두 사람 사이의 DM은 하나만 존재
+    dm_key = Column(String, unique=True, nullable=True)
 
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # 삭제 요청 시각 (실제 행 삭제는 백그라운드 purge 작업이 처리)
+    deleted_at = Column(DateTime, nullable=True)
+    # 응답 내용이 바뀔 때마다 증가 (ETag 계산용)
+    revision = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Relationships
     project = relationship("Project", back_populates="chat_rooms")
     user1 = relationship("User", foreign_keys=[user1_id])
     user2 = relationship("User", foreign_keys=[user2_id])
-    members = relationship("ChatRoomMember", back_populates="chat_room", cascade="all, delete-orphan")
-    messages = relationship("Message", back_populates="chat_room", cascade="all, delete-orphan")
-    versions = relationship("ChatVersion", back_populates="chat_room", cascade="all, delete-orphan")
+    members = relationship("ChatRoomMember", back_populates="chat_room", cascade="all, delete-orphan", passive_deletes=True)
+    messages = relationship("Message", back_populates="chat_room", cascade="all, delete-orphan", passive_deletes=True)
+    versions = relationship("ChatVersion", back_populates="chat_room", cascade="all, delete-orphan", passive_deletes=True)
+    archive_blocks = relationship("MessageArchiveBlock", back_populates="chat_room", cascade="all, delete-orphan", passive_deletes=True)
+
+    # 프로젝트 채팅방 조회와 프로젝트 purge (project_id만으로도 사용)
+    __table_args__ = (
+        Index("ix_chat_rooms_project_type", "project_id", "type"),
+    )
 
 class ChatRoomMember(Base):
     __tablename__ = "chat_room_members"
@@ -40,3 +52,9 @@ class ChatRoomMember(Base):
     # Relationships
     chat_room = relationship("ChatRoom", back_populates="members")
     user = relationship("User", back_populates="chat_room_members")
+
+    __table_args__ = (
+        Index("ix_chat_room_members_user_room", "user_id", "chat_room_id"),
+        # 멤버 확인과 방 멤버 목록 (같은 사람이 한 방에 두 번 들어가지 않도록 유니크)
+        Index("ix_chat_room_members_room_user", "chat_room_id", "user_id", unique=True),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Enum, Text, JSON
+from sqlalchemy import Column, String, DateTime, ForeignKey, Enum, Text, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -34,3 +34,8 @@ class Message(Base):
     chat_room = relationship("ChatRoom", back_populates="messages")
     sender = relationship("User", back_populates="messages", foreign_keys=[sender_id])
     parent_message = relationship("Message", remote_side=[id], foreign_keys=[parent_message_id])
+
+    # 방별 시간순 조회 (get_messages, 버전 생성, 아카이브)
+    __table_args__ = (
+        Index("ix_messages_room_timestamp", "chat_room_id", "timestamp"),
+    )
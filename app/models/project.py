@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Text
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.config import Base
@@ -12,11 +12,15 @@ class Project(Base):
     invite_code = Column(String(6), unique=True, nullable=False, index=True)
     created_by = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # 삭제 요청 시각 (실제 행 삭제는 백그라운드 purge 작업이 처리)
+    deleted_at = Column(DateTime, nullable=True)
+    # 응답 내용이 바뀔 때마다 증가 (ETag 계산용)
+    revision = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Relationships
     creator = relationship("User", foreign_keys=[created_by])
-    members = relationship("ProjectMember", back_populates="project", cascade="all, delete-orphan")
-    chat_rooms = relationship("ChatRoom", back_populates="project", cascade="all, delete-orphan")
+    members = relationship("ProjectMember", back_populates="project", cascade="all, delete-orphan", passive_deletes=True)
+    chat_rooms = relationship("ChatRoom", back_populates="project", cascade="all, delete-orphan", passive_deletes=True)
 
 
 class ProjectMember(Base):
@@ -31,3 +35,10 @@ class ProjectMember(Base):
     # Relationships
     project = relationship("Project", back_populates="members")
     user = relationship("User", back_populates="project_memberships")
+
+    __table_args__ = (
+        # 멤버 확인과 프로젝트 멤버 목록
+        Index("ix_project_members_project_user", "project_id", "user_id"),
+        # 내 프로젝트 목록
+        Index("ix_project_members_user_project", "user_id", "project_id"),
+    )
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, DateTime
+from datetime import datetime
+from app.config import Base
+
+class RoomShard(Base):
+    __tablename__ = "room_shards"
+
+    # 메시지/버전/보관 블록이 저장된 샤드 (방을 만들 때 chat_room_id 해시로 정해 기록)
+    chat_room_id = Column(String, primary_key=True)
+    shard = Column(String, nullable=False)
+    assigned_at = Column(DateTime, default=datetime.utcnow)
+    # 방 이동 중에는 쓰기를 막는다 (move_room이 설정하고 해제)
+    locked_at = Column(DateTime, nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Enum
+from sqlalchemy import Column, String, DateTime, Enum, Boolean
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -18,6 +18,8 @@ class User(Base):
     password = Column(String, nullable=False)  # hashed password
     role = Column(Enum(UserRole), nullable=False)
     profile_image = Column(String, nullable=True)
+    # 관리 API 권한 - 가입 시 지정할 수 없고 python -m app.utils.admins 로만 부여
+    is_admin = Column(Boolean, nullable=False, default=False, server_default="0")
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # Relationships
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, JSON
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.config import Base
@@ -18,3 +18,8 @@ class ChatVersion(Base):
 
     # Relationships
     chat_room = relationship("ChatRoom", back_populates="versions")
+
+    # 방별 버전 목록과 다음 버전 번호 계산
+    __table_args__ = (
+        Index("ix_chat_versions_room_number", "chat_room_id", "version_number"),
+    )
@@ -64,3 +64,31 @@ class VersionResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+# Import Schemas
+class MessageImport(BaseModel):
+    id: Optional[str] = None
+    chat_room_id: str
+    sender_id: str
+    sender_name: Optional[str] = None
+    sender_role: Optional[str] = None
+    type: MessageType = MessageType.text
+    content: str
+    timestamp: datetime
+    file_url: Optional[str] = None
+    file_name: Optional[str] = None
+    parent_message_id: Optional[str] = None
+    feedback_ids: List[str] = []
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+class ImportResult(BaseModel):
+    inserted: int
+    skipped: int
+    failed: int
+    last_line: int
+    elapsed_seconds: float
+    rows_per_second: float
+    errors: List[ImportRowError] = []
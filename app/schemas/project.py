@@ -55,3 +55,11 @@ class ProjectWithMembers(ProjectResponse):
 
     class Config:
         from_attributes = True
+
+
+# Project dashboard item (one row per project of the current user)
+class ProjectDashboardItem(ProjectResponse):
+    member_count: int
+    my_role: str
+    chat_room_id: Optional[str] = None
+    last_activity_at: Optional[datetime] = None
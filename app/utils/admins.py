@@ -0,0 +1,55 @@
+"""
+Grant or revoke access to the admin endpoints (import, archive, slow query
+log, profiler, hashing stats). The flag is never set through the API.
+
+    python -m app.utils.admins grant someone@example.com
+    python -m app.utils.admins revoke someone@example.com
+    python -m app.utils.admins list
+"""
+import argparse
+from typing import List, Optional
+from app.config import SessionLocal
+from app.models.user import User
+
+
+def set_admin(email: str, is_admin: bool) -> bool:
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.email == email).first()
+        if not user:
+            return False
+        user.is_admin = is_admin
+        db.commit()
+        return True
+    finally:
+        db.close()
+
+
+def list_admins() -> List[str]:
+    db = SessionLocal()
+    try:
+        return [row.email for row in db.query(User.email).filter(User.is_admin.is_(True)).order_by(User.email)]
+    finally:
+        db.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Manage admin accounts")
+    parser.add_argument("command", choices=["grant", "revoke", "list"])
+    parser.add_argument("email", nargs="?")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for email in list_admins():
+            print(email)
+        return
+
+    if not args.email:
+        parser.error("email is required")
+    if not set_admin(args.email, args.command == "grant"):
+        raise SystemExit(f"User not found: {args.email}")
+    print(f"{args.email}: admin {'granted' if args.command == 'grant' else 'revoked'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Admission control for HTTP requests.
+
+Each route class (auth, chat reads, chat writes, exports, everything else)
+gets a concurrency limit and a bounded wait queue. Exports hold their slot
+until the whole file is streamed, so they get a small class of their own
+instead of occupying chat_read slots. CORS preflights are never queued. A request that cannot start
+within the queue deadline, or finds the queue full, is rejected right away
+with 503 + Retry-After. Under overload the server keeps completing
+requests at its real capacity instead of letting every request pile up
+and time out.
+"""
+import asyncio
+import time
+from typing import Dict, Optional
+from app.utils.serialization import dumps
+
+# 대기열/동시 실행 제한을 적용하지 않는 경로
+EXEMPT_PATHS = ("/", "/health", "/metrics", "/docs", "/redoc", "/openapi.json")
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    """Admission class of a request, or None to let it through unqueued."""
+    if method == "OPTIONS":
+        # CORS preflight은 CORSMiddleware가 바로 응답한다
+        return None
+    if path.startswith("/api/auth"):
+        return "auth"
+    if path.startswith("/api/chat"):
+        if path.endswith("/export"):
+            return "export"
+        return "chat_read" if method in ("GET", "HEAD") else "chat_write"
+    return "default"
+
+
+class AdmissionGate:
+    def __init__(self, name: str, limit: int, queue_limit: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue_limit = queue_limit
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(limit)
+
+        self.active = 0
+        self.waiting = 0
+        self.admitted_total = 0
+        self.shed_total = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    async def acquire(self) -> bool:
+        """Returns False when the request should be shed."""
+        if self._semaphore.locked() and self.waiting >= self.queue_limit:
+            self.shed_total += 1
+            return False
+
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.shed_total += 1
+            return False
+        finally:
+            self.waiting -= 1
+
+        waited = time.monotonic() - started
+        self.active += 1
+        self.admitted_total += 1
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        return True
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            "queue_limit": self.queue_limit,
+            "saturation": round(self.active / self.limit, 2) if self.limit else 0.0,
+            "admitted_total": self.admitted_total,
+            "shed_total": self.shed_total,
+            "avg_wait_ms": round(self.wait_seconds_total / self.admitted_total * 1000, 2) if self.admitted_total else 0.0,
+            "max_wait_ms": round(self.wait_seconds_max * 1000, 2),
+        }
+
+
+class AdmissionController:
+    def __init__(self, limits: Dict[str, int], queue_limit: int, queue_timeout: float, enabled: bool = True):
+        self.enabled = enabled
+        self.queue_timeout = queue_timeout
+        self.gates = {
+            name: AdmissionGate(name, limit, queue_limit, queue_timeout)
+            for name, limit in limits.items()
+        }
+
+    def gate_for(self, method: str, path: str) -> Optional[AdmissionGate]:
+        name = route_class(method, path)
+        if name is None:
+            return None
+        return self.gates.get(name) or self.gates.get("default")
+
+    def saturated(self) -> bool:
+        return any(gate.waiting > 0 for gate in self.gates.values())
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "saturated": self.saturated(),
+            "classes": {name: gate.stats() for name, gate in self.gates.items()},
+        }
+
+
+class AdmissionMiddleware:
+    """
+    Pure ASGI middleware (not BaseHTTPMiddleware) so streaming responses
+    keep their slot until the body has been sent. WebSockets pass through.
+    """
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.controller.enabled or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        gate = self.controller.gate_for(scope["method"], scope["path"])
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await gate.acquire():
+            await self._shed(send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
+
+    async def _shed(self, send):
+        body = dumps({"detail": "Server is busy, please retry"})
+        retry_after = str(max(1, int(self.controller.queue_timeout + 0.999)))
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", retry_after.encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,440 @@
+"""
+Hot/cold tiering for chat messages.
+
+Messages older than MESSAGE_ARCHIVE_AFTER_DAYS are moved out of the
+`messages` table into zlib-compressed blocks (one block per room per day,
+at most MESSAGE_ARCHIVE_BLOCK_SIZE messages). Readers merge the archive
+and the hot table transparently and only decompress the blocks a request
+actually touches.
+
+Invariants:
+- Blocks of a room never overlap; each run only archives messages after
+  the room's last archived (timestamp, id), so consecutive blocks may
+  share a boundary timestamp but never a message.
+- Messages that still have a hot feedback pointing at them stay hot
+  ("pinned"), so the parent_message_id FK never loses its target. Pinned
+  rows older than the archive end are merged into the archive order on read.
+
+Usage:
+    python -m app.utils.archive [--days N]
+"""
+import argparse
+import json
+import zlib
+from datetime import datetime, timedelta
+from itertools import groupby, islice
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from uuid import uuid4
+from sqlalchemy import and_, delete, func, or_
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.archive import MessageArchiveBlock
+from app.models.message import Message, MessageType
+from app.utils.serialization import MESSAGE_COLUMNS, message_rows
+
+ARCHIVE_CODEC = "zlib"
+# 한 번 실행에서 방 하나당 만들 최대 블록 수 (트랜잭션 크기 제한)
+MAX_BLOCKS_PER_RUN = 20
+HOT_BATCH_SIZE = 500
+
+ARCHIVED_FIELDS = (
+    "id",
+    "chat_room_id",
+    "sender_id",
+    "sender_name",
+    "sender_role",
+    "type",
+    "content",
+    "timestamp",
+    "file_url",
+    "file_name",
+    "parent_message_id",
+    "feedback_ids",
+)
+
+
+class ArchivedMessage:
+    """Read-only stand-in for a Message row restored from an archive block."""
+    __slots__ = ARCHIVED_FIELDS
+
+    def __init__(self, **values):
+        for field in ARCHIVED_FIELDS:
+            setattr(self, field, values.get(field))
+
+
+# ---------- encoding ----------
+
+def _compress(payload) -> bytes:
+    return zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def _decompress(data: bytes):
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+
+def _encode_message(message: Message) -> dict:
+    return {
+        "id": message.id,
+        "chat_room_id": message.chat_room_id,
+        "sender_id": message.sender_id,
+        "sender_name": message.sender_name,
+        "sender_role": message.sender_role,
+        "type": message.type.value,
+        "content": message.content,
+        "timestamp": message.timestamp.isoformat(),
+        "file_url": message.file_url,
+        "file_name": message.file_name,
+        "parent_message_id": message.parent_message_id,
+        "feedback_ids": message.feedback_ids or [],
+    }
+
+
+def _decode_message(item: dict) -> ArchivedMessage:
+    return ArchivedMessage(**dict(
+        item,
+        type=MessageType(item["type"]),
+        timestamp=datetime.fromisoformat(item["timestamp"]),
+    ))
+
+
+def decode_block(block: MessageArchiveBlock) -> List[ArchivedMessage]:
+    return [_decode_message(item) for item in _decompress(block.data)]
+
+
+def _sort_key(message):
+    return (message.timestamp, message.id)
+
+
+# ---------- block metadata ----------
+
+def _block_metas(db: Session, room_id: str):
+    # data 컬럼은 읽지 않는다
+    return db.query(
+        MessageArchiveBlock.id,
+        MessageArchiveBlock.start_ts,
+        MessageArchiveBlock.end_ts,
+        MessageArchiveBlock.message_count,
+    ).filter(
+        MessageArchiveBlock.chat_room_id == room_id
+    ).order_by(MessageArchiveBlock.start_ts).all()
+
+
+def _load_block(db: Session, block_id: str) -> MessageArchiveBlock:
+    return db.query(MessageArchiveBlock).filter(MessageArchiveBlock.id == block_id).one()
+
+
+def archive_end(db: Session, room_id: str) -> Optional[datetime]:
+    return db.query(func.max(MessageArchiveBlock.end_ts)).filter(
+        MessageArchiveBlock.chat_room_id == room_id
+    ).scalar()
+
+
+def archive_cursor(db: Session, room_id: str) -> Optional[Tuple[datetime, str]]:
+    """(timestamp, id) of the room's last archived message, the point the next run continues from."""
+    end = archive_end(db, room_id)
+    if end is None:
+        return None
+    # 블록의 마지막 메시지는 end_ts 시각이므로 id 인덱스의 마지막 항목만 보면 된다
+    last_ids = [
+        _decompress(row.id_index)[-1] for row in db.query(MessageArchiveBlock.id_index).filter(
+            MessageArchiveBlock.chat_room_id == room_id,
+            MessageArchiveBlock.end_ts == end
+        )
+    ]
+    return end, max(last_ids)
+
+
+def archived_message_count(db: Session, room_id: str) -> int:
+    return db.query(func.coalesce(func.sum(MessageArchiveBlock.message_count), 0)).filter(
+        MessageArchiveBlock.chat_room_id == room_id
+    ).scalar()
+
+
+# ---------- reads ----------
+
+def load_room_message_rows(db: Session, room_id: str, skip: int = 0, limit: int = 100) -> List[dict]:
+    """
+    One page of a room's history as response dicts. When nothing is
+    archived this is a plain indexed query selecting only the response columns.
+    """
+    if not db.query(MessageArchiveBlock.id).filter(MessageArchiveBlock.chat_room_id == room_id).first():
+        rows = db.query(*MESSAGE_COLUMNS).filter(
+            Message.chat_room_id == room_id
+        ).order_by(Message.timestamp, Message.id).offset(skip).limit(limit).all()
+        return message_rows(rows)
+
+    return message_rows(islice(iter_room_history(db, room_id, skip, hot_limit=limit), limit))
+
+
+def iter_room_history(db: Session, room_id: str, skip: int = 0, hot_limit: Optional[int] = None) -> Iterator:
+    """
+    Yield every message of a room (archived and hot) in (timestamp, id)
+    order, starting at position `skip`. Whole blocks before `skip` are
+    skipped using their message_count without being decompressed.
+    """
+    metas = _block_metas(db, room_id)
+    hot_query = db.query(Message).filter(Message.chat_room_id == room_id)
+
+    if not metas:
+        yield from hot_query.order_by(
+            Message.timestamp, Message.id
+        ).offset(skip).limit(hot_limit).yield_per(HOT_BATCH_SIZE)
+        return
+
+    end = max(meta.end_ts for meta in metas)
+
+    # archive 범위 안에 남아 있는 hot 메시지 (피드백 부모 등)
+    pinned = hot_query.filter(Message.timestamp <= end).order_by(Message.timestamp, Message.id).all()
+    pinned_ids = {message.id for message in pinned}
+    pinned_pos = 0
+
+    for meta in metas:
+        # 이 블록보다 앞선 pinned 메시지
+        while pinned_pos < len(pinned) and pinned[pinned_pos].timestamp < meta.start_ts:
+            if skip:
+                skip -= 1
+            else:
+                yield pinned[pinned_pos]
+            pinned_pos += 1
+
+        overlapping = [
+            message for message in pinned[pinned_pos:]
+            if message.timestamp <= meta.end_ts
+        ]
+        if not overlapping and skip >= meta.message_count:
+            skip -= meta.message_count
+            continue
+
+        rows = [
+            message for message in decode_block(_load_block(db, meta.id))
+            if message.id not in pinned_ids
+        ]
+        rows.extend(overlapping)
+        rows.sort(key=_sort_key)
+        pinned_pos += len(overlapping)
+
+        for message in rows:
+            if skip:
+                skip -= 1
+            else:
+                yield message
+
+    for message in pinned[pinned_pos:]:
+        if skip:
+            skip -= 1
+        else:
+            yield message
+
+    yield from hot_query.filter(Message.timestamp > end).order_by(
+        Message.timestamp, Message.id
+    ).offset(skip).limit(hot_limit).yield_per(HOT_BATCH_SIZE)
+
+
+def room_message_ids(db: Session, room_id: str) -> List[str]:
+    """All message ids of a room in timestamp order, reading only the block id indexes."""
+    metas = _block_metas(db, room_id)
+    if not metas:
+        return [row.id for row in db.query(Message.id).filter(
+            Message.chat_room_id == room_id
+        ).order_by(Message.timestamp, Message.id)]
+
+    # 순서 정보가 필요하므로 pinned 메시지가 있으면 전체 이력을 따라간다
+    end = max(meta.end_ts for meta in metas)
+    has_pinned = db.query(Message.id).filter(
+        Message.chat_room_id == room_id,
+        Message.timestamp <= end
+    ).first()
+    if has_pinned:
+        return [message.id for message in iter_room_history(db, room_id)]
+
+    ids = []
+    for meta in metas:
+        index = db.query(MessageArchiveBlock.id_index).filter(MessageArchiveBlock.id == meta.id).scalar()
+        ids.extend(_decompress(index))
+    ids.extend(row.id for row in db.query(Message.id).filter(
+        Message.chat_room_id == room_id,
+        Message.timestamp > end
+    ).order_by(Message.timestamp, Message.id))
+    return ids
+
+
+def find_archived_messages(db: Session, room_id: Optional[str], message_ids: Iterable[str]) -> Dict[str, ArchivedMessage]:
+    """
+    Look up archived messages by id. Only the compressed id indexes are
+    scanned; a block's payload is decompressed only if it holds a match.
+    """
+    wanted: Set[str] = set(message_ids)
+    found: Dict[str, ArchivedMessage] = {}
+    if not wanted:
+        return found
+
+    query = db.query(MessageArchiveBlock.id, MessageArchiveBlock.id_index)
+    if room_id:
+        query = query.filter(MessageArchiveBlock.chat_room_id == room_id)
+
+    for block_id, id_index in query.order_by(MessageArchiveBlock.start_ts):
+        if wanted.isdisjoint(_decompress(id_index)):
+            continue
+        for message in decode_block(_load_block(db, block_id)):
+            if message.id in wanted:
+                found[message.id] = message
+                wanted.discard(message.id)
+        if not wanted:
+            break
+
+    return found
+
+
+def load_messages_by_ids(db: Session, room_id: Optional[str], message_ids: List[str]) -> list:
+    """Fetch messages by id from the hot table, falling back to the archive."""
+    messages = []
+    for start in range(0, len(message_ids), HOT_BATCH_SIZE):
+        chunk = message_ids[start:start + HOT_BATCH_SIZE]
+        messages.extend(db.query(Message).filter(Message.id.in_(chunk)).all())
+
+    missing = set(message_ids) - {message.id for message in messages}
+    if missing:
+        messages.extend(find_archived_messages(db, room_id, missing).values())
+
+    messages.sort(key=_sort_key)
+    return messages
+
+
+def restore_message(db: Session, room_id: str, message_id: str) -> Optional[Message]:
+    """
+    Copy an archived message back into the hot table (e.g. when someone
+    replies to it). The hot copy is pinned and takes precedence on read.
+    """
+    archived = find_archived_messages(db, room_id, [message_id]).get(message_id)
+    if not archived:
+        return None
+
+    message = Message(**{field: getattr(archived, field) for field in ARCHIVED_FIELDS})
+    # 부모가 hot 테이블에 없으면 FK 위반이 되므로 링크는 블록 데이터에만 남긴다
+    if message.parent_message_id and not db.query(Message.id).filter(
+        Message.id == message.parent_message_id
+    ).first():
+        message.parent_message_id = None
+    db.add(message)
+    db.flush()
+    return message
+
+
+# ---------- archiver ----------
+
+def _pinned_parent_ids(db: Session, room_id: str, archiving: Set[str]) -> Set[str]:
+    # 이번에 보관하지 않는(hot으로 남는) 피드백이 가리키는 부모 메시지
+    return {
+        row.parent_message_id for row in db.query(Message.id, Message.parent_message_id).filter(
+            Message.chat_room_id == room_id,
+            Message.parent_message_id.isnot(None)
+        )
+        if row.id not in archiving
+    }
+
+
+def archive_room(
+    db: Session,
+    room_id: str,
+    cutoff: datetime,
+    block_size: Optional[int] = None,
+    max_blocks: int = MAX_BLOCKS_PER_RUN,
+) -> int:
+    """
+    Move messages of one room older than `cutoff` into archive blocks.
+    Everything happens in a single transaction bounded by
+    max_blocks * block_size rows. Returns the number of archived messages.
+    """
+    block_size = block_size or settings.MESSAGE_ARCHIVE_BLOCK_SIZE
+    cursor = archive_cursor(db, room_id)
+
+    query = db.query(Message).filter(
+        Message.chat_room_id == room_id,
+        Message.timestamp < cutoff
+    )
+    if cursor is not None:
+        end_ts, end_id = cursor
+        query = query.filter(or_(
+            Message.timestamp > end_ts,
+            and_(Message.timestamp == end_ts, Message.id > end_id)
+        ))
+    query = query.order_by(Message.timestamp, Message.id).limit(block_size * max_blocks)
+
+    candidates = query.all()
+    pinned = _pinned_parent_ids(db, room_id, {message.id for message in candidates})
+    candidates = [message for message in candidates if message.id not in pinned]
+    if not candidates:
+        return 0
+
+    archived_ids = []
+    for _, day_messages in groupby(candidates, key=lambda m: m.timestamp.date()):
+        day_messages = list(day_messages)
+        for offset in range(0, len(day_messages), block_size):
+            chunk = day_messages[offset:offset + block_size]
+            db.add(MessageArchiveBlock(
+                id=str(uuid4()),
+                chat_room_id=room_id,
+                start_ts=chunk[0].timestamp,
+                end_ts=chunk[-1].timestamp,
+                message_count=len(chunk),
+                codec=ARCHIVE_CODEC,
+                id_index=_compress([message.id for message in chunk]),
+                data=_compress([_encode_message(message) for message in chunk]),
+            ))
+            archived_ids.extend(message.id for message in chunk)
+
+    db.flush()
+
+    # 최신 메시지부터 지워서 부모가 먼저 지워지며 피드백 링크가 SET NULL 되는 것을 막는다
+    archived_ids.reverse()
+    for offset in range(0, len(archived_ids), HOT_BATCH_SIZE):
+        chunk = archived_ids[offset:offset + HOT_BATCH_SIZE]
+        db.execute(
+            delete(Message).where(Message.id.in_(chunk)).execution_options(synchronize_session=False)
+        )
+
+    db.commit()
+    return len(archived_ids)
+
+
+def archive_old_messages(db: Session, older_than_days: Optional[int] = None) -> Dict[str, int]:
+    """Archive every room until nothing older than the cutoff is left. Returns room_id -> count."""
+    days = older_than_days if older_than_days is not None else settings.MESSAGE_ARCHIVE_AFTER_DAYS
+    if not days:
+        return {}
+
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    room_ids = [
+        row.chat_room_id for row in db.query(Message.chat_room_id).filter(
+            Message.timestamp < cutoff
+        ).distinct()
+    ]
+
+    result = {}
+    for room_id in room_ids:
+        total = 0
+        while True:
+            count = archive_room(db, room_id, cutoff)
+            total += count
+            if not count:
+                break
+        if total:
+            result[room_id] = total
+    return result
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Archive old chat messages into compressed blocks")
+    parser.add_argument("--days", type=int, help="archive messages older than N days (default: MESSAGE_ARCHIVE_AFTER_DAYS)")
+    args = parser.parse_args(argv)
+
+    from app.utils.sharding import message_shards
+
+    results = message_shards.fan_out(lambda shard, db: archive_old_messages(db, args.days))
+    result = {room_id: count for shard_result in results.values() for room_id, count in shard_result.items()}
+
+    print(f"archived {sum(result.values())} messages from {len(result)} rooms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+from datetime import datetime
+from typing import Tuple
+from uuid import uuid4
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.user import User
+from app.models.chat_room import ChatRoom, ChatRoomMember
+from app.utils.sharding import message_shards
+
+
+def dm_pair_key(user_a_id: str, user_b_id: str) -> str:
+    """Canonical key for a DM between two users, independent of who opened it."""
+    low, high = sorted((user_a_id, user_b_id))
+    return f"{low}:{high}"
+
+
+def _insert_dm_ignore_conflict(db: Session, values: dict) -> bool:
+    """
+    INSERT ... ON CONFLICT (dm_key) DO NOTHING.
+    Returns True if this call created the row.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        dialect_insert = None
+
+    if dialect_insert is not None:
+        stmt = dialect_insert(ChatRoom.__table__).values(**values).on_conflict_do_nothing(
+            index_elements=["dm_key"]
+        )
+        return db.execute(stmt).rowcount == 1
+
+    savepoint = db.begin_nested()
+    try:
+        db.execute(insert(ChatRoom.__table__).values(**values))
+        savepoint.commit()
+        return True
+    except IntegrityError:
+        savepoint.rollback()
+        return False
+
+
+def get_or_create_dm(db: Session, user: User, other_user: User) -> Tuple[ChatRoom, bool]:
+    """
+    Atomic get-or-create of the DM room between two users.
+    Two concurrent requests always end up with the same room.
+    """
+    key = dm_pair_key(user.id, other_user.id)
+
+    dm = db.query(ChatRoom).filter(ChatRoom.dm_key == key).first()
+    if dm:
+        return dm, False
+
+    now = datetime.utcnow()
+    room_id = str(uuid4())
+    created = _insert_dm_ignore_conflict(db, {
+        "id": room_id,
+        "name": f"DM: {user.name} - {other_user.name}",
+        "description": "Direct Message",
+        "type": "dm",
+        "user1_id": user.id,
+        "user2_id": other_user.id,
+        "dm_key": key,
+        "created_at": now,
+        "updated_at": now,
+    })
+
+    if created:
+        # 멤버십 행을 같이 만들어 두면 "내 DM" 목록을 멤버 인덱스로 조회할 수 있다
+        db.add_all([
+            ChatRoomMember(chat_room_id=room_id, user_id=user.id, joined_at=now),
+            ChatRoomMember(chat_room_id=room_id, user_id=other_user.id, joined_at=now),
+        ])
+        message_shards.pin_new_room(db, room_id)
+    db.commit()
+
+    dm = db.query(ChatRoom).filter(ChatRoom.dm_key == key).one()
+    return dm, created
+
@@ -0,0 +1,53 @@
+import hashlib
+from typing import Optional
+from fastapi import Request, Response
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag from cheap version parts (ids, revision counters, paging params)."""
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header: Optional[str] = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+
+    # 약한 비교: W/ 접두사는 무시
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+
+def conditional(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    Return a 304 response if the client already has this version,
+    otherwise attach the ETag to the outgoing response and return None.
+    """
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return None
+
+
+def bump_revision(db: Session, model, entity_id: str):
+    """Atomically increment the revision counter of a ChatRoom/Project row."""
+    db.execute(
+        update(model).where(model.id == entity_id).values(revision=model.revision + 1)
+        .execution_options(synchronize_session=False)
+    )
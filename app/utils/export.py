@@ -0,0 +1,145 @@
+import csv
+import io
+import json
+import zlib
+from typing import Iterable, Iterator, List, Optional
+from app.models.message import Message
+from app.utils.archive import iter_room_history, load_messages_by_ids
+from app.utils.sharding import message_shards
+
+EXPORT_FIELDS = [
+    "id",
+    "chat_room_id",
+    "sender_id",
+    "sender_name",
+    "sender_role",
+    "type",
+    "content",
+    "timestamp",
+    "file_url",
+    "file_name",
+    "parent_message_id",
+    "feedback_ids",
+]
+
+# 버전 메시지를 나눠서 조회할 때 한 번에 가져올 ID 수
+EXPORT_BATCH_SIZE = 500
+
+
+def message_to_row(message: Message) -> dict:
+    return {
+        "id": message.id,
+        "chat_room_id": message.chat_room_id,
+        "sender_id": message.sender_id,
+        "sender_name": message.sender_name,
+        "sender_role": message.sender_role,
+        "type": message.type.value if message.type is not None else None,
+        "content": message.content,
+        "timestamp": message.timestamp.isoformat() if message.timestamp else None,
+        "file_url": message.file_url,
+        "file_name": message.file_name,
+        "parent_message_id": message.parent_message_id,
+        "feedback_ids": message.feedback_ids or [],
+    }
+
+
+def iter_room_messages(room_id: str) -> Iterator[dict]:
+    """
+    Stream all messages of a room (archived and hot) in timestamp order.
+    Uses its own session because the request-scoped session is closed
+    before a StreamingResponse body is consumed.
+    """
+    db = message_shards.open_session(room_id)
+    try:
+        for message in iter_room_history(db, room_id):
+            yield message_to_row(message)
+    finally:
+        db.close()
+
+
+def iter_version_messages(room_id: str, message_ids: List[str]) -> Iterator[dict]:
+    """
+    Stream the messages of a version snapshot.
+    message_ids are stored in timestamp order, so they are fetched in
+    fixed-size chunks instead of a single IN (...) over the whole version.
+    """
+    db = message_shards.open_session(room_id)
+    try:
+        for start in range(0, len(message_ids), EXPORT_BATCH_SIZE):
+            chunk = message_ids[start:start + EXPORT_BATCH_SIZE]
+            for message in load_messages_by_ids(db, room_id, chunk):
+                yield message_to_row(message)
+            db.expunge_all()
+    finally:
+        db.close()
+
+
+def encode_ndjson(rows: Iterable[dict]) -> Iterator[bytes]:
+    for row in rows:
+        yield (json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def encode_csv(rows: Iterable[dict]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+
+    # 엑셀에서 한글이 깨지지 않도록 BOM 추가
+    buffer.write("\ufeff")
+    writer.writeheader()
+
+    for row in rows:
+        row = dict(row, feedback_ids=",".join(row["feedback_ids"]))
+        writer.writerow(row)
+        if buffer.tell() >= 64 * 1024:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def gzip_stream(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    # wbits=31 -> gzip 헤더/트레일러 포함
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def build_export_stream(
+    rows: Iterable[dict],
+    export_format: str,
+    compress: bool = False,
+    chunk_bytes: Optional[int] = 64 * 1024,
+) -> Iterator[bytes]:
+    if export_format == "csv":
+        chunks = encode_csv(rows)
+    else:
+        chunks = _coalesce(encode_ndjson(rows), chunk_bytes)
+
+    if compress:
+        return gzip_stream(chunks)
+    return chunks
+
+
+def _coalesce(chunks: Iterable[bytes], chunk_bytes: Optional[int]) -> Iterator[bytes]:
+    # 행 단위로 write 하지 않고 일정 크기로 모아서 전송
+    if not chunk_bytes:
+        yield from chunks
+        return
+
+    pending = []
+    size = 0
+    for chunk in chunks:
+        pending.append(chunk)
+        size += len(chunk)
+        if size >= chunk_bytes:
+            yield b"".join(pending)
+            pending = []
+            size = 0
+
+    if pending:
+        yield b"".join(pending)
@@ -0,0 +1,17 @@
+from sqlalchemy.orm import Session
+from app.models.chat_room import ChatRoom, ChatRoomMember
+
+
+def is_room_member(db: Session, room_id: str, user_id: str) -> bool:
+    """
+    Membership check for every room read and write. A room marked deleted
+    counts as gone for its members too, even before the background purge
+    has removed its rows.
+    """
+    return db.query(ChatRoomMember.id).join(
+        ChatRoom, ChatRoom.id == ChatRoomMember.chat_room_id
+    ).filter(
+        ChatRoomMember.chat_room_id == room_id,
+        ChatRoomMember.user_id == user_id,
+        ChatRoom.deleted_at.is_(None)
+    ).first() is not None
@@ -0,0 +1,429 @@
+"""
+Bulk import of legacy chat logs (NDJSON, one message per line).
+
+Usage:
+    python -m app.utils.message_import export.ndjson --checkpoint import.ckpt
+
+The input format is the same as the room export (app/utils/export.py),
+so an exported room can be re-imported as-is. Every sender must be a
+member of the room the message goes into.
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import time
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from typing import IO, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from uuid import NAMESPACE_URL, uuid5
+from pydantic import ValidationError
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from app.models.user import User
+from app.models.chat_room import ChatRoom, ChatRoomMember
+from app.models.message import Message
+from app.schemas.chat import MessageImport
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+COPY_COLUMNS = [
+    "id",
+    "chat_room_id",
+    "sender_id",
+    "sender_name",
+    "sender_role",
+    "type",
+    "content",
+    "timestamp",
+    "file_url",
+    "file_name",
+    "parent_message_id",
+    "feedback_ids",
+]
+
+
+def iter_ndjson_lines(stream: IO[bytes]) -> Iterator[Tuple[int, str]]:
+    """Yield (line_number, text) pairs, skipping blank lines. Line numbers start at 1."""
+    for line_number, raw in enumerate(stream, start=1):
+        line = raw.decode("utf-8-sig") if isinstance(raw, bytes) else raw
+        line = line.strip()
+        if line:
+            yield line_number, line
+
+
+def open_import_file(path: str) -> IO[bytes]:
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def _naive_utc(value: datetime) -> datetime:
+    # DB 컬럼은 timezone 없는 UTC 기준이므로 맞춰서 저장
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _message_id(item: MessageImport) -> str:
+    # 원본 ID가 없으면 내용 기반으로 결정적인 ID를 만들어 재실행 시 중복을 막는다
+    if item.id:
+        return item.id
+    key = f"{item.chat_room_id}:{item.sender_id}:{item.timestamp.isoformat()}:{item.content}"
+    return str(uuid5(NAMESPACE_URL, key))
+
+
+class MessageImporter:
+    def __init__(
+        self,
+        db: Session,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        checkpoint_path: Optional[str] = None,
+        use_copy: bool = True,
+        room_id: Optional[str] = None,
+        message_db: Optional[Session] = None,
+        member_id: Optional[str] = None,
+        before_batch: Optional[Callable[[], None]] = None,
+    ):
+        self.db = db
+        # 메시지를 넣고 조회하는 세션 (샤딩 시 방의 샤드, 아니면 db와 같다)
+        self.message_db = message_db if message_db is not None else db
+        self.batch_size = batch_size
+        self.checkpoint_path = checkpoint_path
+        self.use_copy = use_copy and self.message_db.get_bind().dialect.name == "postgresql"
+        # 지정하면 모든 메시지를 이 채팅방으로 가져온다
+        self.room_id = room_id
+        # 지정하면 이 사용자가 멤버인 채팅방에만 가져온다 (API로 올린 경우 요청한 사용자)
+        self.member_id = member_id
+        # 배치마다 먼저 호출 (샤드 이동이 시작되면 예외를 던져 가져오기를 멈춘다)
+        self.before_batch = before_batch
+
+        self.inserted = 0
+        self.skipped = 0
+        self.failed = 0
+        self.last_line = 0
+        self.errors: List[dict] = []
+
+        # room_id -> 멤버 user_id 집합 (없거나 삭제된 방은 None)
+        self._room_members: Dict[str, Optional[Set[str]]] = {}
+        # user_id -> (name, role), commit 후 ORM 객체가 expire 되므로 값만 보관
+        self._known_users: Dict[str, Optional[Tuple[str, str]]] = {}
+        self._room_last_activity: Dict[str, datetime] = {}
+        # 부모 메시지가 아직 들어오지 않은 피드백: message_id -> parent_message_id
+        self._pending_parents: Dict[str, str] = {}
+
+    # ---------- checkpoint ----------
+
+    def load_checkpoint(self) -> int:
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return 0
+        with open(self.checkpoint_path) as f:
+            data = json.load(f)
+        self._pending_parents = data.get("pending_parents", {})
+        return data.get("last_line", 0)
+
+    def save_checkpoint(self):
+        if not self.checkpoint_path:
+            return
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "last_line": self.last_line,
+                "inserted": self.inserted,
+                "pending_parents": self._pending_parents,
+            }, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    # ---------- pipeline ----------
+
+    def run(self, lines: Iterable[Tuple[int, str]], start_line: Optional[int] = None) -> dict:
+        if start_line is None:
+            start_line = self.load_checkpoint()
+        self.last_line = start_line
+
+        started = time.perf_counter()
+        batch: List[Tuple[int, str]] = []
+
+        for line_number, text in lines:
+            if line_number <= start_line:
+                continue
+            batch.append((line_number, text))
+            if len(batch) >= self.batch_size:
+                self._process_batch(batch)
+                batch = []
+
+        if batch:
+            self._process_batch(batch)
+
+        self._resolve_pending_parents(final=True)
+        self._touch_rooms()
+        self.message_db.commit()
+        self.db.commit()
+        self.save_checkpoint()
+
+        elapsed = time.perf_counter() - started
+        return {
+            "inserted": self.inserted,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "last_line": self.last_line,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(self.inserted / elapsed, 1) if elapsed > 0 else 0.0,
+            "errors": self.errors,
+        }
+
+    def _record_error(self, line_number: int, error: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_number, "error": error})
+
+    def _validate(self, batch: List[Tuple[int, str]]) -> List[Tuple[int, MessageImport]]:
+        items = []
+        for line_number, text in batch:
+            try:
+                data = json.loads(text)
+                if self.room_id:
+                    data["chat_room_id"] = self.room_id
+                items.append((line_number, MessageImport.model_validate(data)))
+            except (ValueError, ValidationError) as e:
+                self._record_error(line_number, str(e).splitlines()[0])
+        return items
+
+    def _load_lookups(self, items: List[Tuple[int, MessageImport]]):
+        room_ids = {item.chat_room_id for _, item in items} - self._room_members.keys()
+        if room_ids:
+            found = {
+                row.id for row in self.db.query(ChatRoom.id).filter(
+                    ChatRoom.id.in_(room_ids),
+                    ChatRoom.deleted_at.is_(None)
+                )
+            }
+            members = {room_id: set() for room_id in found}
+            if found:
+                rows = self.db.query(ChatRoomMember.chat_room_id, ChatRoomMember.user_id).filter(
+                    ChatRoomMember.chat_room_id.in_(found)
+                )
+                for room_id, user_id in rows:
+                    members[room_id].add(user_id)
+            for room_id in room_ids:
+                self._room_members[room_id] = members.get(room_id)
+
+        user_ids = {item.sender_id for _, item in items} - self._known_users.keys()
+        if user_ids:
+            users = self.db.query(User.id, User.name, User.role).filter(User.id.in_(user_ids))
+            by_id = {user.id: (user.name, user.role.value) for user in users}
+            for user_id in user_ids:
+                self._known_users[user_id] = by_id.get(user_id)
+
+    def _process_batch(self, batch: List[Tuple[int, str]]):
+        if self.before_batch:
+            self.before_batch()
+        items = self._validate(batch)
+        self._load_lookups(items)
+
+        rows = []
+        for line_number, item in items:
+            members = self._room_members.get(item.chat_room_id)
+            if members is None:
+                self._record_error(line_number, f"Chat room not found: {item.chat_room_id}")
+                continue
+            if self.member_id and self.member_id not in members:
+                self._record_error(line_number, f"Not a member of chat room: {item.chat_room_id}")
+                continue
+            sender = self._known_users.get(item.sender_id)
+            if sender is None:
+                self._record_error(line_number, f"User not found: {item.sender_id}")
+                continue
+            if item.sender_id not in members:
+                self._record_error(line_number, f"Sender {item.sender_id} is not a member of chat room {item.chat_room_id}")
+                continue
+
+            rows.append({
+                "id": _message_id(item),
+                "chat_room_id": item.chat_room_id,
+                "sender_id": item.sender_id,
+                "sender_name": item.sender_name or sender[0],
+                "sender_role": item.sender_role or sender[1],
+                "type": item.type,
+                "content": item.content,
+                "timestamp": _naive_utc(item.timestamp),
+                "file_url": item.file_url,
+                "file_name": item.file_name,
+                "parent_message_id": item.parent_message_id,
+                "feedback_ids": item.feedback_ids,
+            })
+
+        # 이미 들어간 메시지는 건너뛴다 (재시작 시 멱등성 보장)
+        if rows:
+            ids = [row["id"] for row in rows]
+            existing = {
+                row.id for row in self.message_db.query(Message.id).filter(Message.id.in_(ids))
+            }
+            unique_rows = {}
+            for row in rows:
+                if row["id"] in existing or row["id"] in unique_rows:
+                    self.skipped += 1
+                else:
+                    unique_rows[row["id"]] = row
+            rows = list(unique_rows.values())
+
+        if rows:
+            self._defer_missing_parents(rows)
+            self._insert(rows)
+            self.inserted += len(rows)
+
+            for row in rows:
+                room_id = row["chat_room_id"]
+                if room_id not in self._room_last_activity or row["timestamp"] > self._room_last_activity[room_id]:
+                    self._room_last_activity[room_id] = row["timestamp"]
+
+        self._resolve_pending_parents()
+        self.last_line = batch[-1][0]
+        self.message_db.commit()
+        self.db.commit()
+        self.save_checkpoint()
+
+    def _defer_missing_parents(self, rows: List[dict]):
+        """
+        A feedback whose parent is neither in this batch nor in the DB is
+        inserted without the link; the link is restored once the parent arrives.
+        """
+        batch_ids = {row["id"] for row in rows}
+        parent_ids = {
+            row["parent_message_id"] for row in rows
+            if row["parent_message_id"] and row["parent_message_id"] not in batch_ids
+        }
+        if not parent_ids:
+            return
+
+        found = {
+            row.id for row in self.message_db.query(Message.id).filter(Message.id.in_(parent_ids))
+        }
+        for row in rows:
+            parent_id = row["parent_message_id"]
+            if parent_id and parent_id not in batch_ids and parent_id not in found:
+                self._pending_parents[row["id"]] = parent_id
+                row["parent_message_id"] = None
+
+    def _resolve_pending_parents(self, final: bool = False):
+        if not self._pending_parents:
+            return
+
+        parent_ids = set(self._pending_parents.values())
+        found = {
+            row.id for row in self.message_db.query(Message.id).filter(Message.id.in_(parent_ids))
+        }
+
+        for message_id, parent_id in list(self._pending_parents.items()):
+            if parent_id in found:
+                self.message_db.execute(
+                    update(Message).where(Message.id == message_id).values(parent_message_id=parent_id)
+                )
+                del self._pending_parents[message_id]
+            elif final:
+                # 원본 로그에 부모 메시지가 없는 경우: 링크 없이 남긴다
+                del self._pending_parents[message_id]
+
+    def _insert(self, rows: List[dict]):
+        if self.use_copy:
+            self._insert_copy(rows)
+        else:
+            # executemany (psycopg2에서는 insertmanyvalues로 묶여서 전송된다)
+            self.message_db.execute(Message.__table__.insert(), rows)
+
+    def _insert_copy(self, rows: List[dict]):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([
+                row["id"],
+                row["chat_room_id"],
+                row["sender_id"],
+                row["sender_name"],
+                row["sender_role"],
+                row["type"].name,
+                row["content"],
+                row["timestamp"].isoformat(),
+                row["file_url"] if row["file_url"] is not None else r"\N",
+                row["file_name"] if row["file_name"] is not None else r"\N",
+                row["parent_message_id"] if row["parent_message_id"] is not None else r"\N",
+                json.dumps(row["feedback_ids"]),
+            ])
+        buffer.seek(0)
+
+        cursor = self.message_db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {Message.__tablename__} ({', '.join(COPY_COLUMNS)}) "
+                "FROM STDIN WITH (FORMAT csv, NULL '\\N', "
+                "FORCE_NOT_NULL (id, chat_room_id, sender_id, sender_name, sender_role, content))",
+                buffer,
+            )
+        finally:
+            cursor.close()
+
+    def _touch_rooms(self):
+        # 가져온 메시지 중 가장 최근 시각으로 채팅방 updated_at 갱신
+        for room_id, last_activity in self._room_last_activity.items():
+            room = self.db.query(ChatRoom).filter(ChatRoom.id == room_id).first()
+            if room and (room.updated_at is None or room.updated_at < last_activity):
+                room.updated_at = last_activity
+            if room:
+                room.revision = ChatRoom.revision + 1
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Bulk import chat messages from NDJSON")
+    parser.add_argument("path", help="NDJSON file (.ndjson or .ndjson.gz)")
+    parser.add_argument("--room-id", help="import every message into this chat room")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--checkpoint", help="checkpoint file used to resume after a failure")
+    parser.add_argument("--no-copy", action="store_true", help="use executemany instead of COPY on Postgres")
+    args = parser.parse_args(argv)
+
+    from app.config import SessionLocal
+    from app.utils.sharding import RoomMoving, message_shards
+
+    if message_shards.enabled and not args.room_id:
+        raise SystemExit("--room-id is required when message storage is sharded")
+
+    db = SessionLocal()
+    try:
+        before_batch = None
+        if message_shards.enabled:
+            shard = message_shards.writable_shard(db, args.room_id)
+            message_context = message_shards.shard_session(shard, db)
+            before_batch = lambda: message_shards.ensure_writable(db, args.room_id, shard)
+        else:
+            message_context = nullcontext(db)
+        with message_context as message_db:
+            importer = MessageImporter(
+                db,
+                batch_size=args.batch_size,
+                checkpoint_path=args.checkpoint,
+                use_copy=not args.no_copy,
+                room_id=args.room_id,
+                message_db=message_db,
+                before_batch=before_batch,
+            )
+            with open_import_file(args.path) as f:
+                result = importer.run(iter_ndjson_lines(f))
+    except RoomMoving as e:
+        raise SystemExit(f"{e} (rerun with the same --checkpoint to resume)")
+    finally:
+        db.close()
+
+    print(
+        f"inserted={result['inserted']} skipped={result['skipped']} failed={result['failed']} "
+        f"last_line={result['last_line']} elapsed={result['elapsed_seconds']}s "
+        f"rate={result['rows_per_second']} rows/s"
+    )
+    for error in result["errors"]:
+        print(f"  line {error['line']}: {error['error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+Prometheus metrics without extra dependencies.
+
+Counters and histograms are plain dicts behind one lock; an observation is
+a bisect plus a few additions, cheap enough to leave on in production.
+Gauges (pool usage, WebSocket state, ...) are read from callbacks only when
+/metrics is scraped.
+
+Per-request DB work is attributed through a ContextVar that the HTTP
+middleware sets; sync handlers run in the threadpool with a copy of the
+context, so the SQLAlchemy event handlers still see the request's stats.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event
+from app.utils.query_counter import n_plus_one_suspects
+
+# 초 단위 기본 구간 (5ms ~ 10s)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+BROADCAST_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+INF_LABEL = 'le="+Inf"'
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple = (), amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # labels -> [bucket별 개수..., 합계, 개수]
+        self._values: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: tuple = ()):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labels, list(state)) for labels, state in self._values.items()]
+        for labels, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, INF_LABEL)} {state[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {state[-1]}")
+        return lines
+
+
+GaugeSamples = Iterable[Tuple[Dict[str, str], float]]
+
+
+class Gauge:
+    """
+    Value(s) computed at scrape time by `callback`. kind="counter" exposes
+    running totals that are kept elsewhere (e.g. ConnectionManager.stats()).
+    """
+
+    def __init__(self, name: str, help: str, callback: Callable[[], GaugeSamples], kind: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.callback = callback
+        self.kind = kind
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            samples = list(self.callback())
+        except Exception as e:
+            print(f"Metrics gauge error ({self.name}): {e}")
+            return []
+        for labels, value in samples:
+            names = tuple(labels)
+            lines.append(f"{self.name}{_format_labels(names, tuple(labels[name] for name in names))} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._collectors = []
+
+    def register(self, collector):
+        self._collectors.append(collector)
+        return collector
+
+    def counter(self, *args, **kwargs) -> Counter:
+        return self.register(Counter(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        return self.register(Histogram(*args, **kwargs))
+
+    def gauge(self, name: str, help: str, callback: Callable[[], GaugeSamples], kind: str = "gauge") -> Gauge:
+        return self.register(Gauge(name, help, callback, kind))
+
+    def render(self) -> str:
+        lines = []
+        for collector in self._collectors:
+            lines.extend(collector.collect())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "HTTP requests by route template, method and status", ("route", "method", "status")
+)
+HTTP_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("route", "method")
+)
+DB_QUERIES_PER_REQUEST = registry.histogram(
+    "http_request_db_queries", "SQL statements executed per HTTP request", ("route",), buckets=DB_QUERY_BUCKETS
+)
+DB_TIME_PER_REQUEST = registry.histogram(
+    "http_request_db_seconds", "Time spent in SQL statements per HTTP request", ("route",)
+)
+DB_QUERIES = registry.counter("db_queries_total", "SQL statements executed")
+DB_QUERY_SECONDS = registry.counter("db_query_seconds_total", "Time spent executing SQL statements")
+DB_N_PLUS_ONE = registry.counter(
+    "db_n_plus_one_suspects_total", "Requests that repeated one SELECT shape past the N+1 threshold", ("route",)
+)
+WS_BROADCAST_LATENCY = registry.histogram(
+    "ws_broadcast_duration_seconds", "Time to fan one frame out to a room", buckets=BROADCAST_BUCKETS
+)
+
+
+# ---------- per-request context ----------
+
+def _route_template(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class RequestStats:
+    __slots__ = ("scope", "db_queries", "db_seconds", "statements")
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        # 원문 SQL -> 실행 횟수 (모양 정규화는 요청이 끝난 뒤 한 번만)
+        self.statements: Dict[str, int] = {}
+
+    @property
+    def route(self) -> str:
+        # 라우팅 전에는 템플릿이 없으므로 실제 경로를 쓴다
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or self.scope.get("path", "")
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency, status and DB work per route.
+    Requests that repeat one SELECT shape `n_plus_one_threshold` times are
+    counted and logged (once per route and shape). With debug_headers the
+    response carries X-DB-Queries / X-DB-Time-Ms / X-DB-N-Plus-One, counted
+    up to the moment the headers are sent.
+    """
+
+    def __init__(self, app, n_plus_one_threshold: int = 5, debug_headers: bool = False):
+        self.app = app
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.debug_headers = debug_headers
+        self._reported = set()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.debug_headers:
+                    suspects = n_plus_one_suspects(stats.statements, self.n_plus_one_threshold)
+                    message = dict(message, headers=list(message.get("headers", [])) + [
+                        (b"x-db-queries", str(stats.db_queries).encode()),
+                        (b"x-db-time-ms", f"{stats.db_seconds * 1000:.2f}".encode()),
+                        (b"x-db-n-plus-one", str(len(suspects)).encode()),
+                    ])
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+
+            # 라우팅이 끝난 뒤 scope에 남은 경로 템플릿으로 집계 (id별로 라벨이 늘지 않도록)
+            route = _route_template(scope)
+            method = scope["method"]
+            HTTP_REQUESTS.inc((route, method, str(status_code)))
+            HTTP_LATENCY.observe(elapsed, (route, method))
+            DB_QUERIES_PER_REQUEST.observe(stats.db_queries, (route,))
+            DB_TIME_PER_REQUEST.observe(stats.db_seconds, (route,))
+
+            if stats.db_queries >= self.n_plus_one_threshold:
+                self._check_n_plus_one(route, method, stats)
+
+    def _check_n_plus_one(self, route: str, method: str, stats: RequestStats):
+        suspects = n_plus_one_suspects(stats.statements, self.n_plus_one_threshold)
+        if not suspects:
+            return
+
+        DB_N_PLUS_ONE.inc((route,))
+        for shape, count in suspects.items():
+            key = (route, shape)
+            # 같은 경로/모양은 한 번만 출력
+            if key in self._reported or len(self._reported) >= 1000:
+                continue
+            self._reported.add(key)
+            print(f"N+1 suspect: {method} {route} ran {count}x: {shape[:300]}")
+
+
+# ---------- SQLAlchemy ----------
+
+def instrument_engine(engine, replica_engine=None):
+    engines = {"primary": engine}
+    if replica_engine is not None:
+        engines["replica"] = replica_engine
+
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        DB_QUERIES.inc()
+        DB_QUERY_SECONDS.inc(amount=elapsed)
+
+        stats = current_request.get()
+        if stats is not None:
+            stats.db_queries += 1
+            stats.db_seconds += elapsed
+            stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+    for instrumented in engines.values():
+        event.listen(instrumented, "before_cursor_execute", _before_cursor_execute)
+        event.listen(instrumented, "after_cursor_execute", _after_cursor_execute)
+
+    def pool_samples():
+        for role, instrumented in engines.items():
+            pool = instrumented.pool
+            # SQLite 메모리 DB 등 QueuePool이 아닌 풀은 일부 값이 없다
+            for name in ("size", "checkedout", "overflow", "checkedin"):
+                method = getattr(pool, name, None)
+                if method is not None:
+                    yield {"engine": role, "state": name}, method()
+
+    registry.gauge("db_pool_connections", "SQLAlchemy connection pool state", pool_samples)
+
+
+def instrument_websockets(manager):
+    def samples(key: str):
+        return lambda: [({}, manager.stats()[key])]
+
+    registry.gauge("ws_open_sockets", "Open WebSocket connections", samples("live_sockets"))
+    registry.gauge("ws_connected_users", "Users with at least one open WebSocket", samples("users"))
+    registry.gauge("ws_rooms", "Rooms with at least one subscriber", samples("rooms"))
+    registry.gauge("ws_subscriptions", "Room subscriptions across all sockets", samples("subscriptions"))
+    registry.gauge("ws_msgpack_sockets", "Open WebSocket connections using MessagePack", samples("msgpack_sockets"))
+    registry.gauge("ws_send_failures_total", "Failed WebSocket sends", samples("send_failures_total"), kind="counter")
+    registry.gauge("ws_reaped_total", "Idle WebSocket connections closed by the server", samples("reaped_total"), kind="counter")
+    registry.gauge("ws_pings_sent_total", "Server pings sent to quiet sockets", samples("pings_sent_total"), kind="counter")
+
+
+def instrument_admission(controller):
+    def samples(key: str):
+        return lambda: [({"route_class": name}, gate.stats()[key]) for name, gate in controller.gates.items()]
+
+    registry.gauge("admission_active_requests", "Requests running per route class", samples("active"))
+    registry.gauge("admission_waiting_requests", "Requests queued per route class", samples("waiting"))
+    registry.gauge("admission_shed_total", "Requests rejected with 503 per route class", samples("shed_total"), kind="counter")
+
+
+def instrument_rate_limiter(limiter):
+    def throttled():
+        return [({"scope": scope}, count) for scope, count in limiter.stats()["throttled"].items()]
+
+    registry.gauge("rate_limit_throttled_total", "Requests and frames rejected by rate limits", throttled, kind="counter")
+
+
+def instrument_read_router(router):
+    def routed():
+        return [({"target": target}, count) for target, count in router.stats()["routed"].items()]
+
+    registry.gauge("db_read_routing_total", "Read-only handler sessions by target (replica, primary, pinned)", routed, kind="counter")
+    registry.gauge("db_read_pinned_users", "Users pinned to the primary after a write", lambda: [({}, router.read_your_writes.pinned_users())])
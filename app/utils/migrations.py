@@ -0,0 +1,246 @@
+"""
+Versioned schema migrations.
+
+Scripts live in app/migrations/vNNNN_<name>.py and define:
+
+    VERSION = 3
+    DESCRIPTION = "..."
+    TRANSACTIONAL = True   # False for CREATE INDEX CONCURRENTLY and friends
+
+    def upgrade(ctx: MigrationContext): ...
+
+Applied versions are recorded in the schema_version table. At worker boot
+migrate() costs a single SELECT MAX(version) when the schema is current;
+otherwise pending scripts run under a lock (pg_advisory_lock on Postgres,
+a lock file next to the database on SQLite) so concurrent workers apply
+each version exactly once.
+
+Message shards on their own databases (app/utils/sharding.py) have a
+separate chain in app/migrations/shard/, recorded in shard_schema_version.
+Migrations describe their tables as they were at that version and never
+import the live models, so replaying the chain always builds the same
+schema.
+
+    python -m app.utils.migrations [upgrade|current|history]
+"""
+import argparse
+import importlib
+import os
+import pkgutil
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Sequence
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+MIGRATIONS_PACKAGE = "app.migrations"
+SHARD_MIGRATIONS_PACKAGE = "app.migrations.shard"
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+VERSION_TABLE = "schema_version"
+# 패키지별 버전 기록 테이블 (샤드가 primary와 같은 DB여도 섞이지 않도록)
+VERSION_TABLES = {
+    MIGRATIONS_PACKAGE: VERSION_TABLE,
+    SHARD_MIGRATIONS_PACKAGE: "shard_schema_version",
+}
+# pg_advisory_lock 키 (임의의 고정값)
+ADVISORY_LOCK_KEY = 7302118
+
+
+class Migration:
+    def __init__(self, module):
+        self.module = module
+        self.name = module.__name__.rsplit(".", 1)[-1]
+        self.version = int(module.VERSION)
+        self.description = getattr(module, "DESCRIPTION", "")
+        self.transactional = getattr(module, "TRANSACTIONAL", True)
+
+    def upgrade(self, ctx: "MigrationContext"):
+        self.module.upgrade(ctx)
+
+
+def _package_dir(package: str) -> str:
+    return os.path.join(MIGRATIONS_DIR, *package.split(".")[len(MIGRATIONS_PACKAGE.split(".")):])
+
+
+def discover(package: str = MIGRATIONS_PACKAGE) -> List[Migration]:
+    migrations = [
+        Migration(importlib.import_module(f"{package}.{info.name}"))
+        for info in pkgutil.iter_modules([_package_dir(package)])
+        if info.name.startswith("v")
+    ]
+    migrations.sort(key=lambda migration: migration.version)
+
+    versions = [migration.version for migration in migrations]
+    if len(set(versions)) != len(versions):
+        raise RuntimeError(f"Duplicate migration versions: {versions}")
+    return migrations
+
+
+class MigrationContext:
+    """Idempotent DDL helpers, so a migration can be re-run safely after a crash."""
+
+    def __init__(self, conn, transactional: bool = True):
+        self.conn = conn
+        self.dialect = conn.dialect.name
+        self.transactional = transactional
+
+    def execute(self, sql: str, params: dict = None):
+        return self.conn.execute(text(sql), params or {})
+
+    def has_table(self, table: str) -> bool:
+        return inspect(self.conn).has_table(table)
+
+    def has_column(self, table: str, column: str) -> bool:
+        return any(col["name"] == column for col in inspect(self.conn).get_columns(table))
+
+    def create_all(self, metadata):
+        metadata.create_all(self.conn, checkfirst=True)
+
+    def add_column(self, table: str, column: str, ddl: str):
+        if not self.has_column(table, column):
+            self.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+    def create_index(self, name: str, table: str, columns: Sequence[str], unique: bool = False):
+        """
+        CREATE INDEX CONCURRENTLY on Postgres when the migration is
+        TRANSACTIONAL = False (it cannot run inside a transaction), plain
+        CREATE INDEX otherwise. Always IF NOT EXISTS.
+        """
+        unique_sql = "UNIQUE " if unique else ""
+        column_sql = ", ".join(columns)
+
+        if self.dialect == "postgresql" and not self.transactional:
+            # 중간에 실패한 CONCURRENTLY 빌드는 INVALID 인덱스로 남으므로 지우고 다시 만든다
+            invalid = self.execute(
+                "SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+                "WHERE c.relname = :name AND NOT i.indisvalid",
+                {"name": name},
+            ).first()
+            if invalid:
+                self.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            self.execute(f"CREATE {unique_sql}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({column_sql})")
+        else:
+            self.execute(f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON {table} ({column_sql})")
+
+
+def current_version(engine, package: str = MIGRATIONS_PACKAGE) -> int:
+    with engine.connect() as conn:
+        try:
+            return conn.execute(text(f"SELECT MAX(version) FROM {VERSION_TABLES[package]}")).scalar() or 0
+        except (OperationalError, ProgrammingError):
+            # 아직 마이그레이션을 한 번도 적용하지 않은 DB
+            return 0
+
+
+@contextmanager
+def _migration_lock(engine):
+    if engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+        return
+
+    database = engine.url.database
+    if engine.dialect.name != "sqlite" or not database or database == ":memory:":
+        yield
+        return
+
+    import fcntl  # SQLite 파일 DB는 같은 호스트의 워커끼리 파일 락으로 직렬화
+    with open(f"{database}.migrate.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _ensure_version_table(engine, version_table: str):
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {version_table} ("
+            "version INTEGER PRIMARY KEY, "
+            "name VARCHAR(200) NOT NULL, "
+            "applied_at TIMESTAMP NOT NULL)"
+        ))
+
+
+def _apply(engine, migration: Migration, version_table: str):
+    record = text(f"INSERT INTO {version_table} (version, name, applied_at) VALUES (:version, :name, :applied_at)")
+    values = {"version": migration.version, "name": migration.name, "applied_at": datetime.utcnow()}
+
+    if migration.transactional:
+        # DDL과 버전 기록을 한 트랜잭션으로 (Postgres/SQLite는 DDL도 롤백 가능)
+        with engine.begin() as conn:
+            migration.upgrade(MigrationContext(conn))
+            conn.execute(record, values)
+    else:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            migration.upgrade(MigrationContext(conn, transactional=False))
+            conn.execute(record, values)
+
+
+def migrate(engine, target: int = None, package: str = MIGRATIONS_PACKAGE) -> List[Migration]:
+    """Apply pending migrations up to `target` (default: latest). Returns what was applied."""
+    migrations = discover(package)
+    if not migrations:
+        return []
+    latest = migrations[-1].version if target is None else target
+
+    # 대부분의 부팅은 여기서 끝난다 (쿼리 한 번)
+    if current_version(engine, package) >= latest:
+        return []
+
+    applied = []
+    with _migration_lock(engine):
+        _ensure_version_table(engine, VERSION_TABLES[package])
+        current = current_version(engine, package)  # 락을 잡는 동안 다른 워커가 적용했을 수 있다
+        for migration in migrations:
+            if current < migration.version <= latest:
+                _apply(engine, migration, VERSION_TABLES[package])
+                applied.append(migration)
+                print(f"Applied migration {migration.version:04d} {migration.name}")
+    return applied
+
+
+def history(engine) -> List[dict]:
+    with engine.connect() as conn:
+        try:
+            rows = conn.execute(text(f"SELECT version, name, applied_at FROM {VERSION_TABLE} ORDER BY version")).all()
+        except (OperationalError, ProgrammingError):
+            rows = []
+    applied = {row.version: row for row in rows}
+    return [
+        {
+            "version": migration.version,
+            "name": migration.name,
+            "description": migration.description,
+            "applied_at": applied[migration.version].applied_at if migration.version in applied else None,
+        }
+        for migration in discover()
+    ]
+
+
+def main():
+    from app.config import engine
+
+    parser = argparse.ArgumentParser(description="Apply or inspect schema migrations")
+    parser.add_argument("command", nargs="?", default="upgrade", choices=["upgrade", "current", "history"])
+    parser.add_argument("--target", type=int, help="upgrade only up to this version")
+    args = parser.parse_args()
+
+    if args.command == "current":
+        print(current_version(engine))
+    elif args.command == "history":
+        for row in history(engine):
+            status = row["applied_at"] or "pending"
+            print(f"{row['version']:04d} {row['name']:<40} {status}")
+    else:
+        applied = migrate(engine, args.target)
+        print(f"{len(applied)} migration(s) applied, now at version {current_version(engine)}")
+
+
+if __name__ == "__main__":
+    main()
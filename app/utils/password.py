@@ -0,0 +1,137 @@
+"""
+Password hashing on a dedicated, bounded process pool.
+
+bcrypt is deliberately slow. Running it inside sync handlers occupies
+anyio's shared threadpool, so a burst of logins starves every other sync
+endpoint. Here each hash/verify runs in a separate worker process with
+its own concurrency limit; callers await the result without holding a
+thread. This module must stay import-light because the spawned workers
+import it.
+"""
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+from passlib.context import CryptContext
+
+# bcrypt는 최대 72바이트까지만 처리 가능
+MAX_PASSWORD_LENGTH = 72
+
+_contexts: Dict[int, CryptContext] = {}
+
+
+def make_context(rounds: int) -> CryptContext:
+    context = _contexts.get(rounds)
+    if context is None:
+        context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+        _contexts[rounds] = context
+    return context
+
+
+def bcrypt_secret(password: str) -> bytes:
+    # 글자 수가 아니라 UTF-8 바이트 기준으로 자른다 (한글은 글자당 3바이트)
+    return password.encode("utf-8")[:MAX_PASSWORD_LENGTH]
+
+
+# ---------- worker functions (run in the pool) ----------
+
+def _hash_job(password: str, rounds: int) -> Tuple[str, float, float]:
+    started = time.time()
+    hashed = make_context(rounds).hash(bcrypt_secret(password))
+    return hashed, started, time.time() - started
+
+
+def _verify_job(password: str, hashed: str, rounds: int) -> Tuple[Tuple[bool, Optional[str]], float, float]:
+    started = time.time()
+    # 비용(rounds)이 바뀐 해시는 검증 성공 시 새 해시를 같이 돌려준다
+    valid, new_hash = make_context(rounds).verify_and_update(bcrypt_secret(password), hashed)
+    return (valid, new_hash), started, time.time() - started
+
+
+# ---------- pool ----------
+
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing queue is full."""
+
+
+class PasswordHasher:
+    def __init__(self, rounds: int, workers: int, queue_limit: int):
+        self.rounds = rounds
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.queue_seconds_total = 0.0
+        self.queue_seconds_max = 0.0
+        self.hash_seconds_total = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # fork는 uvicorn 스레드 상태를 복제하므로 spawn 사용
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def _submit(self, func, *args):
+        if self.pending >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise PasswordHashingBusy()
+
+        self.pending += 1
+        submitted = time.time()
+        try:
+            loop = asyncio.get_running_loop()
+            executor = self._get_executor()
+            try:
+                result, started, elapsed = await loop.run_in_executor(executor, func, *args)
+            except BrokenProcessPool:
+                # 워커가 죽으면 풀 전체가 못 쓰게 되므로 새로 만든다
+                if self._executor is executor:
+                    self._executor = None
+                raise
+        finally:
+            self.pending -= 1
+
+        queue_seconds = max(0.0, started - submitted)
+        self.completed += 1
+        self.queue_seconds_total += queue_seconds
+        self.queue_seconds_max = max(self.queue_seconds_max, queue_seconds)
+        self.hash_seconds_total += elapsed
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(_hash_job, password, self.rounds)
+
+    async def verify(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """Returns (valid, new_hash); new_hash is set when the stored cost is outdated."""
+        valid, new_hash = await self._submit(_verify_job, password, hashed, self.rounds)
+        if new_hash:
+            self.rehashed += 1
+        return valid, new_hash
+
+    def stats(self) -> dict:
+        return {
+            "rounds": self.rounds,
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "avg_queue_ms": round(self.queue_seconds_total / self.completed * 1000, 2) if self.completed else 0.0,
+            "max_queue_ms": round(self.queue_seconds_max * 1000, 2),
+            "avg_hash_ms": round(self.hash_seconds_total / self.completed * 1000, 2) if self.completed else 0.0,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
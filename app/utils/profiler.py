@@ -0,0 +1,252 @@
+"""
+In-process sampling profiler.
+
+A daemon thread snapshots every thread's Python stack (sys._current_frames)
+every `interval` seconds, which covers both the event loop thread and the
+anyio worker threads that run sync handlers. The cost is paid only while a
+profile is running; nothing is hooked into normal request handling.
+
+Profiles export as collapsed stacks (flamegraph.pl / speedscope import) or
+speedscope's sampled JSON format, one profile per thread.
+"""
+import hmac
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+Frame = Tuple[str, str, int]  # (함수 이름, 파일, 시작 줄)
+
+MAX_DEPTH = 128
+
+
+def _frame_key(code) -> Frame:
+    return code.co_name, code.co_filename, code.co_firstlineno
+
+
+def _short_path(filename: str) -> str:
+    # site-packages/... 또는 app/... 이후만 남긴다
+    for marker in ("site-packages/", "/app/", "/lib/python"):
+        index = filename.rfind(marker)
+        if index >= 0:
+            return filename[index + 1:] if marker.startswith("/") else filename[index + len(marker):]
+    return filename
+
+
+class Profile:
+    def __init__(self, counts: Dict[Tuple[str, Tuple[Frame, ...]], int], interval: float, duration: float, name: str):
+        self.counts = counts
+        self.interval = interval
+        self.duration = duration
+        self.name = name
+
+    @property
+    def samples(self) -> int:
+        return sum(self.counts.values())
+
+    def to_collapsed(self) -> str:
+        lines = []
+        for (thread_name, stack), count in sorted(self.counts.items(), key=lambda item: -item[1]):
+            frames = [thread_name] + [
+                f"{name} ({_short_path(filename)}:{line})" for name, filename, line in stack
+            ]
+            lines.append(";".join(frame.replace(";", ":") for frame in frames) + f" {count}")
+        return "\n".join(lines) + "\n"
+
+    def to_speedscope(self) -> dict:
+        frame_index: Dict[Frame, int] = {}
+        frames = []
+        by_thread: Dict[str, Tuple[List[List[int]], List[float]]] = {}
+
+        for (thread_name, stack), count in self.counts.items():
+            indexes = []
+            for frame in stack:
+                index = frame_index.get(frame)
+                if index is None:
+                    index = frame_index[frame] = len(frames)
+                    name, filename, line = frame
+                    frames.append({"name": name, "file": _short_path(filename), "line": line})
+                indexes.append(index)
+            samples, weights = by_thread.setdefault(thread_name, ([], []))
+            samples.append(indexes)
+            weights.append(round(count * self.interval, 6))
+
+        profiles = [
+            {
+                "type": "sampled",
+                "name": thread_name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": round(self.duration, 6),
+                "samples": samples,
+                "weights": weights,
+            }
+            for thread_name, (samples, weights) in sorted(by_thread.items())
+        ]
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.name,
+            "exporter": "research-chat sampling profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+    def summary(self) -> dict:
+        return {
+            "name": self.name,
+            "samples": self.samples,
+            "interval_ms": round(self.interval * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 2),
+        }
+
+
+class SamplingProfiler:
+    """
+    stack_filter(frames) decides whether a thread's sample is kept; frames
+    is the root-first list of code objects.
+    """
+
+    def __init__(self, interval: float = 0.005, name: str = "profile", stack_filter: Optional[Callable] = None):
+        self.interval = interval
+        self.name = name
+        self.stack_filter = stack_filter
+        self._counts: Dict[Tuple[str, Tuple[Frame, ...]], int] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Profile:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=max(1.0, self.interval * 4))
+        return Profile(dict(self._counts), self.interval, time.perf_counter() - self._started, self.name)
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+
+                codes = []
+                while frame is not None and len(codes) < MAX_DEPTH:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                codes.reverse()
+
+                if self.stack_filter is not None and not self.stack_filter(codes):
+                    continue
+
+                key = (names.get(thread_id, str(thread_id)), tuple(_frame_key(code) for code in codes))
+                self._counts[key] = self._counts.get(key, 0) + 1
+
+
+class ProfilerBusy(Exception):
+    """Only one profile runs at a time per worker."""
+
+
+_running = threading.Lock()
+
+
+def start_profiler(interval: float, name: str, stack_filter: Optional[Callable] = None) -> SamplingProfiler:
+    if not _running.acquire(blocking=False):
+        raise ProfilerBusy()
+    profiler = SamplingProfiler(interval, name, stack_filter)
+    try:
+        profiler.start()
+    except Exception:
+        _running.release()
+        raise
+    return profiler
+
+
+def stop_profiler(profiler: SamplingProfiler) -> Profile:
+    try:
+        return profiler.stop()
+    finally:
+        _running.release()
+
+
+class ProfileStore:
+    """Last few per-request profiles, fetched by id through the admin API."""
+
+    def __init__(self, size: int = 20):
+        self.size = size
+        self._profiles: "OrderedDict[str, Profile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile_id: str, profile: Profile):
+        with self._lock:
+            self._profiles[profile_id] = profile
+            while len(self._profiles) > self.size:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            return [dict(profile.summary(), id=profile_id) for profile_id, profile in reversed(self._profiles.items())]
+
+
+profile_store = ProfileStore()
+
+
+class RequestProfilingMiddleware:
+    """
+    Profiles a single request when it carries `X-Profile: <token>`.
+    Only samples from threads currently inside the matched endpoint are
+    kept; the response gets `X-Profile-Id` for /api/admin/profiles/{id}.
+    """
+
+    def __init__(self, app, token: str, interval: float = 0.001):
+        self.app = app
+        self.token = token.encode()
+        self.interval = interval
+
+    def _requested(self, scope) -> bool:
+        for name, value in scope.get("headers", ()):
+            if name == b"x-profile":
+                return hmac.compare_digest(value, self.token)
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.token or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        def in_endpoint(codes) -> bool:
+            # 라우팅이 끝나면 scope에 endpoint가 들어온다
+            endpoint = scope.get("endpoint")
+            code = getattr(endpoint, "__code__", None)
+            return code is not None and code in codes
+
+        try:
+            profiler = start_profiler(self.interval, f"{scope['method']} {scope['path']}", in_endpoint)
+        except ProfilerBusy:
+            await self.app(scope, receive, self._with_header(send, b"busy"))
+            return
+
+        profile_id = str(uuid4())
+        try:
+            await self.app(scope, receive, self._with_header(send, profile_id.encode()))
+        finally:
+            profile_store.add(profile_id, stop_profiler(profiler))
+
+    @staticmethod
+    def _with_header(send, value: bytes):
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message = dict(message, headers=list(message.get("headers", [])) + [(b"x-profile-id", value)])
+            await send(message)
+        return send_wrapper
@@ -0,0 +1,167 @@
+"""
+Background purge of soft-deleted chat rooms and projects.
+
+The delete APIs only set deleted_at and return; the rows are removed here
+in small batches, each in its own short transaction, so neither memory
+nor lock time grows with the size of the room.
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+from uuid import uuid4
+from sqlalchemy import delete, select
+from app.config import SessionLocal
+from app.models.chat_room import ChatRoom, ChatRoomMember
+from app.models.message import Message
+from app.models.version import ChatVersion
+from app.models.project import Project, ProjectMember
+from app.models.archive import MessageArchiveBlock
+from app.utils.sharding import message_shards
+
+PURGE_BATCH_SIZE = 1000
+# 배치 사이에 다른 트랜잭션이 락을 얻을 수 있도록 잠깐 쉰다
+PURGE_BATCH_PAUSE = 0.01
+
+
+class PurgeJobRegistry:
+    def __init__(self, max_jobs: int = 1000):
+        self.max_jobs = max_jobs
+        self._jobs: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def create(self, entity: str, entity_id: str) -> dict:
+        job = {
+            "job_id": str(uuid4()),
+            "entity": entity,
+            "entity_id": entity_id,
+            "status": "pending",
+            "deleted": {},
+            "error": None,
+            "created_at": datetime.utcnow(),
+            "finished_at": None,
+        }
+        with self._lock:
+            # 오래된 작업부터 정리
+            while len(self._jobs) >= self.max_jobs:
+                del self._jobs[next(iter(self._jobs))]
+            self._jobs[job["job_id"]] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job, deleted=dict(job["deleted"])) if job else None
+
+    def add_progress(self, job: dict, table: str, count: int):
+        with self._lock:
+            job["deleted"][table] = job["deleted"].get(table, 0) + count
+
+
+purge_jobs = PurgeJobRegistry()
+
+
+def _delete_in_batches(model, column, value, job: dict, batch_size: int = PURGE_BATCH_SIZE, open_session=SessionLocal) -> int:
+    """
+    DELETE ... WHERE id IN (SELECT id ... LIMIT n), repeated until no rows remain.
+    Each batch commits on its own.
+    """
+    total = 0
+    while True:
+        db = open_session()
+        try:
+            ids = select(model.id).where(column == value).limit(batch_size).scalar_subquery()
+            result = db.execute(
+                delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False)
+            )
+            db.commit()
+            count = result.rowcount or 0
+        finally:
+            db.close()
+
+        total += count
+        if count:
+            purge_jobs.add_progress(job, model.__tablename__, count)
+        if count < batch_size:
+            return total
+        time.sleep(PURGE_BATCH_PAUSE)
+
+
+def _delete_row(model, entity_id: str, job: dict):
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            delete(model).where(model.id == entity_id).execution_options(synchronize_session=False)
+        )
+        db.commit()
+        if result.rowcount:
+            purge_jobs.add_progress(job, model.__tablename__, result.rowcount)
+    finally:
+        db.close()
+
+
+def _purge_room_rows(room_id: str, job: dict):
+    # 메시지/보관 블록/버전은 방의 샤드에 있다
+    shard_session = lambda: message_shards.open_session(room_id)
+
+    # 피드백 링크(parent_message_id)는 같은 방 안에서만 걸리므로 메시지부터 지운다
+    _delete_in_batches(Message, Message.chat_room_id, room_id, job, open_session=shard_session)
+    _delete_in_batches(MessageArchiveBlock, MessageArchiveBlock.chat_room_id, room_id, job, batch_size=50, open_session=shard_session)
+    _delete_in_batches(ChatVersion, ChatVersion.chat_room_id, room_id, job, open_session=shard_session)
+    _delete_in_batches(ChatRoomMember, ChatRoomMember.chat_room_id, room_id, job)
+    message_shards.forget(room_id)
+    _delete_row(ChatRoom, room_id, job)
+
+
+def run_job(job: dict, purge):
+    """Run a background job, recording its status in the job dict (read through purge_jobs.get)."""
+    job["status"] = "running"
+    try:
+        purge()
+        job["status"] = "completed"
+    except Exception as e:
+        job["status"] = "failed"
+        job["error"] = str(e)
+        print(f"Purge error ({job['entity']} {job['entity_id']}): {e}")
+    finally:
+        job["finished_at"] = datetime.utcnow()
+
+
+def purge_chat_room(room_id: str, job: dict):
+    run_job(job, lambda: _purge_room_rows(room_id, job))
+
+
+def purge_project(project_id: str, job: dict):
+    def purge():
+        db = SessionLocal()
+        try:
+            room_ids = [
+                row.id for row in db.query(ChatRoom.id).filter(ChatRoom.project_id == project_id)
+            ]
+        finally:
+            db.close()
+
+        for room_id in room_ids:
+            _purge_room_rows(room_id, job)
+        _delete_in_batches(ProjectMember, ProjectMember.project_id, project_id, job)
+        _delete_row(Project, project_id, job)
+
+    run_job(job, purge)
+
+
+def resume_pending_purges():
+    """
+    Restart purges that were interrupted (e.g. by a worker restart).
+    Anything still carrying deleted_at has not been fully removed yet.
+    """
+    db = SessionLocal()
+    try:
+        project_ids = [row.id for row in db.query(Project.id).filter(Project.deleted_at.isnot(None))]
+        room_ids = [row.id for row in db.query(ChatRoom.id).filter(ChatRoom.deleted_at.isnot(None))]
+    finally:
+        db.close()
+
+    for project_id in project_ids:
+        purge_project(project_id, purge_jobs.create("project", project_id))
+    for room_id in room_ids:
+        purge_chat_room(room_id, purge_jobs.create("chat_room", room_id))
@@ -0,0 +1,120 @@
+"""
+SQL statement counting and N+1 detection.
+
+Statements are grouped by shape (whitespace collapsed, placeholders and
+expanded IN lists folded), so the same lazy-load repeated once per row of
+a loop shows up as one shape with a high count.
+
+Per request this runs inside MetricsMiddleware (see app/utils/metrics.py).
+For tests, assert_max_queries pins an endpoint's query budget:
+
+    with assert_max_queries(4):
+        client.get("/api/chat/rooms", headers=headers)
+
+The budgets for the hot endpoints live in tests/test_query_budgets.py
+(python -m pytest).
+"""
+import re
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, List, Optional
+from sqlalchemy import event
+
+# 같은 모양의 문장이 한 요청에서 이 횟수 이상 실행되면 N+1 의심
+DEFAULT_N_PLUS_ONE_THRESHOLD = 5
+
+_WHITESPACE = re.compile(r"\s+")
+_NAMED_PARAM = re.compile(r"%\([^)]*\)s|:\w+|\$\d+|__\[POSTCOMPILE_\w+\]")
+_PARAM_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+@lru_cache(maxsize=2048)
+def normalize_statement(statement: str) -> str:
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _NAMED_PARAM.sub("?", shape)
+    shape = _LITERAL.sub("?", shape)
+    return _PARAM_LIST.sub("?...", shape)
+
+
+def group_shapes(statements: Dict[str, int]) -> Dict[str, int]:
+    """Raw statement -> count, folded into shape -> count."""
+    shapes: Dict[str, int] = {}
+    for statement, count in statements.items():
+        shape = normalize_statement(statement)
+        shapes[shape] = shapes.get(shape, 0) + count
+    return shapes
+
+
+def n_plus_one_suspects(statements: Dict[str, int], threshold: int = DEFAULT_N_PLUS_ONE_THRESHOLD) -> Dict[str, int]:
+    return {
+        shape: count
+        for shape, count in group_shapes(statements).items()
+        if count >= threshold and shape.upper().startswith("SELECT")
+    }
+
+
+class QueryLog:
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def raw_counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for statement in self.statements:
+            counts[statement] = counts.get(statement, 0) + 1
+        return counts
+
+    def shapes(self) -> Dict[str, int]:
+        return group_shapes(self.raw_counts())
+
+    def n_plus_one(self, threshold: int = DEFAULT_N_PLUS_ONE_THRESHOLD) -> Dict[str, int]:
+        return n_plus_one_suspects(self.raw_counts(), threshold)
+
+    def report(self) -> str:
+        lines = [f"{self.count} statements:"]
+        for shape, count in sorted(self.shapes().items(), key=lambda item: -item[1]):
+            lines.append(f"  {count:>4} x {shape}")
+        return "\n".join(lines)
+
+
+@contextmanager
+def count_queries(engine=None):
+    """
+    Record every statement run on `engine` inside the block, from any
+    thread (TestClient runs the app on its own event loop thread).
+    """
+    if engine is None:
+        from app.config import engine
+
+    log = QueryLog()
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        log.statements.append(statement)
+
+    event.listen(engine, "after_cursor_execute", _record)
+    try:
+        yield log
+    finally:
+        event.remove(engine, "after_cursor_execute", _record)
+
+
+@contextmanager
+def assert_max_queries(max_queries: int, engine=None, n_plus_one_threshold: Optional[int] = DEFAULT_N_PLUS_ONE_THRESHOLD):
+    """
+    Fail with the statement breakdown when the block runs more than
+    `max_queries` statements, or repeats one SELECT shape
+    `n_plus_one_threshold` times or more (pass None to allow that).
+    """
+    with count_queries(engine) as log:
+        yield log
+
+    if log.count > max_queries:
+        raise AssertionError(f"Expected at most {max_queries} queries, got {log.count}\n{log.report()}")
+    if n_plus_one_threshold is not None:
+        suspects = log.n_plus_one(n_plus_one_threshold)
+        if suspects:
+            raise AssertionError(f"N+1 query pattern detected ({len(suspects)} shapes)\n{log.report()}")
@@ -0,0 +1,268 @@
+"""
+Token-bucket rate limits for message sends and WebSocket frames.
+
+Buckets are keyed per user ("message", "ws_frame") and per room ("room"),
+so a single client loop can neither flood the API nor saturate a room's
+broadcast fan-out. User buckets scale with UserRole.
+
+State lives in-process by default. For several uvicorn workers on one host,
+set RATE_LIMIT_STORE to a SQLite file path: every worker then takes tokens
+from the same buckets (a local stand-in for a shared store such as Redis).
+"""
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from app.config import settings
+
+# 메모리 저장소가 이 개수를 넘으면 가득 찬(=기본 상태) 버킷을 정리
+PRUNE_THRESHOLD = 10000
+
+
+class Limit:
+    __slots__ = ("rate", "burst")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate  # 초당 충전되는 토큰 수
+        self.burst = burst  # 버킷 크기
+
+
+class RateLimited(Exception):
+    def __init__(self, scope: str, retry_after: float):
+        super().__init__(f"Rate limit exceeded for {scope}")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+def _refill(tokens: float, updated: float, now: float, limit: Limit) -> float:
+    return min(limit.burst, tokens + max(0.0, now - updated) * limit.rate)
+
+
+def _take(tokens: float, limit: Limit, cost: float) -> Tuple[bool, float, float]:
+    """Returns (allowed, remaining tokens, seconds until enough tokens)."""
+    if tokens >= cost:
+        return True, tokens - cost, 0.0
+    return False, tokens, (cost - tokens) / limit.rate
+
+
+class MemoryBucketStore:
+    # 짧은 스레드 락 외에는 막히지 않으므로 이벤트 루프에서 바로 호출해도 된다
+    blocking = False
+
+    def __init__(self):
+        # key -> (tokens, updated)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, limit: Limit, cost: float = 1.0) -> Tuple[bool, float]:
+        now = time.time()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (limit.burst, now))
+            allowed, tokens, retry_after = _take(_refill(tokens, updated, now, limit), limit, cost)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > PRUNE_THRESHOLD:
+                self._prune(now)
+        return allowed, retry_after
+
+    def refund(self, key: str, limit: Limit, cost: float = 1.0):
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated = self._buckets[key]
+                self._buckets[key] = (min(limit.burst, tokens + cost), updated)
+
+    def _prune(self, now: float):
+        # 마지막 사용 후 충분히 지난 버킷은 어차피 가득 찬 상태이므로 지워도 같다
+        cutoff = now - 3600
+        for key, (_, updated) in list(self._buckets.items()):
+            if updated < cutoff:
+                del self._buckets[key]
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteBucketStore:
+    """
+    Buckets in a SQLite file shared by all workers on the host.
+    BEGIN IMMEDIATE serializes read-modify-write across processes.
+    """
+
+    # 다른 워커가 쓰기 락을 잡고 있으면 busy timeout(5초)까지 기다린다
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    def take(self, key: str, limit: Limit, cost: float = 1.0) -> Tuple[bool, float]:
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # 다른 워커와 같은 시계를 쓰도록 락을 잡은 뒤에 시각을 읽는다
+                now = time.time()
+                row = conn.execute("SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+                tokens, updated = row if row else (limit.burst, now)
+                allowed, tokens, retry_after = _take(_refill(tokens, updated, now, limit), limit, cost)
+                conn.execute(
+                    "INSERT INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                    (key, tokens, now),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return allowed, retry_after
+
+    def refund(self, key: str, limit: Limit, cost: float = 1.0):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE rate_buckets SET tokens = MIN(?, tokens + ?) WHERE key = ?",
+                (limit.burst, cost, key),
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM rate_buckets").fetchone()[0]
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        limits: Dict[str, Limit],
+        role_multipliers: Dict[str, float],
+        store=None,
+        enabled: bool = True,
+    ):
+        self.limits = limits
+        self.role_multipliers = role_multipliers
+        self.store = store if store is not None else MemoryBucketStore()
+        self.enabled = enabled
+
+        self.allowed: Dict[str, int] = {scope: 0 for scope in limits}
+        self.throttled: Dict[str, int] = {scope: 0 for scope in limits}
+        self._lock = threading.Lock()
+
+    def _limit_for(self, scope: str, role: Optional[str]) -> Limit:
+        limit = self.limits[scope]
+        multiplier = self.role_multipliers.get(role, 1.0) if role else 1.0
+        if multiplier == 1.0:
+            return limit
+        return Limit(rate=limit.rate * multiplier, burst=limit.burst * multiplier)
+
+    def hit(self, scope: str, key: str, role: Optional[str] = None, cost: float = 1.0) -> Tuple[bool, float]:
+        """Take `cost` tokens from the (scope, key) bucket. Returns (allowed, retry_after)."""
+        if not self.enabled:
+            return True, 0.0
+
+        allowed, retry_after = self.store.take(f"{scope}:{key}", self._limit_for(scope, role), cost)
+        with self._lock:
+            if allowed:
+                self.allowed[scope] += 1
+            else:
+                self.throttled[scope] += 1
+        return allowed, retry_after
+
+    def check(self, scope: str, key: str, role: Optional[str] = None, cost: float = 1.0):
+        """Like hit(), but raises RateLimited."""
+        allowed, retry_after = self.hit(scope, key, role, cost)
+        if not allowed:
+            raise RateLimited(scope, retry_after)
+
+    def refund(self, scope: str, key: str, role: Optional[str] = None, cost: float = 1.0):
+        """Give back tokens taken by hit() for a request that a later bucket rejected."""
+        if not self.enabled:
+            return
+
+        self.store.refund(f"{scope}:{key}", self._limit_for(scope, role), cost)
+        with self._lock:
+            self.allowed[scope] -= 1
+
+    def check_both(self, scope: str, key: str, role: Optional[str], room_id: str):
+        """
+        check() on the (scope, key) bucket and then the room bucket. If the
+        room bucket rejects, the first bucket's token is refunded, so a
+        rejected request costs the sender nothing.
+        """
+        self.check(scope, key, role)
+        try:
+            self.check("room", room_id)
+        except RateLimited:
+            self.refund(scope, key, role)
+            raise
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "store": type(self.store).__name__,
+                "allowed": dict(self.allowed),
+                "throttled": dict(self.throttled),
+            }
+
+
+def _role_value(role) -> Optional[str]:
+    return getattr(role, "value", role)
+
+
+def _build_limiter() -> RateLimiter:
+    limits = {
+        "message": Limit(settings.RATE_LIMIT_MESSAGES_PER_SECOND, settings.RATE_LIMIT_MESSAGE_BURST),
+        "ws_frame": Limit(settings.RATE_LIMIT_WS_FRAMES_PER_SECOND, settings.RATE_LIMIT_WS_FRAME_BURST),
+        "room": Limit(settings.RATE_LIMIT_ROOM_PER_SECOND, settings.RATE_LIMIT_ROOM_BURST),
+    }
+    store = SQLiteBucketStore(settings.RATE_LIMIT_STORE) if settings.RATE_LIMIT_STORE else MemoryBucketStore()
+    return RateLimiter(limits, settings.RATE_LIMIT_ROLE_MULTIPLIERS, store, enabled=settings.RATE_LIMIT_ENABLED)
+
+
+rate_limiter = _build_limiter()
+
+
+def too_many_requests(exc: RateLimited) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=str(exc),
+        headers={"Retry-After": str(max(1, int(exc.retry_after + 0.999)))},
+    )
+
+
+def check_message_rate(user, room_id: str):
+    """REST message sends: per-user bucket (scaled by role) plus per-room bucket."""
+    try:
+        rate_limiter.check_both("message", user.id, _role_value(user.role), room_id)
+    except RateLimited as e:
+        raise too_many_requests(e)
+
+
+async def check_frame_rate(user_id: str, role, room_id: Optional[str] = None, broadcast: bool = True) -> Optional[RateLimited]:
+    """
+    WebSocket frames: per-user bucket, plus the room bucket for frames that
+    get broadcast. Returns the RateLimited error instead of raising so the
+    caller can answer with an error frame and keep the socket open.
+    A store that can block (the shared SQLite file) is called from the
+    threadpool, so a busy bucket file never stalls the event loop.
+    """
+    if rate_limiter.enabled and rate_limiter.store.blocking:
+        return await run_in_threadpool(_check_frame_rate, user_id, role, room_id, broadcast)
+    return _check_frame_rate(user_id, role, room_id, broadcast)
+
+
+def _check_frame_rate(user_id: str, role, room_id: Optional[str], broadcast: bool) -> Optional[RateLimited]:
+    try:
+        if broadcast and room_id is not None:
+            rate_limiter.check_both("ws_frame", user_id, _role_value(role), room_id)
+        else:
+            rate_limiter.check("ws_frame", user_id, _role_value(role))
+    except RateLimited as e:
+        return e
+    return None
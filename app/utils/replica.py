@@ -0,0 +1,189 @@
+"""
+Read-replica routing.
+
+Read-only handlers take `db: Session = Depends(get_read_db)`. With
+DATABASE_REPLICA_URL set, that session is bound to the replica pool;
+without it (or while the caller is pinned) it is the request's primary
+session, so handlers behave exactly as before.
+
+Read-your-writes: every primary session that commits an INSERT, UPDATE or
+DELETE pins its user to the primary for READ_YOUR_WRITES_SECONDS, long
+enough to cover normal replication lag. The pin lives in this worker's
+memory, so it assumes requests from one user reach the same worker
+(sticky sessions) or that the window comfortably exceeds the lag.
+
+Authentication itself still reads the user row from the primary, so a
+user who has just signed up is never rejected because of lag.
+
+Message shards on their own databases get replicas from
+MESSAGE_SHARD_REPLICAS; app/utils/sharding.py reads them whenever the
+request's session is a replica session, so the same pin covers them.
+
+Local testing with two SQLite files:
+
+    DATABASE_URL=sqlite:///./primary.db DATABASE_REPLICA_URL=sqlite:///./replica.db ...
+    python -m app.utils.replica sync   # copy primary -> replica ("replication"), and each shard
+"""
+import argparse
+import threading
+import time
+from typing import Dict, Optional
+from fastapi import Depends
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.auth import get_current_user
+from app.config import ReplicaSessionLocal, SessionLocal, get_db, settings
+from app.models.user import User
+from app.utils.migrations import SHARD_MIGRATIONS_PACKAGE, VERSION_TABLE, VERSION_TABLES
+
+
+class ReadYourWrites:
+    def __init__(self, window: float):
+        self.window = window
+        self._pinned_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.pins_total = 0
+
+    def pin(self, user_id: str):
+        now = time.monotonic()
+        with self._lock:
+            self._pinned_until[user_id] = now + self.window
+            self.pins_total += 1
+            if len(self._pinned_until) > 10000:
+                self._pinned_until = {key: until for key, until in self._pinned_until.items() if until > now}
+
+    def pinned(self, user_id: str) -> bool:
+        until = self._pinned_until.get(user_id)
+        return until is not None and until > time.monotonic()
+
+    def pinned_users(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            return sum(1 for until in self._pinned_until.values() if until > now)
+
+
+class ReadRouter:
+    def __init__(self, replica_sessionmaker, read_your_writes: ReadYourWrites):
+        self.replica_sessionmaker = replica_sessionmaker
+        self.read_your_writes = read_your_writes
+        # 조회가 어디로 갔는지: replica / primary(복제본 없음) / pinned(쓰기 직후)
+        self.routed = {"replica": 0, "primary": 0, "pinned": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.replica_sessionmaker is not None
+
+    def target(self, user_id: str) -> str:
+        if not self.enabled:
+            target = "primary"
+        elif self.read_your_writes.pinned(user_id):
+            target = "pinned"
+        else:
+            target = "replica"
+        self.routed[target] += 1
+        return target
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "read_your_writes_seconds": self.read_your_writes.window,
+            "pinned_users": self.read_your_writes.pinned_users(),
+            "pins_total": self.read_your_writes.pins_total,
+            "routed": dict(self.routed),
+        }
+
+
+read_your_writes = ReadYourWrites(settings.READ_YOUR_WRITES_SECONDS)
+read_router = ReadRouter(ReplicaSessionLocal, read_your_writes)
+
+
+# ---------- write tracking (primary sessions) ----------
+
+@event.listens_for(SessionLocal, "after_flush")
+def _after_flush(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _do_orm_execute(orm_execute_state):
+    # db.execute(insert(...)) 같은 Core 문장은 flush를 거치지 않는다
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _after_commit(session):
+    # user_id는 get_current_user가 요청의 primary 세션에 남겨 둔다
+    user_id = session.info.get("user_id")
+    if session.info.pop("wrote", False) and user_id:
+        read_your_writes.pin(user_id)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _after_rollback(session):
+    session.info.pop("wrote", None)
+
+
+if ReplicaSessionLocal is not None:
+    @event.listens_for(ReplicaSessionLocal, "before_flush")
+    def _reject_replica_writes(session, flush_context, instances):
+        raise RuntimeError("Attempted to write through a read-replica session; use get_db for this handler")
+
+
+# ---------- dependency ----------
+
+def get_read_db(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Session for read-only handlers: the replica unless disabled or the user just wrote."""
+    if read_router.target(current_user.id) != "replica":
+        yield db
+        return
+
+    replica = ReplicaSessionLocal()
+    try:
+        yield replica
+    finally:
+        replica.close()
+
+
+# ---------- local replication ----------
+
+def sync_sqlite_replica(primary_url: str, replica_url: str, version_table: str = VERSION_TABLE) -> Optional[int]:
+    """Copy a SQLite primary file onto the replica file (online backup API)."""
+    import sqlite3
+    from sqlalchemy.engine import make_url
+
+    primary, replica = make_url(primary_url), make_url(replica_url)
+    if primary.get_backend_name() != "sqlite" or replica.get_backend_name() != "sqlite":
+        raise SystemExit("sync only handles two SQLite files; use streaming replication for Postgres")
+
+    source = sqlite3.connect(primary.database)
+    target = sqlite3.connect(replica.database)
+    try:
+        source.backup(target)
+        return target.execute(f"SELECT MAX(version) FROM {version_table}").fetchone()[0]
+    finally:
+        source.close()
+        target.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read-replica helpers")
+    parser.add_argument("command", choices=["sync"], help="sync: copy the SQLite primary onto the SQLite replica")
+    args = parser.parse_args()
+
+    if args.command == "sync":
+        if not settings.DATABASE_REPLICA_URL:
+            raise SystemExit("DATABASE_REPLICA_URL is not set")
+        version = sync_sqlite_replica(settings.DATABASE_URL, settings.DATABASE_REPLICA_URL)
+        print(f"Replica synced (schema version {version})")
+        shard_version_table = VERSION_TABLES[SHARD_MIGRATIONS_PACKAGE]
+        for name, replica_url in sorted(settings.MESSAGE_SHARD_REPLICAS.items()):
+            version = sync_sqlite_replica(settings.MESSAGE_SHARDS[name], replica_url, shard_version_table)
+            print(f"Shard {name} replica synced (schema version {version})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Fast response path for list endpoints.
+
+Rows are built as plain dicts (only the columns the response needs) and
+encoded with orjson, skipping the from_attributes re-validation FastAPI
+would otherwise run through the response_model. The response_model stays
+on the route for the OpenAPI schema.
+"""
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Iterable, List, Optional
+from fastapi import Response
+from app.models.message import Message
+from app.models.chat_room import ChatRoom
+
+try:
+    import orjson
+except ImportError:  # orjson이 없으면 표준 json으로 동작
+    orjson = None
+
+MESSAGE_COLUMNS = [
+    Message.id,
+    Message.chat_room_id,
+    Message.sender_id,
+    Message.sender_name,
+    Message.sender_role,
+    Message.type,
+    Message.content,
+    Message.timestamp,
+    Message.file_url,
+    Message.file_name,
+    Message.parent_message_id,
+    Message.feedback_ids,
+]
+
+MESSAGE_FIELDS = [column.key for column in MESSAGE_COLUMNS]
+
+ROOM_COLUMNS = [
+    ChatRoom.id,
+    ChatRoom.name,
+    ChatRoom.description,
+    ChatRoom.created_at,
+    ChatRoom.updated_at,
+]
+
+
+def _default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def fast_response(content: Any, response: Optional[Response] = None) -> FastJSONResponse:
+    """Wrap content in a FastJSONResponse, keeping headers set on the injected response (e.g. ETag)."""
+    headers = None
+    if response is not None:
+        headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    return FastJSONResponse(content, headers=headers)
+
+
+def message_row(message) -> dict:
+    """Response dict for a Message / ArchivedMessage object or a column Row."""
+    row = {field: getattr(message, field) for field in MESSAGE_FIELDS}
+    if row["feedback_ids"] is None:
+        row["feedback_ids"] = []
+    return row
+
+
+def message_rows(messages: Iterable) -> List[dict]:
+    return [message_row(message) for message in messages]
+
+
+def room_row(room, member_ids: List[str]) -> dict:
+    """ChatRoomWithMembers dict without copying SQLAlchemy instance state."""
+    return {
+        "id": room.id,
+        "name": room.name,
+        "description": room.description,
+        "created_at": room.created_at,
+        "updated_at": room.updated_at,
+        "member_ids": member_ids,
+    }
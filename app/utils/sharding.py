@@ -0,0 +1,613 @@
+"""
+Message storage sharding by chat room.
+
+Messages, chat versions and archive blocks of a room all live on one shard,
+recorded in the room_shards directory on the primary. A new room is
+placed by a stable hash (crc32) of chat_room_id over the sorted shard
+names in MESSAGE_SHARDS and its directory row is written in the same
+transaction as the room, so changing the shard list never remaps an
+existing room. Reads cache lookups per worker for
+SHARD_DIRECTORY_CACHE_SECONDS; writes always read the directory fresh.
+
+With MESSAGE_SHARDS empty there is a single shard (the primary database),
+no directory lookups happen, and message_shards.session() hands back the
+request's own session, so nothing changes.
+
+Reads follow the request's session: when get_read_db handed out a replica
+session, session() and fan_out_rooms() read each shard from its replica
+(MESSAGE_SHARD_REPLICAS; DATABASE_REPLICA_URL for the shard on the primary
+database), and from the shard itself when it has none. A user pinned to
+the primary after a write reads every shard's primary too.
+
+Shard databases only hold the sharded tables, created without foreign
+keys (users and rooms stay on the primary) by their own migration chain
+in app/migrations/shard. A shard whose URL equals
+DATABASE_URL reuses the primary engine and its migrated tables.
+
+Operations:
+
+    python -m app.utils.sharding init              # create tables on every shard
+    python -m app.utils.sharding status            # rooms / messages per shard
+    python -m app.utils.sharding pin-all [--shard NAME]  # directory rows for unpinned rooms
+    python -m app.utils.sharding move ROOM SHARD   # move one room (writes paused meanwhile)
+    python -m app.utils.sharding unlock ROOM       # clear the write lock of an interrupted move
+
+Workers refuse to start while any room has no directory row, since the
+hash over the current shard list may point it away from its messages.
+When turning sharding on, list the primary database as one of the
+shards and run `pin-all --shard <that name>` first.
+"""
+import argparse
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import and_, create_engine, delete, func, insert, or_, select, update
+from sqlalchemy.orm import Session, sessionmaker
+from app.config import SessionLocal, engine, replica_engine, settings
+from app.models.archive import MessageArchiveBlock
+from app.models.chat_room import ChatRoom
+from app.models.message import Message
+from app.models.shard import RoomShard
+from app.models.version import ChatVersion
+from app.utils.migrations import SHARD_MIGRATIONS_PACKAGE, migrate
+
+PRIMARY_SHARD = "primary"
+# 이동 시작 전, 잠금 확인을 이미 통과한 쓰기 요청이 끝나기를 기다리는 시간
+MOVE_WRITE_GRACE_SECONDS = 5.0
+
+# 방 이동 시 복사 순서와 정렬 기준 (피드백은 부모보다 나중 시각이므로 부모가 먼저 복사된다)
+SHARDED_MODELS = (
+    (Message, Message.timestamp),
+    (ChatVersion, ChatVersion.version_number),
+    (MessageArchiveBlock, MessageArchiveBlock.start_ts),
+)
+COPY_BATCH_SIZE = 1000
+DIRECTORY_BATCH_SIZE = 500
+
+
+def stable_hash(room_id: str) -> int:
+    return zlib.crc32(room_id.encode("utf-8"))
+
+
+class RoomMoving(Exception):
+    """The room is being moved to another shard; writes are paused until it finishes."""
+
+    def __init__(self, room_id: str):
+        super().__init__(f"Chat room {room_id} is being moved, retry shortly")
+        self.room_id = room_id
+
+
+class ShardRouter:
+    def __init__(self, urls: Dict[str, str], primary_engine, cache_seconds: float,
+                 replica_urls: Optional[Dict[str, str]] = None, primary_replica_engine=None):
+        self.enabled = bool(urls)
+        self.primary_engine = primary_engine
+        if self.enabled:
+            self.engines = {
+                name: primary_engine if url == settings.DATABASE_URL else create_engine(url, pool_pre_ping=True)
+                for name, url in urls.items()
+            }
+        else:
+            self.engines = {PRIMARY_SHARD: primary_engine}
+        self.names = sorted(self.engines)
+        self.sessionmakers = {
+            name: SessionLocal if shard_engine is primary_engine
+            else sessionmaker(autocommit=False, autoflush=False, bind=shard_engine)
+            for name, shard_engine in self.engines.items()
+        }
+
+        # 샤드별 조회 전용 복제본 (primary DB에 있는 샤드는 DATABASE_REPLICA_URL)
+        replica_urls = replica_urls or {}
+        self.replica_engines = {}
+        for name, shard_engine in self.engines.items():
+            if shard_engine is primary_engine:
+                if primary_replica_engine is not None:
+                    self.replica_engines[name] = primary_replica_engine
+            elif replica_urls.get(name):
+                self.replica_engines[name] = create_engine(replica_urls[name], pool_pre_ping=True)
+        self.replica_sessionmakers = {
+            name: sessionmaker(autocommit=False, autoflush=False, bind=replica)
+            for name, replica in self.replica_engines.items()
+        }
+
+        self.cache_seconds = cache_seconds
+        self._cache: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.directory_lookups = 0
+        self.cache_hits = 0
+
+    # ---------- room -> shard ----------
+
+    def hash_shard(self, room_id: str) -> str:
+        return self.names[stable_hash(room_id) % len(self.names)]
+
+    def _read_directory(self, room_ids: List[str]) -> Dict[str, str]:
+        found = {}
+        db = SessionLocal()
+        try:
+            for start in range(0, len(room_ids), DIRECTORY_BATCH_SIZE):
+                chunk = room_ids[start:start + DIRECTORY_BATCH_SIZE]
+                found.update(db.query(RoomShard.chat_room_id, RoomShard.shard).filter(
+                    RoomShard.chat_room_id.in_(chunk)
+                ).all())
+        finally:
+            db.close()
+        self.directory_lookups += 1
+        return found
+
+    def shards_for(self, room_ids: Iterable[str], fresh: bool = False) -> Dict[str, str]:
+        room_ids = list(dict.fromkeys(room_ids))
+        if not self.enabled:
+            return {room_id: PRIMARY_SHARD for room_id in room_ids}
+
+        now = time.monotonic()
+        result, missing = {}, []
+        with self._lock:
+            for room_id in room_ids:
+                cached = None if fresh else self._cache.get(room_id)
+                if cached is not None and cached[1] > now:
+                    result[room_id] = cached[0]
+                    self.cache_hits += 1
+                else:
+                    missing.append(room_id)
+
+        if missing:
+            found = self._read_directory(missing)
+            expires = now + self.cache_seconds
+            with self._lock:
+                if len(self._cache) > 100000:
+                    self._cache.clear()
+                for room_id in missing:
+                    shard = found.get(room_id)
+                    if shard not in self.engines:
+                        # 디렉터리에 없거나 설정에서 빠진 샤드를 가리키면 해시로
+                        shard = self.hash_shard(room_id)
+                    self._cache[room_id] = (shard, expires)
+                    result[room_id] = shard
+        return result
+
+    def shard_for(self, room_id: str, fresh: bool = False) -> str:
+        return self.shards_for([room_id], fresh)[room_id]
+
+    def group_by_shard(self, room_ids: Iterable[str]) -> Dict[str, List[str]]:
+        groups: Dict[str, List[str]] = {}
+        for room_id, shard in self.shards_for(room_ids).items():
+            groups.setdefault(shard, []).append(room_id)
+        return groups
+
+    def pin_new_room(self, db: Session, room_id: str):
+        """Add the directory row of a room being created in `db`'s transaction."""
+        if self.enabled:
+            db.add(RoomShard(chat_room_id=room_id, shard=self.hash_shard(room_id), assigned_at=datetime.utcnow()))
+
+    def assign(self, room_id: str, shard: str, locked: bool = False):
+        """
+        Record the room's shard in the directory (primary) and drop the
+        local cache entry. locked=True pauses writes to the room.
+        """
+        now = datetime.utcnow()
+        locked_at = now if locked else None
+        db = SessionLocal()
+        try:
+            updated = db.execute(
+                update(RoomShard).where(RoomShard.chat_room_id == room_id)
+                .values(shard=shard, assigned_at=now, locked_at=locked_at)
+            ).rowcount
+            if not updated:
+                db.add(RoomShard(chat_room_id=room_id, shard=shard, assigned_at=now, locked_at=locked_at))
+            db.commit()
+        finally:
+            db.close()
+        self.invalidate(room_id)
+
+    def forget(self, room_id: str):
+        if not self.enabled:
+            return
+        db = SessionLocal()
+        try:
+            db.execute(delete(RoomShard).where(RoomShard.chat_room_id == room_id))
+            db.commit()
+        finally:
+            db.close()
+        self.invalidate(room_id)
+
+    def invalidate(self, room_id: Optional[str] = None):
+        with self._lock:
+            if room_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(room_id, None)
+
+    # ---------- sessions ----------
+
+    def open_session(self, room_id: str) -> Session:
+        return self.sessionmakers[self.shard_for(room_id)]()
+
+    @contextmanager
+    def session(self, room_id: str, db: Optional[Session] = None):
+        """
+        Session for reading the room's messages. Reuses `db` when it is
+        bound to the same database (always the case without sharding), so
+        reads keep whatever routing get_read_db chose.
+        """
+        with self.shard_session(self.shard_for(room_id), db) as shard_db:
+            yield shard_db
+
+    def writable_shard(self, db: Session, room_id: str) -> str:
+        """
+        The room's shard read fresh from the directory through the primary
+        session `db`. Raises RoomMoving while move_room holds the room.
+        """
+        if not self.enabled:
+            return PRIMARY_SHARD
+
+        row = db.query(RoomShard.shard, RoomShard.locked_at).filter(RoomShard.chat_room_id == room_id).first()
+        if row is not None and row.locked_at is not None:
+            raise RoomMoving(room_id)
+        shard = row.shard if row is not None and row.shard in self.engines else self.hash_shard(room_id)
+        with self._lock:
+            self._cache[room_id] = (shard, time.monotonic() + self.cache_seconds)
+        return shard
+
+    def ensure_writable(self, db: Session, room_id: str, shard: str):
+        """For long-running writers: RoomMoving once the room is locked or no longer on `shard`."""
+        if self.writable_shard(db, room_id) != shard:
+            raise RoomMoving(room_id)
+
+    @contextmanager
+    def write_session(self, room_id: str, db: Session):
+        """
+        Session for writing the room's messages. Same as session(), but the
+        shard comes from writable_shard, so a write never lands on a shard
+        the room has just left. With `db` on the same database, writes
+        share one transaction.
+        """
+        with self.shard_session(self.writable_shard(db, room_id), db) as shard_db:
+            yield shard_db
+
+    def on_replica(self, db: Optional[Session]) -> bool:
+        """Whether `db` is a replica session (get_read_db routed the request to a replica)."""
+        if db is None:
+            return False
+        bind = db.get_bind()
+        return bind is replica_engine or any(replica is bind for replica in self.replica_engines.values())
+
+    def _sessionmaker(self, shard: str, replica: bool):
+        if replica and shard in self.replica_sessionmakers:
+            return self.replica_sessionmakers[shard]
+        return self.sessionmakers[shard]
+
+    @contextmanager
+    def shard_session(self, shard: str, db: Optional[Session] = None):
+        """
+        Session on a named shard; reuses `db` when it is bound to the same
+        database. With `db` on a replica, reads the shard's replica.
+        """
+        if db is not None and not self.enabled:
+            yield db
+            return
+
+        replica = self.on_replica(db)
+        target = self.replica_engines.get(shard) if replica else self.engines[shard]
+        if db is not None and target is db.get_bind():
+            yield db
+            return
+
+        shard_db = self._sessionmaker(shard, replica)()
+        try:
+            yield shard_db
+        finally:
+            shard_db.close()
+
+    def fan_out(self, fn: Callable[[str, Session], object], shards: Optional[Iterable[str]] = None,
+                db: Optional[Session] = None) -> Dict[str, object]:
+        """
+        Run fn(shard_name, session) on every shard in parallel, each with
+        its own session. With `db` on a replica, each shard is read from
+        its replica.
+        """
+        shards = list(shards) if shards is not None else self.names
+        replica = self.on_replica(db)
+
+        def run(name: str):
+            db = self._sessionmaker(name, replica)()
+            try:
+                return fn(name, db)
+            finally:
+                db.close()
+
+        if len(shards) <= 1:
+            return {name: run(name) for name in shards}
+
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=max(4, len(self.names) * 4), thread_name_prefix="shard-fan-out"
+                    )
+        futures = {name: self._executor.submit(run, name) for name in shards}
+        return {name: future.result() for name, future in futures.items()}
+
+    def fan_out_rooms(self, room_ids: Iterable[str], fn: Callable[[Session, List[str]], list],
+                      db: Optional[Session] = None) -> list:
+        """fn(session, room_ids_on_that_shard) per shard in parallel; results concatenated."""
+        groups = self.group_by_shard(room_ids)
+        if not groups:
+            return []
+        results = self.fan_out(lambda name, shard_db: fn(shard_db, groups[name]), groups, db)
+        return [row for rows in results.values() for row in rows]
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "shards": self.names,
+            "replicas": sorted(self.replica_engines),
+            "cache_seconds": self.cache_seconds,
+            "cached_rooms": len(self._cache),
+            "directory_lookups": self.directory_lookups,
+            "cache_hits": self.cache_hits,
+        }
+
+
+message_shards = ShardRouter(
+    settings.MESSAGE_SHARDS, engine, settings.SHARD_DIRECTORY_CACHE_SECONDS,
+    settings.MESSAGE_SHARD_REPLICAS, replica_engine,
+)
+
+
+def ensure_shard_schema(router: ShardRouter = message_shards):
+    """Run the shard migration chain (app/migrations/shard) on every shard with its own database."""
+    # primary와 같은 DB인 샤드는 primary 마이그레이션이 테이블을 만든다
+    for name, shard_engine in router.engines.items():
+        if shard_engine.url != router.primary_engine.url:
+            migrate(shard_engine, package=SHARD_MIGRATIONS_PACKAGE)
+
+
+# ---------- online room move ----------
+
+def _copy_rows(source: Session, target: Session, model, order_column, room_id: str) -> int:
+    """Copy the room's rows that the target does not have yet, in keyset batches."""
+    table = model.__table__
+    order = table.c[order_column.key]
+    copied = 0
+    last: Optional[tuple] = None
+
+    while True:
+        query = select(table).where(table.c.chat_room_id == room_id)
+        if last is not None:
+            query = query.where(or_(order > last[0], and_(order == last[0], table.c.id > last[1])))
+        rows = source.execute(query.order_by(order, table.c.id).limit(COPY_BATCH_SIZE)).mappings().all()
+        if not rows:
+            return copied
+
+        ids = [row["id"] for row in rows]
+        existing = set(target.execute(select(table.c.id).where(table.c.id.in_(ids))).scalars())
+        new_rows = [dict(row) for row in rows if row["id"] not in existing]
+        if new_rows:
+            target.execute(insert(table), new_rows)
+        target.commit()
+
+        copied += len(new_rows)
+        last = (rows[-1][order.key], rows[-1]["id"])
+
+
+def _merge_feedback_ids(source: Session, target: Session, room_id: str) -> int:
+    # 이동 중 원본 샤드에 달린 피드백 링크 (feedback_ids는 늘어나기만 한다)
+    table = Message.__table__
+    source_links = {
+        row.id: row.feedback_ids for row in source.execute(
+            select(table.c.id, table.c.feedback_ids).where(table.c.chat_room_id == room_id)
+        ) if row.feedback_ids
+    }
+    merged = 0
+    ids = list(source_links)
+    for start in range(0, len(ids), COPY_BATCH_SIZE):
+        chunk = ids[start:start + COPY_BATCH_SIZE]
+        for row in target.execute(select(table.c.id, table.c.feedback_ids).where(table.c.id.in_(chunk))):
+            current = list(row.feedback_ids or [])
+            missing = [feedback_id for feedback_id in source_links[row.id] if feedback_id not in current]
+            if missing:
+                target.execute(update(table).where(table.c.id == row.id).values(feedback_ids=current + missing))
+                merged += 1
+    target.commit()
+    return merged
+
+
+def _delete_room_rows(db: Session, room_id: str) -> int:
+    total = 0
+    for model, _ in SHARDED_MODELS:
+        while True:
+            ids = select(model.id).where(model.chat_room_id == room_id).limit(COPY_BATCH_SIZE).scalar_subquery()
+            count = db.execute(
+                delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False)
+            ).rowcount or 0
+            db.commit()
+            total += count
+            if count < COPY_BATCH_SIZE:
+                break
+    return total
+
+
+def move_room(room_id: str, target: str, router: ShardRouter = message_shards,
+              wait: Optional[float] = None, grace: float = MOVE_WRITE_GRACE_SECONDS,
+              log: Callable[[str], None] = print) -> dict:
+    """
+    Move one room's messages, versions and archive blocks to `target`.
+    The room stays readable; writes get RoomMoving (503) until step 4:
+
+      1. lock the directory entry, then wait `grace` seconds for writes
+         that passed the lock check just before
+      2. copy everything (and feedback links) from the source shard
+      3. switch the directory entry to the target and unlock it
+      4. wait out the other workers' read caches, which may still send
+         reads to the source
+      5. copy anything a straggling write left on the source, then delete
+         the room's rows there
+
+    If the move fails before step 3 the room is unlocked on the source;
+    `unlock ROOM` clears a lock left by a killed process.
+    """
+    if not router.enabled:
+        raise ValueError("Message sharding is not enabled (MESSAGE_SHARDS is empty)")
+    if target not in router.engines:
+        raise ValueError(f"Unknown shard: {target}")
+    source = router.shard_for(room_id, fresh=True)
+    if source == target:
+        return {"room_id": room_id, "source": source, "target": target, "moved": False}
+    if router.engines[source] is router.engines[target]:
+        router.assign(room_id, target)
+        return {"room_id": room_id, "source": source, "target": target, "moved": True, "copied": 0, "deleted": 0}
+
+    ensure_shard_schema(router)
+    source_db = router.sessionmakers[source]()
+    target_db = router.sessionmakers[target]()
+    try:
+        router.assign(room_id, source, locked=True)
+        log(f"{room_id}: writes locked, waiting {grace:.0f}s for in-flight writes")
+        try:
+            time.sleep(grace)
+            copied = sum(_copy_rows(source_db, target_db, model, order, room_id) for model, order in SHARDED_MODELS)
+            _merge_feedback_ids(source_db, target_db, room_id)
+        except BaseException:
+            router.assign(room_id, source)
+            raise
+        log(f"{room_id}: copied {copied} rows {source} -> {target}")
+
+        router.assign(room_id, target)
+        wait = router.cache_seconds + 1 if wait is None else wait
+        log(f"{room_id}: directory switched to {target} and unlocked, waiting {wait:.0f}s for worker caches")
+        time.sleep(wait)
+
+        caught_up = sum(_copy_rows(source_db, target_db, model, order, room_id) for model, order in SHARDED_MODELS)
+        merged = _merge_feedback_ids(source_db, target_db, room_id)
+        log(f"{room_id}: caught up {caught_up} rows, {merged} feedback links")
+
+        deleted = _delete_room_rows(source_db, room_id)
+        log(f"{room_id}: deleted {deleted} rows from {source}")
+    finally:
+        source_db.close()
+        target_db.close()
+
+    return {
+        "room_id": room_id, "source": source, "target": target, "moved": True,
+        "copied": copied + caught_up, "deleted": deleted,
+    }
+
+
+def unlock_room(room_id: str, router: ShardRouter = message_shards) -> bool:
+    """Clear the write lock a killed move left behind; the room stays on its directory shard."""
+    db = SessionLocal()
+    try:
+        unlocked = db.execute(
+            update(RoomShard).where(RoomShard.chat_room_id == room_id, RoomShard.locked_at.isnot(None))
+            .values(locked_at=None)
+        ).rowcount
+        db.commit()
+    finally:
+        db.close()
+    router.invalidate(room_id)
+    return bool(unlocked)
+
+
+def _unpinned_room_ids(db: Session) -> List[str]:
+    return [
+        row.id for row in db.query(ChatRoom.id)
+        .outerjoin(RoomShard, RoomShard.chat_room_id == ChatRoom.id)
+        .filter(RoomShard.chat_room_id.is_(None))
+    ]
+
+
+def pin_all_rooms(router: ShardRouter = message_shards, shard: Optional[str] = None) -> int:
+    """
+    Write a directory row for every room without one: on `shard` when
+    given (the shard that already holds their messages, e.g. the primary
+    when sharding is first turned on), otherwise at their hash shard.
+    """
+    if shard is not None and shard not in router.engines:
+        raise ValueError(f"Unknown shard: {shard}")
+    db = SessionLocal()
+    try:
+        room_ids = _unpinned_room_ids(db)
+        now = datetime.utcnow()
+        for start in range(0, len(room_ids), DIRECTORY_BATCH_SIZE):
+            chunk = room_ids[start:start + DIRECTORY_BATCH_SIZE]
+            db.execute(insert(RoomShard.__table__), [
+                {"chat_room_id": room_id, "shard": shard or router.hash_shard(room_id), "assigned_at": now}
+                for room_id in chunk
+            ])
+        db.commit()
+    finally:
+        db.close()
+    router.invalidate()
+    return len(room_ids)
+
+
+def check_directory(router: ShardRouter = message_shards):
+    """
+    Refuse to start while rooms have no directory row: the hash over the
+    current shard list may not be where their messages are.
+    """
+    if not router.enabled:
+        return
+    db = SessionLocal()
+    try:
+        missing = len(_unpinned_room_ids(db))
+    finally:
+        db.close()
+    if missing:
+        raise RuntimeError(
+            f"{missing} chat rooms have no shard directory row. Run "
+            "`python -m app.utils.sharding pin-all --shard NAME` with the shard that holds "
+            "their messages before starting."
+        )
+
+
+def shard_status(router: ShardRouter = message_shards) -> Dict[str, dict]:
+    def count(name: str, db: Session) -> dict:
+        return {
+            "rooms": db.query(func.count(func.distinct(Message.chat_room_id))).scalar(),
+            "messages": db.query(func.count(Message.id)).scalar(),
+            "versions": db.query(func.count(ChatVersion.id)).scalar(),
+        }
+    return router.fan_out(count)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Message shard maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("init", help="create the sharded tables on every shard")
+    sub.add_parser("status", help="rooms, messages and versions per shard")
+    pin_all = sub.add_parser("pin-all", help="write directory rows for rooms that have none")
+    pin_all.add_argument("--shard", help="shard holding their messages (default: hash shard)")
+    move = sub.add_parser("move", help="move one room to another shard, pausing its writes")
+    move.add_argument("room_id")
+    move.add_argument("target")
+    move.add_argument("--wait", type=float, help="seconds to wait for worker caches (default: cache TTL + 1)")
+    move.add_argument("--grace", type=float, default=MOVE_WRITE_GRACE_SECONDS,
+                      help="seconds to wait for in-flight writes after locking")
+    unlock = sub.add_parser("unlock", help="clear the write lock left by an interrupted move")
+    unlock.add_argument("room_id")
+    args = parser.parse_args(argv)
+
+    if args.command == "init":
+        ensure_shard_schema()
+        print(f"Shard tables ready on {', '.join(message_shards.names)}")
+    elif args.command == "status":
+        for name, counts in sorted(shard_status().items()):
+            print(f"{name:<16} rooms={counts['rooms']} messages={counts['messages']} versions={counts['versions']}")
+    elif args.command == "pin-all":
+        print(f"Pinned {pin_all_rooms(shard=args.shard)} rooms")
+    elif args.command == "unlock":
+        print(f"{args.room_id}: {'unlocked' if unlock_room(args.room_id) else 'not locked'}")
+    else:
+        result = move_room(args.room_id, args.target, wait=args.wait, grace=args.grace)
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
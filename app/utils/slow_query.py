@@ -0,0 +1,165 @@
+"""
+Slow query log with automatic EXPLAIN capture.
+
+Statements slower than SLOW_QUERY_THRESHOLD_MS are recorded with their
+duration, bind shapes (parameter names and types, never values) and the
+route that issued them, into a bounded in-memory ring buffer.
+
+The plan is captured afterwards by a single background thread on its own
+connection (EXPLAIN on Postgres, EXPLAIN QUERY PLAN on SQLite), so the
+request's transaction and cursor are never touched. Each statement shape
+is explained at most once per EXPLAIN_INTERVAL seconds.
+"""
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from app.config import engine, settings
+from app.utils.metrics import current_request
+from app.utils.query_counter import normalize_statement
+
+EXPLAIN_INTERVAL = 60.0
+EXPLAINABLE = ("SELECT", "WITH", "UPDATE", "DELETE")
+
+
+def bind_shape(parameters):
+    """Parameter names/positions mapped to type names; values are never kept."""
+    if isinstance(parameters, dict):
+        return {name: _type_name(value) for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_type_name(value) for value in parameters]
+    return _type_name(parameters)
+
+
+def _type_name(value) -> str:
+    if isinstance(value, (list, tuple)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+class SlowQueryLog:
+    def __init__(self, engine, threshold_ms: float, size: int = 200, explain: bool = True):
+        self.engine = engine
+        self.threshold = threshold_ms / 1000
+        self.explain = explain
+        self.entries = deque(maxlen=size)
+        self.recorded_total = 0
+
+        self._explained_at: Dict[str, float] = {}
+        self._jobs: "queue.Queue" = queue.Queue(maxsize=100)
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    # ---------- recording ----------
+
+    def install(self):
+        event.listen(self.engine, "before_cursor_execute", self._before)
+        event.listen(self.engine, "after_cursor_execute", self._after)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._slow_query_started = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_slow_query_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        if elapsed >= self.threshold:
+            self.record(statement, parameters, elapsed, executemany, conn.dialect.name)
+
+    def record(self, statement: str, parameters, elapsed: float, executemany: bool = False, dialect: str = ""):
+        stats = current_request.get()
+        route = f"{stats.scope.get('method', '')} {stats.route}" if stats is not None else None
+        shape = normalize_statement(statement)
+
+        entry = {
+            "recorded_at": datetime.utcnow().isoformat(),
+            "duration_ms": round(elapsed * 1000, 2),
+            "route": route,
+            "statement": statement,
+            "shape": shape,
+            "bind_shape": bind_shape(parameters[0] if executemany and parameters else parameters),
+            "executemany": executemany,
+            "plan": None,
+        }
+        with self._lock:
+            self.entries.append(entry)
+            self.recorded_total += 1
+        print(f"Slow query ({entry['duration_ms']} ms) {route or '-'}: {shape[:200]}")
+
+        if self.explain and not executemany and statement.lstrip().upper().startswith(EXPLAINABLE):
+            self._queue_explain(entry, statement, parameters, shape, dialect)
+
+    # ---------- EXPLAIN ----------
+
+    def _queue_explain(self, entry: dict, statement: str, parameters, shape: str, dialect: str):
+        now = time.monotonic()
+        with self._lock:
+            last = self._explained_at.get(shape)
+            if last is not None and now - last < EXPLAIN_INTERVAL:
+                entry["plan"] = "(explained recently, see an earlier entry with the same shape)"
+                return
+            self._explained_at[shape] = now
+            if len(self._explained_at) > 1000:
+                self._explained_at.clear()
+
+        try:
+            self._jobs.put_nowait((entry, statement, parameters, dialect))
+        except queue.Full:
+            entry["plan"] = "(skipped: explain queue full)"
+            return
+
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._explain_loop, name="slow-query-explain", daemon=True)
+            self._worker.start()
+
+    def _explain_loop(self):
+        while True:
+            entry, statement, parameters, dialect = self._jobs.get()
+            entry["plan"] = self._explain(statement, parameters, dialect)
+
+    def _explain(self, statement: str, parameters, dialect: str) -> str:
+        prefix = "EXPLAIN QUERY PLAN " if dialect == "sqlite" else "EXPLAIN "
+        try:
+            with self.engine.connect() as conn:
+                rows = conn.exec_driver_sql(prefix + statement, parameters or ()).fetchall()
+                conn.rollback()
+        except Exception as e:
+            return f"(explain failed: {type(e).__name__}: {e})"
+
+        if dialect == "sqlite":
+            # (id, parent, notused, detail)
+            return "\n".join(str(row[-1]) for row in rows)
+        return "\n".join(str(row[0]) for row in rows)
+
+    # ---------- reads ----------
+
+    def recent(self, limit: int = 50) -> List[dict]:
+        with self._lock:
+            entries = list(self.entries)
+        return [dict(entry) for entry in reversed(entries[-limit:])]
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self._explained_at.clear()
+
+    def stats(self) -> dict:
+        return {
+            "threshold_ms": round(self.threshold * 1000, 2),
+            "buffered": len(self.entries),
+            "capacity": self.entries.maxlen,
+            "recorded_total": self.recorded_total,
+        }
+
+
+slow_query_log = SlowQueryLog(
+    engine,
+    threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+    size=settings.SLOW_QUERY_LOG_SIZE,
+    explain=settings.SLOW_QUERY_EXPLAIN,
+)
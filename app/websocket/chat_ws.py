@@ -1,64 +1,253 @@
 from fastapi import WebSocket, WebSocketDisconnect, Depends
-from typing import Dict, List
+from typing import Dict, List, Set
 from sqlalchemy.orm import Session
-from app.config import get_db
+from app.config import get_db, settings
 from app.models.user import User
-from app.models.chat_room import ChatRoomMember
-import json
+from app.models.chat_room import ChatRoom, ChatRoomMember
+from app.websocket.presence import PresenceTracker
+from app.utils.metrics import WS_BROADCAST_LATENCY
+from app.utils.membership import is_room_member
+from app.utils.rate_limit import check_frame_rate
+from app.websocket.protocol import JSON, encode, negotiate, receive_message, send_payload
+import asyncio
+import time
 
 class ConnectionManager:
-    def __init__(self):
-        # room_id -> List[WebSocket]
+    def __init__(
+        self,
+        presence: PresenceTracker = None,
+        ping_interval: float = 25.0,
+        idle_timeout: float = 60.0,
+    ):
+        # room_id -> List[WebSocket] (해당 방을 구독 중인 소켓)
         self.active_connections: Dict[str, List[WebSocket]] = {}
         # websocket -> user_id
         self.user_connections: Dict[WebSocket, str] = {}
+        # user_id -> Set[WebSocket]
+        self.user_sockets: Dict[str, Set[WebSocket]] = {}
+        # websocket -> 구독 중인 room_id 집합
+        self.socket_rooms: Dict[WebSocket, Set[str]] = {}
+        # websocket -> 인코딩 (json / msgpack)
+        self.socket_protocols: Dict[WebSocket, str] = {}
+        # websocket -> 마지막 수신 시각 (monotonic)
+        self.last_activity: Dict[WebSocket, float] = {}
+        # heartbeat/pong 프레임을 보낸 적이 있는 소켓 (앱 수준 ping을 이해하는 클라이언트)
+        self.heartbeat_sockets: Set[WebSocket] = set()
+        # 접속/입력 중 상태 (변경 사항은 모아서 주기적으로 방송)
+        self.presence = presence or PresenceTracker()
 
-    async def connect(self, websocket: WebSocket, room_id: str, user_id: str):
-        await websocket.accept()
+        # 앱 수준 ping 및 응답 없는 연결 정리 (heartbeat_sockets만 대상)
+        self.ping_interval = ping_interval
+        self.idle_timeout = idle_timeout
+        self._heartbeat_task: asyncio.Task = None
+
+        self.reaped_total = 0
+        self.pings_sent_total = 0
+        self.send_failures_total = 0
 
-        if room_id not in self.active_connections:
-            self.active_connections[room_id] = []
+    async def accept(self, websocket: WebSocket, user_id: str):
+        """Accept and register a socket without subscribing it to any room."""
+        subprotocol = negotiate(websocket.scope.get("subprotocols", []))
+        await websocket.accept(subprotocol=subprotocol)
+        self.register(websocket, user_id, subprotocol or JSON)
 
-        self.active_connections[room_id].append(websocket)
+    def register(self, websocket: WebSocket, user_id: str, protocol: str = JSON):
         self.user_connections[websocket] = user_id
+        self.socket_protocols[websocket] = protocol
+        self.user_sockets.setdefault(user_id, set()).add(websocket)
+        self.socket_rooms[websocket] = set()
+        self.touch(websocket)
 
-    def disconnect(self, websocket: WebSocket, room_id: str):
-        if room_id in self.active_connections:
-            if websocket in self.active_connections[room_id]:
-                self.active_connections[room_id].remove(websocket)
+        self.presence.ensure_started(self.send_to_room)
+        self._ensure_heartbeat()
+
+    async def connect(self, websocket: WebSocket, room_id: str, user_id: str):
+        # 방 하나 전용 소켓 (/ws/{room_id}/{user_id})
+        await self.accept(websocket, user_id)
+        self.subscribe(websocket, room_id)
 
-            if not self.active_connections[room_id]:
+    def subscribe(self, websocket: WebSocket, room_id: str):
+        rooms = self.socket_rooms.get(websocket)
+        if rooms is None or room_id in rooms:
+            return
+
+        rooms.add(room_id)
+        self.active_connections.setdefault(room_id, []).append(websocket)
+        self.presence.user_connected(room_id, self.user_connections[websocket])
+
+    def unsubscribe(self, websocket: WebSocket, room_id: str):
+        rooms = self.socket_rooms.get(websocket)
+        if not rooms or room_id not in rooms:
+            return
+
+        rooms.discard(room_id)
+        connections = self.active_connections.get(room_id)
+        if connections is not None:
+            if websocket in connections:
+                connections.remove(websocket)
+            if not connections:
                 del self.active_connections[room_id]
 
-        if websocket in self.user_connections:
-            del self.user_connections[websocket]
+        self.presence.user_disconnected(room_id, self.user_connections[websocket])
+
+    def disconnect(self, websocket: WebSocket, room_id: str = None):
+        """Remove a socket and all of its subscriptions. Safe to call twice."""
+        for subscribed in list(self.socket_rooms.get(websocket, ())):
+            self.unsubscribe(websocket, subscribed)
+
+        user_id = self.user_connections.pop(websocket, None)
+        if user_id is not None:
+            sockets = self.user_sockets.get(user_id)
+            if sockets is not None:
+                sockets.discard(websocket)
+                if not sockets:
+                    del self.user_sockets[user_id]
+
+        self.socket_rooms.pop(websocket, None)
+        self.socket_protocols.pop(websocket, None)
+        self.last_activity.pop(websocket, None)
+        self.heartbeat_sockets.discard(websocket)
+
+    def rooms_of(self, websocket: WebSocket) -> Set[str]:
+        return set(self.socket_rooms.get(websocket, ()))
+
+    def touch(self, websocket: WebSocket, message_type: str = None):
+        self.last_activity[websocket] = time.monotonic()
+        if message_type in ("heartbeat", "pong"):
+            self.heartbeat_sockets.add(websocket)
+
+    # ---------- heartbeat ----------
+
+    def _ensure_heartbeat(self):
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.get_running_loop().create_task(self._heartbeat_loop())
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(min(self.ping_interval, self.idle_timeout) / 2)
+            try:
+                await self.reap_idle()
+            except Exception as e:
+                print(f"WebSocket heartbeat error: {e}")
+
+    async def reap_idle(self):
+        """
+        Ping sockets that have been quiet for ping_interval and close the
+        ones that have not sent anything (including pongs) for idle_timeout.
+
+        Only sockets that opted in to app-level heartbeats (sent a
+        heartbeat or pong frame) are checked. Older clients do not know
+        the ping frame and may legitimately only listen; their dead
+        connections are closed by the server's protocol-level ping/pong
+        (uvicorn ws_ping_interval / ws_ping_timeout) or on a failed send.
+        """
+        now = time.monotonic()
+        for websocket in list(self.heartbeat_sockets):
+            last = self.last_activity.get(websocket)
+            if last is None:
+                continue
+            idle = now - last
+            if idle > self.idle_timeout:
+                await self._reap(websocket)
+            elif idle >= self.ping_interval:
+                try:
+                    await self.send(websocket, {"type": "ping", "data": {}})
+                    self.pings_sent_total += 1
+                except Exception:
+                    self.send_failures_total += 1
+                    await self._reap(websocket)
+
+    async def _reap(self, websocket: WebSocket):
+        if websocket not in self.user_connections:
+            return
+        self.disconnect(websocket)
+        self.reaped_total += 1
+        try:
+            await websocket.close(code=1001)  # Going Away
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        return {
+            "live_sockets": len(self.user_connections),
+            "heartbeat_sockets": len(self.heartbeat_sockets),
+            "users": len(self.user_sockets),
+            "rooms": len(self.active_connections),
+            "subscriptions": sum(len(rooms) for rooms in self.socket_rooms.values()),
+            "msgpack_sockets": sum(1 for protocol in self.socket_protocols.values() if protocol != JSON),
+            "reaped_total": self.reaped_total,
+            "pings_sent_total": self.pings_sent_total,
+            "send_failures_total": self.send_failures_total,
+        }
+
+    # ---------- broadcasting ----------
+
+    async def send_throttled(self, websocket: WebSocket, error, room_id: str = None):
+        await self.send(websocket, {
+            "type": "error",
+            "data": {
+                "room_id": room_id,
+                "detail": str(error),
+                "retry_after": round(error.retry_after, 3),
+            }
+        })
+
+    async def send(self, websocket: WebSocket, message: dict):
+        protocol = self.socket_protocols.get(websocket, JSON)
+        await send_payload(websocket, encode(message, protocol))
 
     async def send_to_room(self, message: dict, room_id: str, exclude_ws: WebSocket = None):
         if room_id in self.active_connections:
+            started = time.perf_counter()
             disconnected = []
+            # 인코딩은 프로토콜마다 한 번만 하고 모든 소켓에 같은 payload를 보낸다
+            payloads = {}
 
-            for connection in self.active_connections[room_id]:
+            # 전송 중에 연결 목록이 바뀔 수 있으므로 복사본으로 순회
+            for connection in list(self.active_connections[room_id]):
                 if connection == exclude_ws:
                     continue
 
+                protocol = self.socket_protocols.get(connection, JSON)
+                payload = payloads.get(protocol)
+                if payload is None:
+                    payload = payloads[protocol] = encode(message, protocol)
+
                 try:
-                    await connection.send_json(message)
+                    await send_payload(connection, payload)
                 except Exception:
+                    self.send_failures_total += 1
                     disconnected.append(connection)
 
             # 연결이 끊어진 웹소켓 제거
             for ws in disconnected:
-                self.disconnect(ws, room_id)
+                self.disconnect(ws)
+
+            WS_BROADCAST_LATENCY.observe(time.perf_counter() - started)
 
     async def send_to_user(self, message: dict, user_id: str):
-        for websocket, uid in self.user_connections.items():
-            if uid == user_id:
-                try:
-                    await websocket.send_json(message)
-                except Exception:
-                    pass
+        payloads = {}
+        for websocket in list(self.user_sockets.get(user_id, ())):
+            protocol = self.socket_protocols.get(websocket, JSON)
+            payload = payloads.get(protocol)
+            if payload is None:
+                payload = payloads[protocol] = encode(message, protocol)
+            try:
+                await send_payload(websocket, payload)
+            except Exception:
+                self.send_failures_total += 1
+                self.disconnect(websocket)
+
+manager = ConnectionManager(
+    PresenceTracker(
+        flush_interval=settings.PRESENCE_FLUSH_INTERVAL,
+        typing_timeout=settings.TYPING_TIMEOUT,
+        heartbeat_timeout=settings.PRESENCE_TIMEOUT,
+    ),
+    ping_interval=settings.WS_PING_INTERVAL,
+    idle_timeout=settings.WS_IDLE_TIMEOUT,
+)
 
-manager = ConnectionManager()
 
 async def websocket_endpoint(
     websocket: WebSocket,
@@ -66,23 +255,39 @@ async def websocket_endpoint(
     user_id: str,
     db: Session = Depends(get_db)
 ):
-    # 채팅방 멤버 확인
-    is_member = db.query(ChatRoomMember).filter(
-        ChatRoomMember.chat_room_id == room_id,
-        ChatRoomMember.user_id == user_id
-    ).first()
-
-    if not is_member:
+    # 채팅방 멤버 확인 (삭제 표시된 방은 구독 불가)
+    if not is_room_member(db, room_id, user_id):
         await websocket.close(code=1008)  # Policy Violation
         return
 
+    role = db.query(User.role).filter(User.id == user_id).scalar()
     await manager.connect(websocket, room_id, user_id)
 
     try:
         while True:
-            # 클라이언트로부터 메시지 수신
-            data = await websocket.receive_text()
-            message_data = json.loads(data)
+            # 클라이언트로부터 메시지 수신 (JSON 텍스트 또는 msgpack 바이너리)
+            message_data = await receive_message(websocket)
+
+            # 어떤 프레임이든 수신되면 접속 중으로 간주
+            message_type = message_data.get("type")
+            manager.touch(websocket, message_type)
+            if websocket in manager.heartbeat_sockets:
+                # heartbeat를 보내는 클라이언트만 presence 만료 대상 (조용한 클라이언트는 연결 여부로 판단)
+                manager.presence.heartbeat(user_id)
+
+            if message_type in ("heartbeat", "pong"):
+                continue
+
+            # 사용자/채팅방 단위 속도 제한 (초과하면 오류 프레임만 보내고 연결은 유지)
+            throttled = await check_frame_rate(user_id, role, room_id, broadcast=message_type != "typing")
+            if throttled:
+                await manager.send_throttled(websocket, throttled, room_id)
+                continue
+
+            # 입력 중 표시는 바로 방송하지 않고 presence에서 모아서 보낸다
+            if message_type == "typing":
+                manager.presence.set_typing(room_id, user_id, message_data.get("is_typing", True))
+                continue
 
             # 같은 채팅방의 다른 사용자들에게 브로드캐스트
             # 실제 DB 저장은 REST API(/api/chat/messages)에서 처리
@@ -102,10 +307,106 @@ async def websocket_endpoint(
         await manager.send_to_room(
             message={
                 "type": "user_left",
-                "data": {"user_id": user_id}
+                "data": {"user_id": user_id, "room_id": room_id}
             },
             room_id=room_id
         )
     except Exception as e:
         print(f"WebSocket error: {e}")
         manager.disconnect(websocket, room_id)
+
+
+async def user_websocket_endpoint(
+    websocket: WebSocket,
+    user_id: str,
+    db: Session = Depends(get_db)
+):
+    """
+    One socket per user for all rooms (/ws/{user_id}).
+
+    Control frames:
+        {"type": "subscribe", "room_id": "..."}
+        {"type": "unsubscribe", "room_id": "..."}
+    Any other frame must carry "room_id" and is broadcast to that room,
+    which the socket has to be subscribed to.
+    """
+    role = db.query(User.role).filter(User.id == user_id).scalar()
+    await manager.accept(websocket, user_id)
+    subscribed = set()
+
+    try:
+        while True:
+            message_data = await receive_message(websocket)
+
+            message_type = message_data.get("type")
+            room_id = message_data.get("room_id")
+            manager.touch(websocket, message_type)
+            if websocket in manager.heartbeat_sockets:
+                # heartbeat를 보내는 클라이언트만 presence 만료 대상 (조용한 클라이언트는 연결 여부로 판단)
+                manager.presence.heartbeat(user_id)
+
+            if message_type in ("heartbeat", "pong"):
+                continue
+
+            # 구독/입력 중 프레임은 방송되지 않으므로 방 버킷은 쓰지 않는다
+            broadcast = message_type not in ("subscribe", "unsubscribe", "typing")
+            throttled = await check_frame_rate(
+                user_id, role, room_id if room_id in manager.rooms_of(websocket) else None, broadcast
+            )
+            if throttled:
+                await manager.send_throttled(websocket, throttled, room_id)
+                continue
+
+            if message_type == "subscribe":
+                # 구독할 때 한 번만 멤버십 확인
+                if room_id and is_room_member(db, room_id, user_id):
+                    manager.subscribe(websocket, room_id)
+                    subscribed.add(room_id)
+                    await manager.send(websocket, {"type": "subscribed", "data": {"room_id": room_id}})
+                else:
+                    await manager.send(websocket, {
+                        "type": "error",
+                        "data": {"room_id": room_id, "detail": "You are not a member of this chat room"}
+                    })
+                continue
+
+            if message_type == "unsubscribe":
+                manager.unsubscribe(websocket, room_id)
+                subscribed.discard(room_id)
+                await manager.send(websocket, {"type": "unsubscribed", "data": {"room_id": room_id}})
+                continue
+
+            if room_id not in manager.rooms_of(websocket):
+                await manager.send(websocket, {
+                    "type": "error",
+                    "data": {"room_id": room_id, "detail": "Not subscribed to this chat room"}
+                })
+                continue
+
+            if message_type == "typing":
+                manager.presence.set_typing(room_id, user_id, message_data.get("is_typing", True))
+                continue
+
+            await manager.send_to_room(
+                message={
+                    "type": message_type or "message",
+                    "data": message_data
+                },
+                room_id=room_id
+            )
+
+    except WebSocketDisconnect:
+        rooms = manager.rooms_of(websocket) or subscribed
+        manager.disconnect(websocket)
+
+        for room_id in rooms:
+            await manager.send_to_room(
+                message={
+                    "type": "user_left",
+                    "data": {"user_id": user_id, "room_id": room_id}
+                },
+                room_id=room_id
+            )
+    except Exception as e:
+        print(f"WebSocket error: {e}")
+        manager.disconnect(websocket)
@@ -0,0 +1,201 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+SendToRoom = Callable[[dict, str], Awaitable[None]]
+
+
+class PresenceTracker:
+    """
+    In-memory presence and typing state per room.
+
+    Changes are not broadcast immediately: they are collected per room and
+    flushed every `flush_interval` seconds as a single "presence" frame,
+    so a burst of keystrokes or reconnects costs one O(room) broadcast.
+
+    Connect/disconnect decide who is online. Only users whose client sends
+    app-level heartbeats are also shown offline after `heartbeat_timeout`
+    without one; quiet clients rely on protocol pings, which close dead
+    sockets instead.
+    """
+
+    def __init__(self, flush_interval: float = 0.25, typing_timeout: float = 5.0, heartbeat_timeout: float = 60.0):
+        self.flush_interval = flush_interval
+        self.typing_timeout = typing_timeout
+        self.heartbeat_timeout = heartbeat_timeout
+
+        # room_id -> user_id -> 열린 연결 수
+        self.rooms: Dict[str, Dict[str, int]] = {}
+        # user_id -> 접속 중인 room_id 집합
+        self.user_rooms: Dict[str, Set[str]] = {}
+        # user_id -> 마지막 heartbeat (monotonic), 앱 수준 heartbeat를 보내는 사용자만
+        self.last_seen: Dict[str, float] = {}
+        # heartbeat가 끊겨 오프라인으로 보이는 사용자
+        self.stale: Set[str] = set()
+        # room_id -> user_id -> 입력 중 상태 만료 시각
+        self.typing: Dict[str, Dict[str, float]] = {}
+
+        # room_id -> 아직 보내지 않은 변경 사항
+        self._joined: Dict[str, Set[str]] = {}
+        self._left: Dict[str, Set[str]] = {}
+        self._typing_changed: Set[str] = set()
+
+        self._send: Optional[SendToRoom] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # ---------- state changes ----------
+
+    def _mark_joined(self, room_id: str, user_id: str):
+        left = self._left.get(room_id)
+        if left and user_id in left:
+            # 같은 구간 안에서 나갔다 들어온 경우는 상쇄
+            left.discard(user_id)
+        else:
+            self._joined.setdefault(room_id, set()).add(user_id)
+
+    def _mark_left(self, room_id: str, user_id: str):
+        joined = self._joined.get(room_id)
+        if joined and user_id in joined:
+            joined.discard(user_id)
+        else:
+            self._left.setdefault(room_id, set()).add(user_id)
+
+    def user_connected(self, room_id: str, user_id: str):
+        users = self.rooms.setdefault(room_id, {})
+        users[user_id] = users.get(user_id, 0) + 1
+        self.user_rooms.setdefault(user_id, set()).add(room_id)
+        if user_id in self.last_seen:
+            self.heartbeat(user_id)
+
+        if users[user_id] == 1:
+            self._mark_joined(room_id, user_id)
+
+    def user_disconnected(self, room_id: str, user_id: str):
+        users = self.rooms.get(room_id)
+        if not users or user_id not in users:
+            return
+
+        users[user_id] -= 1
+        if users[user_id] > 0:
+            return
+
+        del users[user_id]
+        if not users:
+            del self.rooms[room_id]
+
+        rooms = self.user_rooms.get(user_id)
+        if rooms is not None:
+            rooms.discard(room_id)
+            if not rooms:
+                del self.user_rooms[user_id]
+                self.last_seen.pop(user_id, None)
+                self.stale.discard(user_id)
+
+        self._clear_typing(room_id, user_id)
+        self._mark_left(room_id, user_id)
+
+    def heartbeat(self, user_id: str):
+        self.last_seen[user_id] = time.monotonic()
+        if user_id in self.stale:
+            self.stale.discard(user_id)
+            for room_id in self.user_rooms.get(user_id, ()):
+                self._mark_joined(room_id, user_id)
+
+    def set_typing(self, room_id: str, user_id: str, is_typing: bool = True):
+        if room_id not in self.rooms or user_id not in self.rooms[room_id]:
+            return
+
+        typing = self.typing.setdefault(room_id, {})
+        if is_typing:
+            # 연속 입력은 만료 시각만 연장하고 브로드캐스트하지 않는다
+            if user_id not in typing:
+                self._typing_changed.add(room_id)
+            typing[user_id] = time.monotonic() + self.typing_timeout
+        else:
+            self._clear_typing(room_id, user_id)
+
+    def _clear_typing(self, room_id: str, user_id: str):
+        typing = self.typing.get(room_id)
+        if typing and user_id in typing:
+            del typing[user_id]
+            if not typing:
+                del self.typing[room_id]
+            self._typing_changed.add(room_id)
+
+    def _expire(self):
+        now = time.monotonic()
+
+        for room_id, typing in list(self.typing.items()):
+            for user_id, expires_at in list(typing.items()):
+                if expires_at <= now:
+                    self._clear_typing(room_id, user_id)
+
+        for user_id, seen in list(self.last_seen.items()):
+            if user_id not in self.stale and now - seen > self.heartbeat_timeout:
+                self.stale.add(user_id)
+                for room_id in self.user_rooms.get(user_id, ()):
+                    self._clear_typing(room_id, user_id)
+                    self._mark_left(room_id, user_id)
+
+    # ---------- reads ----------
+
+    def online_users(self, room_id: str) -> list:
+        return sorted(user_id for user_id in self.rooms.get(room_id, {}) if user_id not in self.stale)
+
+    def typing_users(self, room_id: str) -> list:
+        return sorted(self.typing.get(room_id, {}))
+
+    def snapshot(self, room_id: str) -> dict:
+        return {
+            "room_id": room_id,
+            "online": self.online_users(room_id),
+            "typing": self.typing_users(room_id),
+        }
+
+    # ---------- broadcasting ----------
+
+    def pending_frames(self) -> Dict[str, dict]:
+        """Collect and reset the coalesced changes, one frame per room."""
+        self._expire()
+
+        room_ids = set(self._joined) | set(self._left) | self._typing_changed
+        frames = {}
+        for room_id in room_ids:
+            joined = sorted(self._joined.get(room_id, ()))
+            left = sorted(self._left.get(room_id, ()))
+            if not joined and not left and room_id not in self._typing_changed:
+                continue
+            frames[room_id] = {
+                "type": "presence",
+                "data": {
+                    "room_id": room_id,
+                    "joined": joined,
+                    "left": left,
+                    "typing": self.typing_users(room_id),
+                },
+            }
+
+        self._joined.clear()
+        self._left.clear()
+        self._typing_changed.clear()
+        return frames
+
+    async def flush(self):
+        if self._send is None:
+            return
+        for room_id, frame in self.pending_frames().items():
+            await self._send(frame, room_id)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Presence flush error: {e}")
+
+    def ensure_started(self, send: SendToRoom):
+        """Start the flush loop on the running event loop (idempotent)."""
+        self._send = send
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
@@ -0,0 +1,82 @@
+"""
+WebSocket wire encodings, negotiated through Sec-WebSocket-Protocol.
+
+JSON (text frames) stays the default. Clients that offer "msgpack" in the
+handshake get MessagePack binary frames instead: smaller on the wire and
+cheaper to parse during bursts. Incoming frames are decoded by frame type,
+so a msgpack client may still send text JSON.
+"""
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Iterable, Optional, Union
+from fastapi import WebSocket, WebSocketDisconnect
+from app.utils.serialization import dumps
+
+try:
+    import msgpack
+except ImportError:  # msgpack이 없으면 JSON만 협상
+    msgpack = None
+
+JSON = "json"
+MSGPACK = "msgpack"
+
+Payload = Union[str, bytes]
+
+
+def supported_protocols() -> list:
+    return [MSGPACK, JSON] if msgpack is not None else [JSON]
+
+
+def negotiate(offered: Iterable[str]) -> Optional[str]:
+    """
+    Pick the subprotocol to echo back in the handshake.
+    Returns None when the client offered nothing we speak (plain JSON).
+    """
+    supported = supported_protocols()
+    for protocol in offered:
+        protocol = protocol.strip().lower()
+        if protocol in supported:
+            return protocol
+    return None
+
+
+def _msgpack_default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not MessagePack serializable")
+
+
+def encode(message: dict, protocol: str) -> Payload:
+    if protocol == MSGPACK:
+        return msgpack.packb(message, default=_msgpack_default, use_bin_type=True)
+    return dumps(message).decode("utf-8")
+
+
+def decode(frame: Payload) -> dict:
+    if isinstance(frame, bytes):
+        if msgpack is None:
+            raise ValueError("Binary frames require msgpack")
+        return msgpack.unpackb(frame, raw=False)
+    return json.loads(frame)
+
+
+async def send_payload(websocket: WebSocket, payload: Payload):
+    if isinstance(payload, bytes):
+        await websocket.send_bytes(payload)
+    else:
+        await websocket.send_text(payload)
+
+
+async def receive_message(websocket: WebSocket) -> dict:
+    """receive_text() + json.loads(), but accepts binary msgpack frames too."""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+
+    frame = message.get("bytes")
+    if frame is None:
+        frame = message.get("text")
+    return decode(frame)
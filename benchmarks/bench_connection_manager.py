@@ -0,0 +1,265 @@
+"""
+ConnectionManager fan-out micro-benchmarks.
+
+Drives app/websocket/chat_ws.py's ConnectionManager with in-memory fake
+WebSockets (optionally slow or failing) and measures:
+
+  broadcast   send_to_room throughput and latency for room sizes 10..10,000
+  send_user   send_to_user cost as the total number of connections grows
+  churn       connect/disconnect cycles per second into a populated room
+  memory      bytes per connection held by the manager (tracemalloc)
+
+Usage:
+    python -m benchmarks.bench_connection_manager [--sizes 10 100 1000 10000]
+        [--slow-ratio 0.01] [--fail-ratio 0.01] [--json out.json]
+"""
+import argparse
+import asyncio
+import gc
+import json
+import math
+import os
+import random
+import time
+import tracemalloc
+from typing import List
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from app.websocket.chat_ws import ConnectionManager
+from app.websocket.presence import PresenceTracker
+
+MESSAGE = {
+    "type": "message",
+    "data": {
+        "type": "message",
+        "room_id": "room-0",
+        "sender_id": "user-0",
+        "content": "실험 결과 공유드립니다. 그래프는 첨부 파일을 확인해주세요.",
+        "timestamp": "2024-03-01T09:00:37.000001",
+    },
+}
+
+
+class FakeWebSocket:
+    """Just enough of starlette's WebSocket for ConnectionManager."""
+
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.scope = {"type": "websocket", "subprotocols": []}
+        self.delay = delay
+        self.fail = fail
+        self.sent = 0
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def close(self, code: int = 1000):
+        pass
+
+    async def _send(self):
+        if self.fail:
+            raise ConnectionResetError("fake socket closed")
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent += 1
+
+    async def send_text(self, data: str):
+        await self._send()
+
+    async def send_bytes(self, data: bytes):
+        await self._send()
+
+    async def send_json(self, data):
+        await self._send()
+
+
+def make_manager() -> ConnectionManager:
+    # presence/heartbeat 루프가 측정 중에 끼어들지 않도록 주기를 길게 잡는다
+    return ConnectionManager(
+        PresenceTracker(flush_interval=3600, typing_timeout=3600, heartbeat_timeout=3600),
+        ping_interval=3600,
+        idle_timeout=7200,
+    )
+
+
+def percentile(values: List[float], pct: float) -> float:
+    # nearest-rank
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+
+def latency_row(samples: List[float]) -> dict:
+    return {
+        "p50_us": round(percentile(samples, 50) * 1e6, 1),
+        "p99_us": round(percentile(samples, 99) * 1e6, 1),
+        "max_us": round(max(samples) * 1e6, 1),
+    }
+
+
+# ---------- scenarios ----------
+
+async def bench_broadcast(size: int, variant: str, slow_ratio: float, fail_ratio: float, slow_delay: float) -> dict:
+    manager = make_manager()
+    room_id = "room-0"
+    special = max(1, int(size * (slow_ratio if variant == "slow" else fail_ratio))) if variant != "clean" else 0
+
+    sockets = []
+    for i in range(size):
+        ws = FakeWebSocket(
+            delay=slow_delay if variant == "slow" and i < special else 0.0,
+            fail=variant == "failing" and i < special,
+        )
+        await manager.connect(ws, room_id, f"user-{i}")
+        sockets.append(ws)
+    failing = [ws for ws in sockets if ws.fail]
+
+    repeat = max(5, min(200, 20000 // size))
+    if variant == "slow":
+        repeat = min(repeat, 20)
+
+    samples = []
+    for _ in range(repeat):
+        # 실패한 소켓은 매번 제거되므로 측정 전에 다시 붙인다
+        for i, ws in enumerate(failing):
+            if ws not in manager.user_connections:
+                manager.register(ws, f"user-{i}")
+                manager.subscribe(ws, room_id)
+
+        started = time.perf_counter()
+        await manager.send_to_room(MESSAGE, room_id)
+        samples.append(time.perf_counter() - started)
+
+    elapsed = sum(samples)
+    return {
+        "scenario": "broadcast",
+        "variant": variant,
+        "room_size": size,
+        "special_sockets": special,
+        "broadcasts": repeat,
+        "deliveries_per_s": round(size * repeat / elapsed),
+        **latency_row(samples),
+    }
+
+
+async def bench_send_to_user(total: int) -> dict:
+    manager = make_manager()
+    for i in range(total):
+        await manager.connect(FakeWebSocket(), f"room-{i // 10}", f"user-{i}")
+
+    targets = [f"user-{random.randrange(total)}" for _ in range(2000)]
+    samples = []
+    for user_id in targets:
+        started = time.perf_counter()
+        await manager.send_to_user(MESSAGE, user_id)
+        samples.append(time.perf_counter() - started)
+
+    return {
+        "scenario": "send_to_user",
+        "connections": total,
+        "calls": len(targets),
+        **latency_row(samples),
+    }
+
+
+async def bench_churn(room_size: int, cycles: int = 2000) -> dict:
+    manager = make_manager()
+    room_id = "room-0"
+    for i in range(room_size):
+        await manager.connect(FakeWebSocket(), room_id, f"user-{i}")
+
+    sockets = [FakeWebSocket() for _ in range(cycles)]
+    samples = []
+    for i, ws in enumerate(sockets):
+        started = time.perf_counter()
+        await manager.connect(ws, room_id, f"churn-{i}")
+        manager.disconnect(ws, room_id)
+        samples.append(time.perf_counter() - started)
+
+    # 입장/퇴장이 같은 flush 구간 안에서 상쇄되었는지도 확인
+    manager.presence.pending_frames()
+    return {
+        "scenario": "churn",
+        "room_size": room_size,
+        "cycles": cycles,
+        "cycles_per_s": round(cycles / sum(samples)),
+        **latency_row(samples),
+    }
+
+
+async def bench_memory(total: int) -> dict:
+    # 소켓 객체 자체는 미리 만들어 두고 매니저가 더 쓰는 메모리만 잰다
+    sockets = [FakeWebSocket() for _ in range(total)]
+    manager = make_manager()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i, ws in enumerate(sockets):
+        await manager.connect(ws, f"room-{i // 10}", f"user-{i}")
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return {
+        "scenario": "memory",
+        "connections": total,
+        "bytes_per_connection": round((after - before) / total),
+    }
+
+
+async def run(sizes: List[int], slow_ratio: float, fail_ratio: float, slow_delay: float) -> List[dict]:
+    results = []
+    for size in sizes:
+        for variant in ("clean", "slow", "failing"):
+            results.append(await bench_broadcast(size, variant, slow_ratio, fail_ratio, slow_delay))
+    for total in sizes:
+        results.append(await bench_send_to_user(total))
+    for size in sizes:
+        results.append(await bench_churn(size))
+    results.append(await bench_memory(max(sizes)))
+    return results
+
+
+def print_results(results: List[dict]):
+    print(f"{'broadcast':>10} {'size':>7} {'variant':>8} {'deliveries/s':>13} {'p50(us)':>10} {'p99(us)':>10}")
+    for row in results:
+        if row["scenario"] == "broadcast":
+            print(f"{'':>10} {row['room_size']:>7} {row['variant']:>8} {row['deliveries_per_s']:>13} "
+                  f"{row['p50_us']:>10} {row['p99_us']:>10}")
+
+    print(f"\n{'send_user':>10} {'conns':>7} {'p50(us)':>10} {'p99(us)':>10}")
+    for row in results:
+        if row["scenario"] == "send_to_user":
+            print(f"{'':>10} {row['connections']:>7} {row['p50_us']:>10} {row['p99_us']:>10}")
+
+    print(f"\n{'churn':>10} {'size':>7} {'cycles/s':>10} {'p99(us)':>10}")
+    for row in results:
+        if row["scenario"] == "churn":
+            print(f"{'':>10} {row['room_size']:>7} {row['cycles_per_s']:>10} {row['p99_us']:>10}")
+
+    for row in results:
+        if row["scenario"] == "memory":
+            print(f"\nmemory: {row['bytes_per_connection']} bytes/connection at {row['connections']} connections")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--slow-ratio", type=float, default=0.01, help="share of slow sockets in the 'slow' variant")
+    parser.add_argument("--slow-delay", type=float, default=0.001, help="seconds each slow socket takes per send")
+    parser.add_argument("--fail-ratio", type=float, default=0.01, help="share of failing sockets in the 'failing' variant")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    results = asyncio.run(run(args.sizes, args.slow_ratio, args.fail_ratio, args.slow_delay))
+    print_results(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Serialization micro-benchmark for message list responses.
+
+Compares the default FastAPI path (response_model validation with
+from_attributes + jsonable_encoder + json.dumps) with the fast path in
+app/utils/serialization.py (plain dict rows + orjson).
+
+Usage:
+    python -m benchmarks.bench_serialization [--sizes 10 100 1000] [--json out.json]
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from app.models.message import Message, MessageType
+from app.schemas.chat import MessageResponse
+from app.utils.serialization import dumps, message_rows
+
+
+def make_messages(count: int) -> List[Message]:
+    base = datetime(2024, 3, 1, 9, 0, 0)
+    return [
+        Message(
+            id=f"00000000-0000-0000-0000-{i:012d}",
+            chat_room_id="room-1",
+            sender_id=f"user-{i % 7}",
+            sender_name="홍길동",
+            sender_role="student",
+            type=MessageType.text,
+            content="실험 결과 공유드립니다. 그래프는 첨부 파일을 확인해주세요. " * 2,
+            timestamp=base + timedelta(seconds=i * 37, microseconds=i),
+            file_url=None,
+            file_name=None,
+            parent_message_id=None,
+            feedback_ids=[],
+        )
+        for i in range(count)
+    ]
+
+
+def default_path(messages, adapter) -> bytes:
+    validated = adapter.validate_python(messages, from_attributes=True)
+    return json.dumps(jsonable_encoder(validated), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def fast_path(messages) -> bytes:
+    return dumps(message_rows(messages))
+
+
+def measure(func, *args, repeat: int) -> float:
+    # 워밍업 후 평균 시간 (마이크로초)
+    func(*args)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func(*args)
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def run(sizes: List[int]) -> List[dict]:
+    adapter = TypeAdapter(List[MessageResponse])
+    results = []
+    for size in sizes:
+        messages = make_messages(size)
+        assert json.loads(default_path(messages, adapter)) == json.loads(fast_path(messages))
+
+        repeat = max(20, 20000 // size)
+        default_us = measure(default_path, messages, adapter, repeat=repeat)
+        fast_us = measure(fast_path, messages, repeat=repeat)
+        results.append({
+            "page_size": size,
+            "default_us": round(default_us, 1),
+            "fast_us": round(fast_us, 1),
+            "speedup": round(default_us / fast_us, 2),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = run(args.sizes)
+    print(f"{'page':>6} {'default(us)':>12} {'fast(us)':>10} {'speedup':>8}")
+    for row in results:
+        print(f"{row['page_size']:>6} {row['default_us']:>12} {row['fast_us']:>10} {row['speedup']:>7}x")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
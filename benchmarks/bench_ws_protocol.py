@@ -0,0 +1,108 @@
+"""
+WebSocket wire-format benchmark: JSON vs MessagePack.
+
+Encodes and decodes typical realtime events (chat message, typing,
+presence, ping) with the encoders in app/websocket/protocol.py and
+reports bytes per frame and microseconds per encode/decode.
+
+Usage:
+    python -m benchmarks.bench_ws_protocol [--repeat 20000] [--json out.json]
+"""
+import argparse
+import json
+import os
+import time
+from typing import List
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from app.websocket.protocol import JSON, MSGPACK, decode, encode, supported_protocols
+
+EVENTS = {
+    "message": {
+        "type": "message",
+        "data": {
+            "type": "message",
+            "room_id": "4f1c2a9e-8d3b-4c55-9a10-2b7e6f0d8c31",
+            "id": "b0e7d2c4-1f6a-4e8b-9c3d-5a2f7e9b1d04",
+            "sender_id": "7c9e6679-7425-40de-944b-e07fc1f90ae7",
+            "sender_name": "홍길동",
+            "sender_role": "student",
+            "content": "실험 결과 공유드립니다. 그래프는 첨부 파일을 확인해주세요.",
+            "timestamp": "2024-03-01T09:00:37.000001",
+            "parent_message_id": None,
+            "feedback_ids": [],
+        },
+    },
+    "typing": {
+        "type": "typing",
+        "data": {"room_id": "4f1c2a9e-8d3b-4c55-9a10-2b7e6f0d8c31", "is_typing": True},
+    },
+    "presence": {
+        "type": "presence",
+        "data": {
+            "room_id": "4f1c2a9e-8d3b-4c55-9a10-2b7e6f0d8c31",
+            "joined": ["7c9e6679-7425-40de-944b-e07fc1f90ae7", "16fd2706-8baf-433b-82eb-8c7fada847da"],
+            "left": [],
+            "typing": ["7c9e6679-7425-40de-944b-e07fc1f90ae7"],
+        },
+    },
+    "ping": {"type": "ping", "data": {}},
+}
+
+
+def measure(func, *args, repeat: int) -> float:
+    # 워밍업 후 평균 시간 (마이크로초)
+    func(*args)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func(*args)
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def run(repeat: int) -> List[dict]:
+    results = []
+    for name, event in EVENTS.items():
+        for protocol in supported_protocols():
+            payload = encode(event, protocol)
+            assert decode(payload) == event
+            size = len(payload.encode("utf-8")) if isinstance(payload, str) else len(payload)
+            results.append({
+                "event": name,
+                "protocol": protocol,
+                "bytes": size,
+                "encode_us": round(measure(encode, event, protocol, repeat=repeat), 2),
+                "decode_us": round(measure(decode, payload, repeat=repeat), 2),
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=20000)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if MSGPACK not in supported_protocols():
+        print("msgpack is not installed; only JSON is measured")
+
+    results = run(args.repeat)
+    print(f"{'event':>10} {'protocol':>9} {'bytes':>6} {'encode(us)':>11} {'decode(us)':>11}")
+    for row in results:
+        print(f"{row['event']:>10} {row['protocol']:>9} {row['bytes']:>6} {row['encode_us']:>11} {row['decode_us']:>11}")
+
+    by_event = {}
+    for row in results:
+        by_event.setdefault(row["event"], {})[row["protocol"]] = row["bytes"]
+    for name, sizes in by_event.items():
+        if MSGPACK in sizes:
+            print(f"{name}: msgpack is {sizes[MSGPACK] / sizes[JSON]:.0%} of JSON size")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+"""
+End-to-end load test for the REST and WebSocket API.
+
+Launches the app under uvicorn (SQLite by default, or --database-url for a
+local Postgres), or targets a running server with --url. Setup goes through
+the public API: signup/login, projects (create + join by invite code) and
+DM rooms between neighbouring users. It then runs a weighted mix of
+create_message / get_messages / get_chat_rooms from concurrent HTTP workers
+while WebSocket clients on /ws/{user_id} publish timestamped frames to
+their rooms and measure delivery latency on the receiving sockets.
+
+Message traffic uses DM rooms: project chat rooms have no ChatRoomMember
+rows, so the chat endpoints reject messages there.
+
+Usage:
+    python -m benchmarks.load_test [--duration 30] [--users 20] [--concurrency 16]
+        [--ws-clients 10] [--mix create_message=3,get_messages=5,get_chat_rooms=2]
+        [--save baseline.json] [--compare baseline.json --tolerance 0.2]
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+import websockets
+
+DEFAULT_MIX = "create_message=3,get_messages=5,get_chat_rooms=2"
+PASSWORD = "loadtest-password"
+
+
+# ---------- helpers ----------
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    # nearest-rank
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - set(OPERATIONS)
+    if unknown:
+        raise SystemExit(f"Unknown operations in --mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class LaunchedServer:
+    """uvicorn subprocess with load-test friendly settings."""
+
+    def __init__(self, database_url: Optional[str], workers: int):
+        self.tmpdir = tempfile.mkdtemp(prefix="loadtest-")
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.database_url = database_url or f"sqlite:///{os.path.join(self.tmpdir, 'loadtest.db')}"
+        self.workers = workers
+        self.process = None
+
+    def start(self):
+        env = dict(os.environ)
+        env.update({
+            "DATABASE_URL": self.database_url,
+            "SECRET_KEY": env.get("SECRET_KEY", "loadtest"),
+            # 부하 생성기 자체가 속도 제한에 걸리지 않도록 끈다
+            "RATE_LIMIT_ENABLED": "false",
+            # 준비 단계의 가입/로그인이 bcrypt에 묶이지 않도록 비용을 낮춘다
+            "BCRYPT_ROUNDS": env.get("BCRYPT_ROUNDS", "4"),
+        })
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app",
+             "--host", "127.0.0.1", "--port", str(self.port),
+             "--workers", str(self.workers), "--log-level", "warning"],
+            env=env,
+        )
+
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise SystemExit("uvicorn exited during startup")
+            try:
+                if httpx.get(f"{self.url}/health", timeout=1).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        self.stop()
+        raise SystemExit("uvicorn did not become healthy within 30s")
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+# ---------- setup ----------
+
+class VirtualUser:
+    def __init__(self, index: int):
+        self.index = index
+        self.id: Optional[str] = None
+        self.token: Optional[str] = None
+        self.rooms: List[str] = []
+
+    @property
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.token}"}
+
+
+async def _check(response: httpx.Response, what: str) -> dict:
+    if response.status_code >= 400:
+        raise SystemExit(f"{what} failed: {response.status_code} {response.text[:200]}")
+    return response.json()
+
+
+async def setup(client: httpx.AsyncClient, users: int, projects: int, concurrency: int) -> List[VirtualUser]:
+    run_id = f"{int(time.time())}-{random.randrange(10**6)}"
+    population = [VirtualUser(i) for i in range(users)]
+    limit = asyncio.Semaphore(concurrency)
+
+    async def register(user: VirtualUser):
+        email = f"loadtest-{run_id}-{user.index}@example.com"
+        async with limit:
+            body = await _check(await client.post("/api/auth/signup", json={
+                "name": f"부하테스트 {user.index}",
+                "email": email,
+                "password": PASSWORD,
+                "role": "professor" if user.index < projects else "student",
+            }), "signup")
+            user.id = body["id"]
+            body = await _check(await client.post("/api/auth/login", json={
+                "email": email, "password": PASSWORD,
+            }), "login")
+            user.token = body["access_token"]
+
+    await asyncio.gather(*(register(user) for user in population))
+
+    # 교수 계정이 프로젝트를 만들고 나머지는 초대 코드로 순서대로 참여
+    invite_codes = []
+    for owner in population[:projects]:
+        body = await _check(await client.post(
+            "/api/projects", json={"name": f"부하테스트 프로젝트 {owner.index}"}, headers=owner.headers
+        ), "create project")
+        invite_codes.append(body["invite_code"])
+
+    async def join(user: VirtualUser):
+        async with limit:
+            await _check(await client.post(
+                "/api/projects/join",
+                json={"invite_code": invite_codes[user.index % len(invite_codes)]},
+                headers=user.headers,
+            ), "join project")
+
+    if invite_codes:
+        await asyncio.gather(*(join(user) for user in population[projects:]))
+
+    # 이웃한 사용자끼리 DM 방을 만들어 메시지 트래픽에 사용
+    for user in population:
+        other = population[(user.index + 1) % len(population)]
+        body = await _check(await client.post(
+            "/api/chat/dm", params={"other_user_id": other.id}, headers=user.headers
+        ), "create dm")
+        user.rooms.append(body["id"])
+        other.rooms.append(body["id"])
+
+    return population
+
+
+# ---------- HTTP workload ----------
+
+async def op_create_message(client, user: VirtualUser):
+    return await client.post("/api/chat/messages", headers=user.headers, json={
+        "chat_room_id": random.choice(user.rooms),
+        "content": "부하 테스트 메시지 " + "x" * random.randrange(10, 200),
+        "type": "text",
+    })
+
+
+async def op_get_messages(client, user: VirtualUser):
+    return await client.get(
+        f"/api/chat/rooms/{random.choice(user.rooms)}/messages",
+        params={"limit": 50},
+        headers=user.headers,
+    )
+
+
+async def op_get_chat_rooms(client, user: VirtualUser):
+    return await client.get("/api/chat/rooms", headers=user.headers)
+
+
+OPERATIONS = {
+    "create_message": op_create_message,
+    "get_messages": op_get_messages,
+    "get_chat_rooms": op_get_chat_rooms,
+}
+
+
+async def http_worker(client, population, mix, deadline, latencies, errors, statuses):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    while time.time() < deadline:
+        name = random.choices(names, weights)[0]
+        user = random.choice(population)
+        started = time.perf_counter()
+        try:
+            response = await OPERATIONS[name](client, user)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - started
+
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        if status == 200:
+            latencies[name].append(elapsed)
+        else:
+            errors[name] += 1
+
+
+# ---------- WebSocket workload ----------
+
+async def ws_client(base_url: str, user: VirtualUser, deadline: float, interval: float, result: dict):
+    url = base_url.replace("http", "ws", 1) + f"/ws/{user.id}"
+    try:
+        async with websockets.connect(url, open_timeout=10) as ws:
+            for room_id in user.rooms:
+                await ws.send(json.dumps({"type": "subscribe", "room_id": room_id}))
+
+            async def publish():
+                while time.time() < deadline:
+                    await asyncio.sleep(random.uniform(0.5, 1.5) * interval)
+                    await ws.send(json.dumps({
+                        "type": "message",
+                        "room_id": random.choice(user.rooms),
+                        "sender": user.id,
+                        "sent_at": time.time(),
+                    }))
+                    result["sent"] += 1
+
+            async def consume():
+                while True:
+                    frame = json.loads(await ws.recv())
+                    data = frame.get("data") or {}
+                    if frame.get("type") == "ping":
+                        await ws.send(json.dumps({"type": "pong"}))
+                    elif frame.get("type") == "message" and "sent_at" in data and data.get("sender") != user.id:
+                        result["delivery"].append(time.time() - data["sent_at"])
+                    elif frame.get("type") == "error":
+                        result["errors"] += 1
+
+            consumer = asyncio.ensure_future(consume())
+            try:
+                await publish()
+                # 마지막으로 보낸 프레임이 도착할 시간을 준다
+                await asyncio.sleep(1.0)
+            finally:
+                consumer.cancel()
+    except (OSError, websockets.WebSocketException) as e:
+        result["errors"] += 1
+        result.setdefault("failures", []).append(f"{user.index}: {type(e).__name__}")
+
+
+# ---------- run / report ----------
+
+async def run(args, base_url: str) -> dict:
+    mix = parse_mix(args.mix)
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=30, limits=limits) as client:
+        print(f"setting up {args.users} users, {args.projects} projects ...")
+        population = await setup(client, args.users, args.projects, args.concurrency)
+
+        latencies: Dict[str, List[float]] = {name: [] for name in mix}
+        errors: Dict[str, int] = {name: 0 for name in mix}
+        statuses: Dict[str, int] = {}
+        ws_result = {"sent": 0, "errors": 0, "delivery": []}
+
+        print(f"running for {args.duration}s: {args.concurrency} HTTP workers, {args.ws_clients} WebSocket clients")
+        started = time.time()
+        deadline = started + args.duration
+        tasks = [
+            http_worker(client, population, mix, deadline, latencies, errors, statuses)
+            for _ in range(args.concurrency)
+        ]
+        tasks += [
+            ws_client(base_url, user, deadline, args.ws_interval, ws_result)
+            for user in population[:args.ws_clients]
+        ]
+        await asyncio.gather(*tasks)
+        elapsed = min(time.time(), deadline) - started
+
+    routes = {name: summarize(latencies[name], errors[name], elapsed) for name in mix}
+    total = sum(len(values) for values in latencies.values())
+    delivery = ws_result["delivery"]
+    return {
+        "meta": {
+            "duration_s": args.duration,
+            "users": args.users,
+            "projects": args.projects,
+            "concurrency": args.concurrency,
+            "ws_clients": args.ws_clients,
+            "mix": mix,
+            "database": "external" if args.url else ("postgres" if args.database_url and "postgres" in args.database_url else "sqlite"),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "statuses": statuses,
+        "routes": routes,
+        "websocket": {
+            "frames_sent": ws_result["sent"],
+            "frames_delivered": len(delivery),
+            "errors": ws_result["errors"],
+            "delivery_p50_ms": round(percentile(delivery, 50) * 1000, 2),
+            "delivery_p95_ms": round(percentile(delivery, 95) * 1000, 2),
+            "delivery_p99_ms": round(percentile(delivery, 99) * 1000, 2),
+        },
+    }
+
+
+def print_report(report: dict):
+    print(f"\nthroughput: {report['throughput_rps']} req/s   statuses: {report['statuses']}")
+    print(f"{'route':>16} {'count':>7} {'errors':>7} {'rps':>7} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9}")
+    for name, row in report["routes"].items():
+        print(f"{name:>16} {row['count']:>7} {row['errors']:>7} {row['rps']:>7} "
+              f"{row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9}")
+    ws = report["websocket"]
+    print(f"\nwebsocket: sent {ws['frames_sent']} frames, delivered {ws['frames_delivered']}, errors {ws['errors']}")
+    print(f"delivery latency p50/p95/p99: {ws['delivery_p50_ms']} / {ws['delivery_p95_ms']} / {ws['delivery_p99_ms']} ms")
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Returns a list of regressions beyond `tolerance` (0.2 = 20%)."""
+    regressions = []
+
+    def check(label: str, current: float, previous: float, higher_is_better: bool = False):
+        if not previous:
+            return
+        change = (current - previous) / previous
+        worse = -change if higher_is_better else change
+        marker = "REGRESSION" if worse > tolerance else ""
+        print(f"{label:>28} {previous:>10} -> {current:>10} ({change:+.0%}) {marker}")
+        if marker:
+            regressions.append(label)
+
+    print(f"\ncompared with baseline from {baseline.get('meta', {}).get('created_at', '?')}:")
+    check("throughput_rps", report["throughput_rps"], baseline.get("throughput_rps", 0), higher_is_better=True)
+    for name, row in report["routes"].items():
+        previous = baseline.get("routes", {}).get(name)
+        if previous:
+            check(f"{name} p95_ms", row["p95_ms"], previous["p95_ms"])
+            check(f"{name} p99_ms", row["p99_ms"], previous["p99_ms"])
+    check("ws delivery_p95_ms", report["websocket"]["delivery_p95_ms"],
+          baseline.get("websocket", {}).get("delivery_p95_ms", 0))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="target a running server instead of launching one")
+    parser.add_argument("--database-url", help="database for the launched server (default: temporary SQLite file)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the launched server")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--projects", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent HTTP workers")
+    parser.add_argument("--ws-clients", type=int, default=10)
+    parser.add_argument("--ws-interval", type=float, default=1.0, help="average seconds between frames per WebSocket client")
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--save", help="write the report to this file (e.g. a baseline)")
+    parser.add_argument("--compare", help="baseline report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression before failing")
+    args = parser.parse_args()
+
+    if args.users < 2:
+        parser.error("--users must be at least 2")
+    args.projects = max(1, min(args.projects, args.users))
+
+    server = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        server = LaunchedServer(args.database_url, args.workers)
+        server.start()
+        base_url = server.url
+
+    try:
+        report = asyncio.run(run(args, base_url))
+    finally:
+        if server:
+            server.stop()
+
+    print_report(report)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
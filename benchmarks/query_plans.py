@@ -0,0 +1,440 @@
+"""
+Query-plan regression check for the hot-path endpoints.
+
+Seeds a database with realistic volume (thousands of users and rooms,
+hundreds of thousands of messages), runs the schema migrations, then calls
+every endpoint in ENDPOINTS in-process with the TestClient while recording
+each statement the ORM sends. Every recorded statement is EXPLAINed with
+its real bind parameters (EXPLAIN QUERY PLAN on SQLite, EXPLAIN (FORMAT
+JSON) on Postgres), and the run fails when any plan does a sequential or
+full-index scan of a large table.
+
+A full scan shows up as:
+    SQLite    SCAN <table>  /  SCAN <table> USING [COVERING] INDEX ...
+    Postgres  Seq Scan, or Index [Only] Scan without an Index Cond
+
+Intentional scans are listed in ALLOWED_SCANS with the reason. Exit status
+is 1 when there are violations, so this can run in CI.
+
+Usage:
+    python -m benchmarks.query_plans [--database-url postgresql://...]
+        [--users 2000] [--messages 200000] [--large-table-rows 1000]
+        [--verbose] [--json report.json]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+PROBE_ID = "probe-user"
+
+# (METHOD, 경로 템플릿) -> {테이블: 사유}
+ALLOWED_SCANS = {
+    ("GET", "/api/users/"): {"users": "paged listing of every user (LIMIT, no filter)"},
+    ("GET", "/api/users/search/"): {"users": "substring search (ILIKE '%q%') cannot use a b-tree index"},
+}
+
+# (METHOD, 경로 템플릿, 요청 옵션) - 템플릿의 {name}은 seed()가 만든 ID로 채운다
+ENDPOINTS = [
+    ("GET", "/api/users/me", {}),
+    ("GET", "/api/users/{other_user}", {}),
+    ("GET", "/api/users/", {"params": {"limit": 50}}),
+    ("GET", "/api/users/search/", {"params": {"query": "user-00042"}}),
+    ("PUT", "/api/users/me", {"json": {"name": "Probe User"}}),
+    ("GET", "/api/projects/my", {}),
+    ("GET", "/api/projects/dashboard", {}),
+    ("GET", "/api/projects/{project}", {}),
+    ("GET", "/api/projects/{project}/members", {}),
+    ("POST", "/api/projects/join", {"json": {"invite_code": "{invite_code}"}}),
+    ("GET", "/api/chat/rooms", {}),
+    ("GET", "/api/chat/rooms/{room}", {}),
+    ("GET", "/api/chat/rooms/{room}/messages", {"params": {"limit": 100}}),
+    ("GET", "/api/chat/rooms/{room}/messages", {"params": {"skip": 2000, "limit": 100}}),
+    ("POST", "/api/chat/messages", {"json": {"chat_room_id": "{room}", "type": "text", "content": "plan check"}}),
+    ("POST", "/api/chat/messages", {"json": {
+        "chat_room_id": "{room}", "type": "feedback", "content": "plan check", "parent_message_id": "{message}",
+    }}),
+    ("POST", "/api/chat/versions", {"json": {"chat_room_id": "{room}", "description": "plan check"}}),
+    ("GET", "/api/chat/rooms/{room}/versions", {}),
+    ("GET", "/api/chat/versions/{version}/messages", {}),
+    ("GET", "/api/chat/rooms/{room}/export", {}),
+    ("GET", "/api/chat/versions/{version}/export", {}),
+    ("GET", "/api/chat/search", {"params": {"q": "plan", "limit": 50}}),
+    ("GET", "/api/chat/sync", {"params": {"since": "2024-01-01T00:00:00", "limit": 100}}),
+    ("POST", "/api/chat/dm", {"params": {"other_user_id": "{dm_partner}"}}),
+    ("GET", "/api/chat/dm/my", {}),
+    ("GET", "/api/chat/project/{project}", {}),
+    # 삭제는 백그라운드 purge 쿼리까지 포함해서 확인 (TestClient는 응답 전에 끝까지 실행)
+    ("DELETE", "/api/chat/rooms/{victim_room}", {}),
+    ("DELETE", "/api/projects/{victim_project}", {}),
+]
+
+EXPLAINABLE = ("SELECT", "WITH", "UPDATE", "DELETE")
+_ALIAS = re.compile(r'\b(?:FROM|JOIN)\s+"?(\w+)"?\s+AS\s+"?(\w+)"?', re.IGNORECASE)
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?")
+
+
+# ---------- seeding ----------
+
+def seed(engine, users: int, projects: int, members_per_project: int, dm_rooms: int,
+         messages: int, versions_per_room: int, rng: random.Random) -> Dict[str, str]:
+    """Bulk insert through Core; returns the IDs the endpoint templates refer to."""
+    from sqlalchemy import insert
+    from app.auth import get_password_hash
+    from app.models import ChatRoom, ChatRoomMember, ChatVersion, Message, Project, ProjectMember, User
+    from app.models.message import MessageType
+    from app.models.user import UserRole
+    from app.utils.dm import dm_pair_key
+
+    started = datetime.utcnow() - timedelta(days=365)
+    password = get_password_hash("query-plan-check")
+    roles = [UserRole.student] * 6 + [UserRole.assistant] * 3 + [UserRole.professor]
+
+    user_ids = [PROBE_ID] + [f"user-{i:05d}" for i in range(1, users)]
+    user_rows = [
+        {
+            "id": user_id,
+            "name": f"User {user_id}",
+            "email": f"{user_id}@lab.example",
+            "password": password,
+            "role": UserRole.professor if user_id == PROBE_ID else rng.choice(roles),
+            "created_at": started,
+        }
+        for user_id in user_ids
+    ]
+
+    project_rows, project_members, rooms, room_members = [], [], [], []
+    for i in range(projects):
+        project_id = f"project-{i:05d}"
+        owner = PROBE_ID if i < 20 else rng.choice(user_ids)
+        project_rows.append({
+            "id": project_id, "name": f"Project {i}", "description": None,
+            "invite_code": f"{i:06d}", "created_by": owner, "created_at": started, "revision": 0,
+        })
+        members = {owner} | set(rng.sample(user_ids, members_per_project))
+        if i >= 20:
+            members.discard(PROBE_ID)  # 마지막 프로젝트 초대 코드로 가입 테스트
+        for user_id in members:
+            project_members.append({
+                "project_id": project_id, "user_id": user_id,
+                "role": "owner" if user_id == owner else "member", "joined_at": started,
+            })
+
+        room_id = f"room-p{i:05d}"
+        rooms.append({
+            "id": room_id, "name": f"Project {i}", "description": None, "type": "project",
+            "project_id": project_id, "user1_id": None, "user2_id": None, "dm_key": None,
+            "created_at": started, "updated_at": started, "revision": 0,
+        })
+        room_members.extend({"chat_room_id": room_id, "user_id": user_id, "joined_at": started} for user_id in members)
+
+    pairs = set()
+    while len(pairs) < dm_rooms:
+        # 탐침 사용자의 DM 50개 + 나머지는 임의의 쌍
+        low, high = sorted(rng.sample(user_ids, 2) if len(pairs) >= 50 else (PROBE_ID, user_ids[len(pairs) + 1]))
+        pairs.add((low, high))
+    for i, (low, high) in enumerate(sorted(pairs)):
+        room_id = f"room-d{i:06d}"
+        rooms.append({
+            "id": room_id, "name": f"DM {low} - {high}", "description": "Direct Message", "type": "dm",
+            "project_id": None, "user1_id": low, "user2_id": high, "dm_key": dm_pair_key(low, high),
+            "created_at": started, "updated_at": started, "revision": 0,
+        })
+        room_members.append({"chat_room_id": room_id, "user_id": low, "joined_at": started})
+        room_members.append({"chat_room_id": room_id, "user_id": high, "joined_at": started})
+
+    # 메시지는 대부분 프로젝트 방에 몰린다 (탐침 방은 가장 큰 방)
+    room_ids = [room["id"] for room in rooms]
+    hot_rooms = room_ids[:projects]
+    members_by_room: Dict[str, List[str]] = {}
+    for member in room_members:
+        members_by_room.setdefault(member["chat_room_id"], []).append(member["user_id"])
+
+    target_room = hot_rooms[0]
+    message_rows = []
+    for i in range(messages):
+        if i % 20 == 0:
+            room_id = target_room
+        else:
+            room_id = rng.choice(hot_rooms) if rng.random() < 0.8 else rng.choice(room_ids)
+        sender = rng.choice(members_by_room[room_id])
+        message_rows.append({
+            "id": f"msg-{i:07d}", "chat_room_id": room_id, "sender_id": sender,
+            "sender_name": f"User {sender}", "sender_role": "student", "type": MessageType.text,
+            "content": f"message {i}", "timestamp": started + timedelta(seconds=i * 60 + rng.random()),
+            "file_url": None, "file_name": None, "parent_message_id": None, "feedback_ids": [],
+        })
+
+    target_messages = [row["id"] for row in message_rows if row["chat_room_id"] == target_room]
+    version_rows = []
+    for room_index, room_id in enumerate(hot_rooms):
+        for number in range(1, versions_per_room + 1):
+            version_rows.append({
+                "id": f"version-{room_index:05d}-{number:03d}", "chat_room_id": room_id,
+                "version_number": number, "description": None, "created_at": started,
+                "created_by": PROBE_ID, "message_ids": target_messages[:500] if room_id == target_room else [],
+            })
+
+    with engine.begin() as conn:
+        for model, rows in (
+            (User, user_rows), (Project, project_rows), (ProjectMember, project_members),
+            (ChatRoom, rooms), (ChatRoomMember, room_members), (Message, message_rows),
+            (ChatVersion, version_rows),
+        ):
+            for start in range(0, len(rows), 5000):
+                conn.execute(insert(model.__table__), rows[start:start + 5000])
+
+    non_member = next(user_id for user_id in user_ids[1:] if (PROBE_ID, user_id) not in pairs and (user_id, PROBE_ID) not in pairs)
+    return {
+        "other_user": user_ids[1],
+        "project": project_rows[0]["id"],
+        "victim_project": project_rows[1]["id"],
+        "invite_code": project_rows[-1]["invite_code"],
+        "room": target_room,
+        "victim_room": room_ids[1],
+        "message": target_messages[-1],
+        "version": f"version-00000-{versions_per_room:03d}",
+        "dm_partner": non_member,
+    }
+
+
+def table_sizes(engine) -> Dict[str, int]:
+    from sqlalchemy import func, select
+    from app.config import Base
+
+    with engine.connect() as conn:
+        return {
+            name: conn.execute(select(func.count()).select_from(table)).scalar()
+            for name, table in Base.metadata.tables.items()
+        }
+
+
+def analyze(engine):
+    # 실제 운영 DB처럼 통계가 있어야 플래너가 인덱스 선택을 제대로 한다
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("ANALYZE")
+
+
+# ---------- capture ----------
+
+class StatementRecorder:
+    def __init__(self):
+        self.statements: List[Tuple[str, object]] = []
+        self.enabled = False
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.enabled and not executemany and statement.lstrip().upper().startswith(EXPLAINABLE):
+            self.statements.append((statement, parameters))
+
+
+def fill(value, ids: Dict[str, str]):
+    if isinstance(value, str):
+        return value.format(**ids)
+    if isinstance(value, dict):
+        return {key: fill(item, ids) for key, item in value.items()}
+    return value
+
+
+def capture(client, recorder: StatementRecorder, ids: Dict[str, str], headers: dict) -> List[dict]:
+    results = []
+    for method, template, options in ENDPOINTS:
+        recorder.statements = []
+        recorder.enabled = True
+        try:
+            response = client.request(method, fill(template, ids), headers=headers, **fill(options, ids))
+            body = response.content  # 스트리밍 응답도 끝까지 읽어서 쿼리를 모두 실행시킨다
+        finally:
+            recorder.enabled = False
+        results.append({
+            "method": method,
+            "template": template,
+            "status": response.status_code,
+            "detail": body[:200].decode(errors="replace") if response.status_code >= 400 else None,
+            "statements": list(recorder.statements),
+        })
+    return results
+
+
+# ---------- plans ----------
+
+def explain(engine, statement: str, parameters) -> object:
+    dialect = engine.dialect.name
+    prefix = "EXPLAIN QUERY PLAN " if dialect == "sqlite" else "EXPLAIN (FORMAT JSON) "
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(prefix + statement, parameters or ()).fetchall()
+        conn.rollback()
+    if dialect == "sqlite":
+        # (id, parent, notused, detail)
+        return [str(row[-1]) for row in rows]
+    plan = rows[0][0]
+    return json.loads(plan) if isinstance(plan, str) else plan
+
+
+def _resolve(name: str, aliases: Dict[str, str], tables: Dict[str, int]) -> str:
+    if name in tables:
+        return name
+    if name in aliases:
+        return aliases[name]
+    # SQLAlchemy 익명 별칭 (project_members_1)
+    base = re.sub(r"_\d+$", "", name)
+    return base if base in tables else name
+
+
+def full_scans(plan, statement: str, tables: Dict[str, int]) -> List[Tuple[str, str]]:
+    """(table, plan line) for every sequential / full-index scan in the plan."""
+    aliases = {alias: table for table, alias in _ALIAS.findall(statement)}
+    scans = []
+
+    if isinstance(plan, list) and plan and isinstance(plan[0], str):
+        for line in plan:
+            match = _SQLITE_SCAN.match(line)
+            if match:
+                scans.append((_resolve(match.group(1), aliases, tables), line))
+        return scans
+
+    def walk(node):
+        node_type = node.get("Node Type", "")
+        relation = node.get("Relation Name")
+        if relation and (
+            node_type == "Seq Scan"
+            or (node_type in ("Index Scan", "Index Only Scan") and "Index Cond" not in node)
+        ):
+            scans.append((relation, f"{node_type} on {relation}" + (f" using {node['Index Name']}" if "Index Name" in node else "")))
+        for child in node.get("Plans", ()):
+            walk(child)
+
+    for entry in plan:
+        walk(entry["Plan"])
+    return scans
+
+
+def check(engine, results: List[dict], tables: Dict[str, int], large_rows: int, verbose: bool) -> List[dict]:
+    from app.utils.query_counter import normalize_statement
+
+    violations = []
+    for result in results:
+        endpoint = f"{result['method']} {result['template']}"
+        allowed = ALLOWED_SCANS.get((result["method"], result["template"]), {})
+        explained = set()
+
+        for statement, parameters in result["statements"]:
+            shape = normalize_statement(statement)
+            if shape in explained:
+                continue
+            explained.add(shape)
+
+            plan = explain(engine, statement, parameters)
+            if verbose:
+                print(f"  [{endpoint}] {shape[:160]}")
+                for line in (plan if isinstance(plan[0], str) else [json.dumps(plan)[:300]]):
+                    print(f"      {line}")
+
+            for table, line in full_scans(plan, statement, tables):
+                if tables.get(table, 0) < large_rows or table in allowed:
+                    continue
+                violations.append({
+                    "endpoint": endpoint,
+                    "table": table,
+                    "rows": tables[table],
+                    "plan": line,
+                    "statement": shape,
+                })
+    return violations
+
+
+# ---------- main ----------
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Fail when hot-path queries scan large tables")
+    parser.add_argument("--database-url", help="empty database to seed (default: temporary SQLite file)")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--projects", type=int, default=300)
+    parser.add_argument("--members-per-project", type=int, default=15)
+    parser.add_argument("--dm-rooms", type=int, default=5000)
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--versions-per-room", type=int, default=5)
+    parser.add_argument("--large-table-rows", type=int, default=1000,
+                        help="tables with at least this many rows must never be fully scanned")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args(argv)
+
+    workdir = None
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        workdir = tempfile.TemporaryDirectory()
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir.name, 'plans.db')}"
+    os.environ.setdefault("SECRET_KEY", "query-plan-check")
+    # 측정 대상이 아닌 보호 장치는 끈다
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ["ADMISSION_ENABLED"] = "false"
+    os.environ["SLOW_QUERY_THRESHOLD_MS"] = "0"
+    os.environ["MIGRATE_ON_STARTUP"] = "false"
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+    from app.auth import create_access_token
+    from app.config import engine
+    from app.utils.migrations import migrate
+
+    migrate(engine)
+    if any(table_sizes(engine).values()):
+        raise SystemExit("--database-url must point at an empty database")
+
+    started = time.perf_counter()
+    ids = seed(
+        engine, args.users, args.projects, args.members_per_project, args.dm_rooms,
+        args.messages, args.versions_per_room, random.Random(args.seed),
+    )
+    analyze(engine)
+    tables = table_sizes(engine)
+    print(f"Seeded in {time.perf_counter() - started:.1f}s: "
+          + ", ".join(f"{name}={count}" for name, count in sorted(tables.items()) if count))
+
+    from app.main import app
+
+    recorder = StatementRecorder()
+    event.listen(engine, "before_cursor_execute", recorder)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': PROBE_ID})}"}
+    results = capture(TestClient(app), recorder, ids, headers)
+    event.remove(engine, "before_cursor_execute", recorder)
+
+    failed_requests = [result for result in results if result["status"] >= 400]
+    for result in failed_requests:
+        print(f"! {result['method']} {result['template']} -> {result['status']} {result['detail']}")
+
+    violations = check(engine, results, tables, args.large_table_rows, args.verbose)
+    total = sum(len({statement for statement, _ in result["statements"]}) for result in results)
+    print(f"Checked {total} statements from {len(results)} endpoint calls")
+
+    for violation in violations:
+        print(f"\nFULL SCAN {violation['table']} ({violation['rows']} rows) in {violation['endpoint']}")
+        print(f"  plan: {violation['plan']}")
+        print(f"  sql:  {violation['statement'][:300]}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"tables": tables, "violations": violations, "failed_requests": [
+                {key: result[key] for key in ("method", "template", "status", "detail")} for result in failed_requests
+            ]}, f, indent=2)
+
+    engine.dispose()
+    if workdir is not None:
+        workdir.cleanup()
+
+    if violations or failed_requests:
+        print(f"\nFAILED: {len(violations)} full scans, {len(failed_requests)} failed requests")
+        sys.exit(1)
+    print("OK: no full scans of large tables")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import os
+import tempfile
+
+# app.config가 import 시점에 엔진을 만들기 때문에 환경 변수를 먼저 설정한다
+_db_dir = tempfile.mkdtemp(prefix="research-chat-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ["DATABASE_REPLICA_URL"] = ""
+os.environ["MESSAGE_SHARDS"] = "{}"
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+# 느린 쿼리의 EXPLAIN이 쿼리 수 측정에 섞이지 않도록
+os.environ["SLOW_QUERY_EXPLAIN"] = "false"
+
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.auth import create_access_token
+from app.config import SessionLocal
+from app.main import app
+from app.models import ChatRoom, ChatRoomMember, Message, MessageType, Project, ProjectMember, User, UserRole
+
+
+@pytest.fixture(scope="session")
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def make_user(db):
+    def make(name: str = None, role: UserRole = UserRole.student) -> User:
+        user_id = str(uuid4())
+        user = User(
+            id=user_id,
+            name=name or f"user-{user_id[:8]}",
+            email=f"{user_id}@example.com",
+            password="not-a-real-hash",  # 토큰으로 인증하므로 로그인하지 않는다
+            role=role,
+        )
+        db.add(user)
+        db.commit()
+        return user
+    return make
+
+
+@pytest.fixture
+def auth_headers():
+    def headers(user: User) -> dict:
+        return {"Authorization": f"Bearer {create_access_token(data={'sub': user.id})}"}
+    return headers
+
+
+@pytest.fixture
+def make_room(db):
+    def make(members, messages: int = 0, project: Project = None) -> ChatRoom:
+        room = ChatRoom(
+            id=str(uuid4()),
+            name="room",
+            type="project" if project else "group",
+            project_id=project.id if project else None,
+        )
+        db.add(room)
+        db.flush()
+        for user in members:
+            db.add(ChatRoomMember(chat_room_id=room.id, user_id=user.id))
+
+        started = datetime.utcnow() - timedelta(hours=1)
+        for index in range(messages):
+            sender = members[index % len(members)]
+            db.add(Message(
+                id=str(uuid4()),
+                chat_room_id=room.id,
+                sender_id=sender.id,
+                sender_name=sender.name,
+                sender_role=sender.role.value,
+                type=MessageType.text,
+                content=f"message {index}",
+                timestamp=started + timedelta(seconds=index),
+            ))
+        db.commit()
+        return room
+    return make
+
+
+@pytest.fixture
+def make_project(db):
+    def make(owner: User, members) -> Project:
+        project = Project(
+            id=str(uuid4()),
+            name="project",
+            invite_code=uuid4().hex[:6].upper(),
+            created_by=owner.id,
+        )
+        db.add(project)
+        db.flush()
+        db.add(ProjectMember(project_id=project.id, user_id=owner.id, role="owner"))
+        for user in members:
+            db.add(ProjectMember(project_id=project.id, user_id=user.id))
+        db.commit()
+        return project
+    return make
@@ -0,0 +1,51 @@
+import asyncio
+
+from app.utils.admission import AdmissionController, AdmissionMiddleware, route_class
+
+
+def test_route_classes():
+    assert route_class("GET", "/api/chat/rooms/r1/export") == "export"
+    assert route_class("GET", "/api/chat/versions/v1/export") == "export"
+    assert route_class("GET", "/api/chat/rooms/r1/messages") == "chat_read"
+    assert route_class("POST", "/api/chat/messages") == "chat_write"
+    assert route_class("OPTIONS", "/api/chat/messages") is None
+
+
+def test_exports_and_preflights_do_not_take_chat_slots():
+    controller = AdmissionController({"chat_read": 1, "export": 1, "default": 1}, queue_limit=0, queue_timeout=0.1)
+    entered, release = asyncio.Event(), asyncio.Event()
+
+    async def app(scope, receive, send):
+        if scope["path"].endswith("/export"):
+            # 다운로드가 끝나지 않은 export
+            entered.set()
+            await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    middleware = AdmissionMiddleware(app, controller)
+
+    async def request(method, path):
+        statuses = []
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                statuses.append(message["status"])
+
+        await middleware({"type": "http", "method": method, "path": path}, None, send)
+        return statuses[0]
+
+    async def run():
+        export = asyncio.ensure_future(request("GET", "/api/chat/rooms/r1/export"))
+        try:
+            await asyncio.wait_for(entered.wait(), timeout=5)
+            assert controller.gates["export"].active == 1
+            assert await request("GET", "/api/chat/rooms/r1/messages") == 200
+            assert await request("GET", "/api/chat/rooms/r2/export") == 503
+            assert await request("OPTIONS", "/api/chat/messages") == 200
+        finally:
+            release.set()
+        assert await asyncio.wait_for(export, timeout=5) == 200
+
+    asyncio.run(run())
+    assert controller.gates["chat_read"].admitted_total == 1
@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+
+from app.models import Message
+from app.utils.archive import archive_room, iter_room_history
+
+
+def test_archive_runs_continue_inside_a_timestamp(db, make_user, make_room):
+    room = make_room([make_user()], messages=6)
+    # 블록 경계가 같은 시각의 메시지 사이에 오도록
+    old = datetime.utcnow() - timedelta(days=90)
+    db.query(Message).filter(Message.chat_room_id == room.id).update({Message.timestamp: old})
+    db.commit()
+    room_id = room.id
+    cutoff = datetime.utcnow() - timedelta(days=30)
+
+    assert archive_room(db, room_id, cutoff, block_size=4, max_blocks=1) == 4
+    assert archive_room(db, room_id, cutoff, block_size=4, max_blocks=1) == 2
+    assert archive_room(db, room_id, cutoff, block_size=4, max_blocks=1) == 0
+
+    assert db.query(Message).filter(Message.chat_room_id == room_id).count() == 0
+    history = [message.id for message in iter_room_history(db, room_id)]
+    assert history == sorted(history) and len(history) == 6
+
+
+def test_archive_job_status(client, make_user, auth_headers, db):
+    admin = make_user()
+    admin.is_admin = True
+    db.commit()
+    headers = auth_headers(admin)
+
+    response = client.post("/api/chat/archive", params={"older_than_days": 30}, headers=headers)
+    assert response.status_code == 200
+
+    job = client.get(f"/api/chat/deletions/{response.json()['job_id']}", headers=headers).json()
+    assert job["entity"] == "archive"
+    assert job["status"] == "completed"
@@ -0,0 +1,30 @@
+from uuid import uuid4
+
+
+def test_signup_then_login(client):
+    email = f"{uuid4()}@example.com"
+    response = client.post("/api/auth/signup", json={"name": "new", "email": email, "password": "secret", "role": "student"})
+    assert response.status_code == 200, response.text
+    assert response.json()["email"] == email
+
+    assert client.post("/api/auth/signup", json={"name": "new", "email": email, "password": "secret", "role": "student"}).status_code == 400
+    assert client.post("/api/auth/login", json={"email": email, "password": "wrong"}).status_code == 401
+    response = client.post("/api/auth/login", json={"email": email, "password": "secret"})
+    assert response.status_code == 200
+    assert response.json()["token_type"] == "bearer"
+
+
+def test_password_truncated_to_72_bytes():
+    from app.utils.password import _hash_job, _verify_job, bcrypt_secret
+
+    password = "가" * 30  # 90 bytes in UTF-8
+    assert len(bcrypt_secret(password)) == 72
+
+    hashed, _, _ = _hash_job(password, 4)
+    (valid, _), _, _ = _verify_job(password, hashed, 4)
+    assert valid
+    # 72바이트(24글자) 이후는 bcrypt가 보지 않는다
+    (valid, _), _, _ = _verify_job("가" * 24 + "나" * 6, hashed, 4)
+    assert valid
+    (valid, _), _, _ = _verify_job("가" * 23 + "나" * 7, hashed, 4)
+    assert not valid
@@ -0,0 +1,51 @@
+from datetime import datetime
+
+from app.models import Message, MessageType
+
+
+def _add_message(db, room, sender, message_id, content, timestamp):
+    db.add(Message(
+        id=message_id,
+        chat_room_id=room.id,
+        sender_id=sender.id,
+        sender_name=sender.name,
+        sender_role=sender.role.value,
+        type=MessageType.text,
+        content=content,
+        timestamp=timestamp,
+    ))
+
+
+def test_sync_pages_through_equal_timestamps(client, db, make_user, make_room, auth_headers):
+    user = make_user()
+    room = make_room([user])
+    timestamp = datetime(2031, 1, 1)
+    for index in range(5):
+        _add_message(db, room, user, f"{room.id}-{index}", "same time", timestamp)
+    db.commit()
+    headers = auth_headers(user)
+
+    page = client.get("/api/chat/sync", params={"since": "2030-12-31T00:00:00", "limit": 2}, headers=headers).json()
+    seen = [message["id"] for message in page]
+    while page:
+        last = page[-1]
+        page = client.get("/api/chat/sync", params={
+            "since": last["timestamp"], "after_id": last["id"], "limit": 2,
+        }, headers=headers).json()
+        seen += [message["id"] for message in page]
+
+    assert seen == [f"{room.id}-{index}" for index in range(5)]
+
+
+def test_search_treats_wildcards_literally(client, db, make_user, make_room, auth_headers):
+    user = make_user()
+    room = make_room([user])
+    for index, content in enumerate(["100% done", "1000 done", "a_b", "axb"]):
+        _add_message(db, room, user, f"{room.id}-{index}", content, datetime.utcnow())
+    db.commit()
+    headers = auth_headers(user)
+
+    found = client.get("/api/chat/search", params={"q": "0%"}, headers=headers).json()
+    assert [message["content"] for message in found] == ["100% done"]
+    found = client.get("/api/chat/search", params={"q": "a_b"}, headers=headers).json()
+    assert [message["content"] for message in found] == ["a_b"]
@@ -0,0 +1,73 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from app.config import Base
+from app.utils.migrations import SHARD_MIGRATIONS_PACKAGE, current_version, discover, migrate
+from app.utils.sharding import SHARDED_MODELS
+
+
+def _schema(engine, tables):
+    inspector = inspect(engine)
+    return {
+        table: (
+            {(column["name"], column["nullable"]) for column in inspector.get_columns(table)},
+            {index["name"] for index in inspector.get_indexes(table)},
+        )
+        for table in tables
+    }
+
+
+def test_migrations_build_the_model_schema(tmp_path):
+    # 마이그레이션을 처음부터 재생한 DB가 현재 모델과 같아야 한다
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    migrate(engine)
+    assert current_version(engine) == discover()[-1].version
+
+    migrated = _schema(engine, Base.metadata.tables)
+    for name, table in Base.metadata.tables.items():
+        columns, indexes = migrated[name]
+        assert columns == {(column.name, column.nullable) for column in table.columns}, name
+        assert {index.name for index in table.indexes} <= indexes, name
+
+
+def test_shard_migrations_build_the_sharded_tables(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'shard.db'}")
+    migrate(engine, package=SHARD_MIGRATIONS_PACKAGE)
+    assert current_version(engine, SHARD_MIGRATIONS_PACKAGE) == discover(SHARD_MIGRATIONS_PACKAGE)[-1].version
+    # 샤드에는 primary 테이블이 없다
+    assert not inspect(engine).has_table("users")
+
+    for model, _ in SHARDED_MODELS:
+        columns, indexes = _schema(engine, [model.__tablename__])[model.__tablename__]
+        assert {name for name, _ in columns} == {column.name for column in model.__table__.columns}
+        assert {index.name for index in model.__table__.indexes} <= indexes
+
+
+def test_dm_backfill_keeps_duplicate_dms_reachable(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    migrate(engine, target=7)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO users (id, name, email, password, role) VALUES "
+            "('u1', 'a', 'a@x', 'x', 'student'), ('u2', 'b', 'b@x', 'x', 'student')"
+        ))
+        # 쌍 키가 생기기 전에 같은 두 사람 사이에 두 번 만들어진 DM
+        conn.execute(text(
+            "INSERT INTO chat_rooms (id, name, type, user1_id, user2_id, created_at, revision) VALUES "
+            "('old', 'dm', 'dm', 'u2', 'u1', '2020-01-01', 0), ('new', 'dm', 'dm', 'u1', 'u2', '2021-01-01', 0)"
+        ))
+        conn.execute(text(
+            "INSERT INTO chat_room_members (chat_room_id, user_id) VALUES ('old', 'u1'), ('old', 'u1')"
+        ))
+
+    migrate(engine)
+
+    with engine.connect() as conn:
+        keys = dict(conn.execute(text("SELECT id, dm_key FROM chat_rooms")).all())
+        members = sorted(conn.execute(text("SELECT chat_room_id, user_id FROM chat_room_members")).all())
+    assert keys == {"old": "u1:u2", "new": None}
+    assert members == [("new", "u1"), ("new", "u2"), ("old", "u1"), ("old", "u2")]
+
+    with pytest.raises(IntegrityError), engine.begin() as conn:
+        conn.execute(text("INSERT INTO chat_room_members (chat_room_id, user_id) VALUES ('old', 'u1')"))
@@ -0,0 +1,29 @@
+import time
+
+from app.websocket.presence import PresenceTracker
+
+
+def test_quiet_client_stays_online():
+    presence = PresenceTracker(heartbeat_timeout=0.01)
+    presence.user_connected("room", "listener")
+    time.sleep(0.02)
+    presence.pending_frames()
+
+    assert presence.online_users("room") == ["listener"]
+
+    presence.user_disconnected("room", "listener")
+    assert presence.online_users("room") == []
+
+
+def test_missed_heartbeats_mark_user_offline():
+    presence = PresenceTracker(heartbeat_timeout=0.01)
+    presence.user_connected("room", "quiet")
+    presence.user_connected("room", "pinging")
+    presence.heartbeat("pinging")
+    time.sleep(0.02)
+    presence.pending_frames()
+
+    assert presence.online_users("room") == ["quiet"]
+
+    presence.heartbeat("pinging")
+    assert presence.online_users("room") == ["pinging", "quiet"]
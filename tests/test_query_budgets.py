@@ -0,0 +1,135 @@
+"""
+Query budgets for the hot read endpoints (app/utils/query_counter.py).
+
+Each test pins the number of statements an endpoint may run, and checks
+that the count does not grow with the number of rooms, members or
+messages, so a lazy-load that sneaks into a loop fails here.
+"""
+from app.models import Message, MessageType
+from app.utils.query_counter import assert_max_queries, count_queries
+
+
+def _count(client, url, headers) -> int:
+    with count_queries() as log:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.text
+    return log.count
+
+
+def test_chat_rooms_budget(client, make_user, make_room, auth_headers):
+    user = make_user()
+    others = [make_user() for _ in range(3)]
+    for _ in range(12):
+        make_room([user] + others)
+    headers = auth_headers(user)
+
+    with assert_max_queries(4):
+        response = client.get("/api/chat/rooms", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 12
+
+
+def test_chat_rooms_queries_do_not_grow_with_rooms(client, make_user, make_room, auth_headers):
+    few, many = make_user(), make_user()
+    make_room([few, make_user()])
+    for _ in range(15):
+        make_room([many, make_user(), make_user()])
+
+    assert _count(client, "/api/chat/rooms", auth_headers(few)) == _count(client, "/api/chat/rooms", auth_headers(many))
+
+
+def test_chat_room_detail_budget(client, make_user, make_room, auth_headers):
+    user = make_user()
+    room = make_room([user] + [make_user() for _ in range(10)])
+    url, headers = f"/api/chat/rooms/{room.id}", auth_headers(user)
+
+    with assert_max_queries(4):
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()["member_ids"]) == 11
+
+
+def test_messages_budget(client, db, make_user, make_room, auth_headers):
+    user, other = make_user(), make_user()
+    room = make_room([user, other], messages=40)
+
+    # 피드백이 달린 메시지도 부모/피드백을 하나씩 조회하지 않는다
+    parents = db.query(Message).filter(Message.chat_room_id == room.id).limit(5).all()
+    for parent in parents:
+        feedback = Message(
+            id=f"feedback-{parent.id}",
+            chat_room_id=room.id,
+            sender_id=other.id,
+            sender_name=other.name,
+            sender_role=other.role.value,
+            type=MessageType.feedback,
+            content="feedback",
+            timestamp=parent.timestamp,
+            parent_message_id=parent.id,
+        )
+        db.add(feedback)
+        parent.feedback_ids = [feedback.id]
+    db.commit()
+    url, headers = f"/api/chat/rooms/{room.id}/messages", auth_headers(user)
+
+    with assert_max_queries(5):
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 45
+
+
+def test_my_dms_budget(client, make_user, auth_headers):
+    user = make_user()
+    headers = auth_headers(user)
+    for _ in range(8):
+        partner = make_user()
+        assert client.post("/api/chat/dm", params={"other_user_id": partner.id}, headers=headers).status_code == 200
+
+    with assert_max_queries(2):
+        response = client.get("/api/chat/dm/my", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 8
+
+
+def test_project_members_budget(client, make_user, make_project, auth_headers):
+    owner = make_user()
+    project = make_project(owner, [make_user() for _ in range(20)])
+    url, headers = f"/api/projects/{project.id}", auth_headers(owner)
+
+    with assert_max_queries(4):
+        response = client.get(f"{url}/members", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 21
+
+    with assert_max_queries(4):
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()["members"]) == 21
+
+
+def test_project_members_queries_do_not_grow_with_members(client, make_user, make_project, auth_headers):
+    small_owner, large_owner = make_user(), make_user()
+    small = make_project(small_owner, [make_user()])
+    large = make_project(large_owner, [make_user() for _ in range(25)])
+
+    small_count = _count(client, f"/api/projects/{small.id}/members", auth_headers(small_owner))
+    large_count = _count(client, f"/api/projects/{large.id}/members", auth_headers(large_owner))
+    assert small_count == large_count
+
+
+def test_project_lists_budget(client, make_user, make_project, make_room, auth_headers):
+    user = make_user()
+    for _ in range(10):
+        project = make_project(make_user(), [user, make_user()])
+        make_room([user], project=project)
+    headers = auth_headers(user)
+
+    with assert_max_queries(2):
+        response = client.get("/api/projects/my", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 10
+
+    with assert_max_queries(2):
+        response = client.get("/api/projects/dashboard", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 10
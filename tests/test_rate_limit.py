@@ -0,0 +1,22 @@
+import pytest
+
+from app.utils.rate_limit import Limit, MemoryBucketStore, RateLimited, RateLimiter, SQLiteBucketStore
+
+
+@pytest.mark.parametrize("store_kind", ["memory", "sqlite"])
+def test_room_rejection_refunds_user_token(tmp_path, store_kind):
+    store = MemoryBucketStore() if store_kind == "memory" else SQLiteBucketStore(str(tmp_path / "buckets.db"))
+    limiter = RateLimiter(
+        {"message": Limit(rate=0.001, burst=2), "room": Limit(rate=0.001, burst=1)}, {}, store
+    )
+
+    limiter.check_both("message", "user", None, "busy-room")
+    with pytest.raises(RateLimited) as error:
+        limiter.check_both("message", "user", None, "busy-room")
+    assert error.value.scope == "room"
+
+    # 방 버킷에서 거절된 메시지는 사용자 토큰을 쓰지 않았으므로 다른 방에는 보낼 수 있다
+    limiter.check_both("message", "user", None, "quiet-room")
+    with pytest.raises(RateLimited) as error:
+        limiter.check_both("message", "user", None, "other-room")
+    assert error.value.scope == "message"
@@ -0,0 +1,38 @@
+def test_presence_requires_membership(client, make_user, make_room, auth_headers):
+    member, outsider = make_user(), make_user()
+    room = make_room([member, make_user()])
+    url = f"/api/chat/rooms/{room.id}/presence"
+
+    assert client.get(url, headers=auth_headers(member)).status_code == 200
+    assert client.get(url, headers=auth_headers(outsider)).status_code == 403
+
+
+def test_deleting_project_hides_its_rooms(client, monkeypatch, make_user, make_project, make_room, auth_headers):
+    # 백그라운드 purge가 끝나기 전 상태를 본다
+    monkeypatch.setattr("app.api.projects.purge_project", lambda project_id, job: None)
+    owner = make_user()
+    project = make_project(owner, [])
+    room = make_room([owner], messages=3, project=project)
+    project_id, room_id, headers = project.id, room.id, auth_headers(owner)
+    version = client.post("/api/chat/versions", headers=headers, json={"chat_room_id": room_id, "description": "v1"})
+    assert version.status_code == 200
+    version_id = version.json()["id"]
+
+    assert client.delete(f"/api/projects/{project_id}", headers=headers).status_code == 200
+
+    assert client.get(f"/api/chat/rooms/{room_id}", headers=headers).status_code == 404
+    assert room_id not in [item["id"] for item in client.get("/api/chat/rooms", headers=headers).json()]
+    response = client.post("/api/chat/messages", headers=headers, json={
+        "chat_room_id": room_id, "type": "text", "content": "too late",
+    })
+    assert response.status_code == 403
+
+    # purge 전에도 기록을 읽거나 내보낼 수 없다
+    for url in (
+        f"/api/chat/rooms/{room_id}/messages",
+        f"/api/chat/rooms/{room_id}/export",
+        f"/api/chat/rooms/{room_id}/versions",
+        f"/api/chat/versions/{version_id}/messages",
+        f"/api/chat/versions/{version_id}/export",
+    ):
+        assert client.get(url, headers=headers).status_code == 403, url
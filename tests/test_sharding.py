@@ -0,0 +1,86 @@
+import os
+
+import pytest
+from sqlalchemy import create_engine
+
+from app.config import engine, settings
+from app.models import Message, MessageType, RoomShard
+from app.utils.migrations import SHARD_MIGRATIONS_PACKAGE, migrate
+from app.utils.sharding import RoomMoving, ShardRouter, ensure_shard_schema, move_room
+
+
+@pytest.fixture
+def router(tmp_path):
+    # "a"는 테스트 DB 자체, "b"는 별도 SQLite 파일
+    shards = ShardRouter({"a": settings.DATABASE_URL, "b": f"sqlite:///{os.path.join(tmp_path, 'b.db')}"}, engine, 30)
+    ensure_shard_schema(shards)
+    return shards
+
+
+def test_new_rooms_are_pinned(db, router, make_user, make_room):
+    room = make_room([make_user()])
+    router.pin_new_room(db, room.id)
+    db.commit()
+
+    assert db.query(RoomShard.shard).filter(RoomShard.chat_room_id == room.id).scalar() == router.hash_shard(room.id)
+
+
+def test_writes_wait_while_room_is_locked(db, router, make_user, make_room):
+    room = make_room([make_user()])
+    router.assign(room.id, "a", locked=True)
+
+    with pytest.raises(RoomMoving):
+        router.writable_shard(db, room.id)
+    # 읽기는 계속된다
+    assert router.shard_for(room.id, fresh=True) == "a"
+
+
+def test_move_room_copies_and_unlocks(db, router, make_user, make_room):
+    room = make_room([make_user()], messages=12)
+    router.assign(room.id, "a")
+
+    result = move_room(room.id, "b", router=router, wait=0, grace=0, log=lambda line: None)
+
+    assert result["copied"] == 12 and result["deleted"] == 12
+    db.expire_all()
+    assert db.query(RoomShard.locked_at).filter(RoomShard.chat_room_id == room.id).scalar() is None
+    assert router.writable_shard(db, room.id) == "b"
+    with router.shard_session("b") as shard_db:
+        assert shard_db.query(Message).filter(Message.chat_room_id == room.id).count() == 12
+    assert db.query(Message).filter(Message.chat_room_id == room.id).count() == 0
+
+
+def test_replica_sessions_fan_out_to_shard_replicas(db, tmp_path, make_user, make_room):
+    # 샤드 "b"와 그 복제본, primary("a")의 복제본은 모두 별도 SQLite 파일
+    replica_a = create_engine(f"sqlite:///{os.path.join(tmp_path, 'a-replica.db')}")
+    shards = ShardRouter(
+        {"a": settings.DATABASE_URL, "b": f"sqlite:///{os.path.join(tmp_path, 'b.db')}"}, engine, 30,
+        {"b": f"sqlite:///{os.path.join(tmp_path, 'b-replica.db')}"}, replica_a,
+    )
+    ensure_shard_schema(shards)
+    for replica in shards.replica_engines.values():
+        migrate(replica, package=SHARD_MIGRATIONS_PACKAGE)
+
+    user = make_user()
+    room = make_room([user])
+    shards.assign(room.id, "b")
+    replica_db = shards.replica_sessionmakers["b"]()
+    replica_db.add(Message(
+        id="replicated", chat_room_id=room.id, sender_id=user.id, sender_name=user.name,
+        sender_role=user.role.value, type=MessageType.text, content="hello",
+    ))
+    replica_db.commit()
+    replica_db.close()
+
+    def ids(shard_db, room_ids):
+        return [row.id for row in shard_db.query(Message.id).filter(Message.chat_room_id.in_(room_ids))]
+
+    request_replica = shards.replica_sessionmakers["a"]()
+    try:
+        assert shards.fan_out_rooms([room.id], ids, request_replica) == ["replicated"]
+        with shards.session(room.id, request_replica) as message_db:
+            assert ids(message_db, [room.id]) == ["replicated"]
+    finally:
+        request_replica.close()
+    # 쓰기 직후(primary 세션)는 샤드 primary를 읽는다
+    assert shards.fan_out_rooms([room.id], ids, db) == []